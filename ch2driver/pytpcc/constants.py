@@ -207,6 +207,27 @@ CH2_DATAGEN_SEED_NOT_SET = -1
 CH2_DRIVER_KV_TIMEOUT = 10
 CH2_DRIVER_BULKLOAD_BATCH_SIZE = 1024 * 256 # 256K
 
+# Number of transactions generated at a time by util.paramstream
+PARAM_STREAM_BLOCK_SIZE = 4096
+
+# Fraction of one CPU above which a client process is reported as saturated
+CLIENT_CPU_SATURATION = 0.9
+
+# Adaptive warmup: length of a measurement interval in seconds, number of intervals
+# in the moving window and maximum coefficient of variation/drift within the window
+STEADY_STATE_INTERVAL = 5
+STEADY_STATE_WINDOW = 6
+STEADY_STATE_TOLERANCE = 0.1
+
+# Resolution of the transaction latency histograms kept by util.results
+LATENCY_BUCKETS_PER_DECADE = 50
+
+# Query node routing: weight of the newest sample in the latency EWMA, failed requests
+# in a row after which a node is skipped, and seconds until it is tried again
+ROUTER_EWMA_ALPHA = 0.2
+ROUTER_MAX_FAILURES = 3
+ROUTER_RETRY_INTERVAL = 10
+
 # Table Names
 TABLENAME_ITEM       = "item"
 TABLENAME_ITEM_CATEGORIES_FLAT = "item_categories"
@@ -3073,3 +3094,35 @@ CH2_QUERIES_PERM = [
     ["Q13", "Q15", "Q17", "Q01", "Q22", "Q11", "Q03", "Q04", "Q07", "Q20", "Q14", "Q21", "Q09", "Q08", "Q02", "Q18", "Q16", "Q06", "Q10", "Q12", "Q05",  "Q19"]
 ]
 
+
+# Prepared transaction statements: parallel PREPAREs, seconds between the checks that
+# every query node sees them, seconds before the missing ones are prepared on the node
+# itself, and the file remembering the prepared names between runs
+PREPARE_THREADS = 8
+PREPARE_POLL_INTERVAL = 0.5
+PREPARE_READY_TIMEOUT = 30
+PREPARED_CACHE_FILE = ".ch2_prepared.json"
+
+# Bytes read at a time from a streamed analytics response
+ANALYTICS_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Error code of an analytics request that ran into its "timeout" parameter
+ANALYTICS_TIMEOUT_ERROR = 21002
+
+# Data freshness probe: seconds between polls of the analytics service for a marker,
+# seconds after which a marker counts as not visible, and length of the reporting
+# intervals. Markers are history rows whose h_data is FRESHNESS_MARKER_TAG, looked up in
+# the analytics collection FRESHNESS_ANALYTICS_COLLECTION
+FRESHNESS_POLL_INTERVAL = 0.05
+FRESHNESS_TIMEOUT = 120
+FRESHNESS_REPORT_INTERVAL = 60
+FRESHNESS_MARKER_TAG = "freshness"
+FRESHNESS_ANALYTICS_COLLECTION = "history"
+
+# Customers with an order --read-your-writes has not seen indexed yet, above which the next
+# Order-Status runs request_plus to clear them, so that the writes it remembers stay bounded
+READ_YOUR_WRITES_MAX_PENDING = 10000
+
+# Loops of analytical queries generated per client from the query templates at startup;
+# clients that run more loops reuse them from the first one
+QUERY_STREAM_ITERATIONS = 100
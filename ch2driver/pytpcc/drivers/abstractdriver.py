@@ -252,6 +252,21 @@ class AbstractDriver(object):
     def executeFinish(self):
         """Callback after the execution phase finishes"""
         return None
+
+    def getStats(self):
+        """Optional driver counters for the results, as {section: {row: {counter: value}}}.
+        They are summed across clients; "time" and "<name>_time" counters are shown as a mean per "requests"."""
+        return None
+
+    def capturePlans(self, transactions, analytics):
+        """Optional execution plans of the transaction statements and/or the analytical queries,
+        as {category: {statement: plan}}"""
+        return None
+
+    def getFreshness(self):
+        """Optional (write time, visibility lag) samples of a data freshness probe; the lag is None
+        for markers that never became visible"""
+        return None
         
     def executeTransaction(self, txn, params, duration, endBenchmarkTime, queryIterNum):
         """Execute a transaction based on the given name"""
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+
+import logging
+import os
+import threading
+import time
+
+import constants
+
+class FreshnessProbe:
+    """Measures how long transactional writes take to become visible to analytics.
+
+    A background thread writes one marker every `interval` seconds with write(key) and
+    then polls visible(key) every FRESHNESS_POLL_INTERVAL seconds. The lag of a marker is
+    the time from the acknowledgement of its write to the middle of the first poll that
+    sees it, so it is accurate to about half a poll round trip. Markers that are not
+    visible after FRESHNESS_TIMEOUT seconds are recorded with a lag of None.
+    """
+
+    def __init__(self, write, visible, interval):
+        assert interval > 0
+        self.write = write
+        self.visible = visible
+        self.interval = interval
+        self.samples = [ ]
+        self.keys = [ ]
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="FreshnessProbe")
+        self.thread.daemon = True
+    ## DEF
+
+    def start(self):
+        self.thread.start()
+    ## DEF
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+    ## DEF
+
+    def getSamples(self):
+        """(write time, lag) of the markers measured so far"""
+        with self.lock:
+            return list(self.samples)
+    ## DEF
+
+    def run(self):
+        seq = 0
+        while not self.stopped.is_set():
+            seq += 1
+            key = "%s.%d.%d" % (constants.FRESHNESS_MARKER_TAG, os.getpid(), seq)
+            begin = time.time()
+            try:
+                if self.write(key):
+                    written = time.time()
+                    self.keys.append(key)
+                    lag = self.waitVisible(key, written)
+                    if lag == None and self.stopped.is_set():
+                        break
+                    with self.lock:
+                        self.samples.append((written, lag))
+            except Exception as ex:
+                logging.warning("Freshness probe failed: %s: %s" % (type(ex).__name__, ex))
+            self.stopped.wait(max(0, self.interval - (time.time() - begin)))
+        ## WHILE
+    ## DEF
+
+    def waitVisible(self, key, written):
+        deadline = written + constants.FRESHNESS_TIMEOUT
+        while not self.stopped.is_set() and time.time() < deadline:
+            pollStart = time.time()
+            if self.visible(key):
+                return (pollStart + time.time()) / 2 - written
+            time.sleep(constants.FRESHNESS_POLL_INTERVAL)
+        ## WHILE
+        if not self.stopped.is_set():
+            logging.warning("Freshness marker %s was not visible to analytics after %d seconds" % (key, constants.FRESHNESS_TIMEOUT))
+        return None
+    ## DEF
+## CLASS
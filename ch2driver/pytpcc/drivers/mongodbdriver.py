@@ -42,6 +42,7 @@ import traceback
 import time
 import constants
 from .abstractdriver import *
+from util import queryorder
 
 ## ==============================================
 ## MongodbDriver
@@ -600,16 +601,12 @@ class MongodbDriver(AbstractDriver):
         self.tx_status = ""
         qry_times = {}
         if self.TAFlag == "A":
-            # ch2_queries_perm = list(constants.CH2_QUERIES.keys())
-            # Pick a good seed based on client_id and query iteration number
-            # to guarantee repeatibility of order between runs but still
-            # good randomness for different clients and different query iterations.
-            #random.seed(self.client_id*9973 + queryIterNum*19997)
-            #random.shuffle(ch2_queries_perm)
             #logging.info(f"{self.schema=}")
             #logging.info(f"{self.analyticalQueries=}")
 
-            ch2_queries_perm = constants.CH2_QUERIES_PERM[self.client_id]
+            # Repeatable order per client; with --vary-query-order also per query iteration
+            orderIteration = queryIterNum if bool(int(os.environ.get("VARY_QUERY_ORDER", "0"))) else 0
+            ch2_queries_perm = queryorder.makeQueryPermutation(int(os.environ.get("QUERY_SEED", "0")), self.client_id, orderIteration)
             if self.schema == constants.CH2_DRIVER_SCHEMA["CH2"]:
                 ch2_queries = constants.CH2_MONGO_QUERIES
             else:
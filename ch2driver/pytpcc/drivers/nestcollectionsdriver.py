@@ -36,24 +36,38 @@ import logging
 import re
 import socket
 import subprocess
+import threading
 from pprint import pprint,pformat
 
 import json
 import requests
 import time
+import uuid
 import urllib3
 from urllib3.poolmanager import PoolManager
 
 import constants
 from .abstractdriver import *
+from .noderouter import QueryNodeRouter
+from .preparedstatements import PreparedStatementManager
+from .freshnessprobe import FreshnessProbe
+from .readyourwrites import ReadYourWrites
+from util.jsonstream import StreamedResponse
+from util import querytemplates, queryorder
+from util.results import parseMetrics, parseDuration
 import time
 from datetime import timedelta
 import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 import couchbase.collection
 from couchbase.cluster import Cluster
 from couchbase.options import ClusterOptions, ClusterTimeoutOptions
 from couchbase.auth import PasswordAuthenticator
+from couchbase.durability import DurabilityLevel, ServerDurability
+from couchbase.exceptions import DocumentNotFoundException, TransactionCommitAmbiguous, TransactionExpired, TransactionFailed
+from couchbase.n1ql import QueryScanConsistency
+from couchbase.options import QueryOptions, TransactionOptions
 
 CH2_TXN_QUERIES = {
     "DELIVERY": {
@@ -61,12 +75,18 @@ CH2_TXN_QUERIES = {
         "rollbackWork":"ROLLBACK WORK",
         "commitWork":"COMMIT WORK",
         "getNewOrder": "SELECT no_o_id FROM default:bench.ch2.neworder WHERE no_d_id = $1 AND no_w_id = $2 AND no_o_id > -1 LIMIT 1", #
+        "getNewOrderKey": "SELECT META(n).id AS k, n.no_o_id FROM default:bench.ch2.neworder n WHERE n.no_d_id = $1 AND n.no_w_id = $2 AND n.no_o_id > -1 LIMIT 1", # d_id, w_id
         "deleteNewOrder": "DELETE FROM default:bench.ch2.neworder WHERE no_d_id = $1 AND no_w_id = $2 AND no_o_id = $3", # d_id, w_id, no_o_id
         "getCId": "SELECT o_c_id FROM default:bench.ch2.orders WHERE o_id = $1 AND o_d_id = $2 AND o_w_id = $3", # no_o_id, d_id, w_id
         "updateOrders": "UPDATE default:bench.ch2.orders SET o_carrier_id = $1 WHERE o_id = $2 AND o_d_id = $3 AND o_w_id = $4", # o_carrier_id, no_o_id, d_id, w_id
         "updateOrderLine": "UPDATE default:bench.ch2.orders SET ol.ol_delivery_d = $1 FOR ol IN o_orderline END WHERE o_id = $2 AND o_d_id = $3 AND o_w_id = $4", # o_entry_d, no_o_id, d_id, w_id
         "sumOLAmount": "SELECT VALUE (SELECT SUM(ol.ol_amount) as sum_ol_amount FROM o.o_orderline ol)[0] FROM default:bench.ch2.orders o where o.o_id = $1 and o.o_d_id = $2 and o.o_w_id = $3",
         "updateCustomer": "UPDATE default:bench.ch2.customer USE KEYS [(to_string($4) || '.' || to_string($3) || '.' ||  to_string($2))] SET c_balance = c_balance + $1 ", # ol_total, c_id, d_id, w_id
+        "getNewOrdersBatch": "SELECT no_d_id, MIN([no_o_id, META().id]) AS no FROM default:bench.ch2.neworder WHERE no_d_id >= 1 AND no_d_id <= 10 AND no_w_id = $1 AND no_o_id > -1 GROUP BY no_d_id", # w_id
+        "getOrdersBatch": "SELECT META(o).id AS k, o.o_d_id, o.o_c_id, (SELECT RAW SUM(ol.ol_amount) FROM o.o_orderline ol)[0] AS ol_total FROM default:bench.ch2.orders o USE KEYS $1", # [o_w_id.o_d_id.o_id, ...]
+        "deleteNewOrdersBatch": "DELETE FROM default:bench.ch2.neworder USE KEYS $1", # [neworder key, ...]
+        "updateOrdersBatch": "UPDATE default:bench.ch2.orders USE KEYS $2 SET o_carrier_id = $1, ol.ol_delivery_d = $3 FOR ol IN o_orderline END", # o_carrier_id, [o_w_id.o_d_id.o_id, ...], ol_delivery_d
+        "updateCustomersBatch": "UPDATE default:bench.ch2.customer c USE KEYS OBJECT_NAMES($1) SET c.c_balance = c.c_balance + $1.[META(c).id]", # {c_w_id.c_d_id.c_id: ol_total, ...}
     },
     "NEW_ORDER": {
         "beginWork": "BEGIN WORK",
@@ -77,9 +97,12 @@ CH2_TXN_QUERIES = {
         "incrementNextOrderId": "UPDATE default:bench.ch2.district SET d_next_o_id = $1 WHERE d_id = $2 AND d_w_id = $3", # d_next_o_id, d_id, w_id
         "getCustomer": "SELECT c_discount, c_last, c_credit FROM default:bench.ch2.customer USE KEYS [(to_string($1) || '.' ||  to_string($2) || '.' ||  to_string($3))]", # w_id, d_id, c_id
         "createOrder": "INSERT INTO default:bench.ch2.orders (KEY, VALUE) VALUES (TO_STRING($3) || '.' ||  TO_STRING($2) || '.' ||  TO_STRING($1), {\\\"o_id\\\":$1, \\\"o_d_id\\\":$2, \\\"o_w_id\\\":$3, \\\"o_c_id\\\":$4, \\\"o_entry_d\\\":$5, \\\"o_carrier_id\\\":$6, \\\"o_ol_cnt\\\":$7, \\\"o_all_local\\\":$8})", # d_next_o_id, d_id, w_id, c_id, o_entry_d, o_carrier_id, o_ol_cnt, o_all_local
+        "createOrderDocument": "INSERT INTO default:bench.ch2.orders (KEY, VALUE) VALUES ($1, $2)", # o_w_id.o_d_id.o_id, order document with o_orderline
         "createNewOrder": "INSERT INTO default:bench.ch2.neworder(KEY, VALUE) VALUES(TO_STRING($2)|| '.' || TO_STRING($3)|| '.' || TO_STRING($1), {\\\"no_o_id\\\":$1,\\\"no_d_id\\\":$2,\\\"no_w_id\\\":$3})",
         "getItemInfo": "SELECT i_price, i_name, i_data FROM default:bench.ch2.item USE KEYS [to_string($1)]", # ol_i_id
         "getStockInfo": "SELECT s_quantity, s_data, s_ytd, s_order_cnt, s_remote_cnt, s_dist_%02d FROM default:bench.ch2.stock USE KEYS [TO_STRING($2)|| '.' || TO_STRING($1)]", # d_id, ol_i_id, ol_supply_w_id
+        "getItemInfoBatch": "SELECT META(i).id AS k, i.i_price, i.i_name, i.i_data FROM default:bench.ch2.item i USE KEYS $1", # [ol_i_id, ...]
+        "getStockInfoBatch": "SELECT META(s).id AS k, s.s_quantity, s.s_data, s.s_ytd, s.s_order_cnt, s.s_remote_cnt, s.s_dist_%02d FROM default:bench.ch2.stock s USE KEYS $1", # d_id, [ol_supply_w_id.ol_i_id, ...]
         "updateStock": "UPDATE default:bench.ch2.stock USE KEYS [to_string($6) || '.' || to_string($5)] SET s_quantity = $1, s_ytd = $2, s_order_cnt = $3, s_remote_cnt = $4 ", # s_quantity, s_order_cnt, s_remote_cnt, ol_i_id, ol_supply_w_id
         "createOrderLine": "UPSERT INTO default:bench.ch2.orders(KEY, VALUE) VALUES(TO_STRING($3)|| '.' || TO_STRING($2)|| '.' || TO_STRING($1), { \\\"o_id\\\":$1, \\\"o_d_id\\\":$2, \\\"o_w_id\\\":$3, \\\"o_orderline\\\": [{\\\"ol_number\\\":$4, \\\"ol_i_id\\\":$5, \\\"ol_supply_w_id\\\":$6, \\\"ol_delivery_d\\\":$7, \\\"ol_quantity\\\":$8, \\\"ol_amount\\\":$9, \\\"ol_dist_info\\\":$10}]})"
     },
@@ -121,12 +144,18 @@ CH2PP_TXN_QUERIES = {
         "rollbackWork":"ROLLBACK WORK",
         "commitWork":"COMMIT WORK",
         "getNewOrder": "SELECT no_o_id FROM default:bench.ch2pp.neworder WHERE no_d_id = $1 AND no_w_id = $2 AND no_o_id > -1 LIMIT 1", #
+        "getNewOrderKey": "SELECT META(n).id AS k, n.no_o_id FROM default:bench.ch2pp.neworder n WHERE n.no_d_id = $1 AND n.no_w_id = $2 AND n.no_o_id > -1 LIMIT 1", # d_id, w_id
         "deleteNewOrder": "DELETE FROM default:bench.ch2pp.neworder WHERE no_d_id = $1 AND no_w_id = $2 AND no_o_id = $3", # d_id, w_id, no_o_id
         "getCId": "SELECT o_c_id FROM default:bench.ch2pp.orders WHERE o_id = $1 AND o_d_id = $2 AND o_w_id = $3", # no_o_id, d_id, w_id
         "updateOrders": "UPDATE default:bench.ch2pp.orders SET o_carrier_id = $1 WHERE o_id = $2 AND o_d_id = $3 AND o_w_id = $4", # o_carrier_id, no_o_id, d_id, w_id
         "updateOrderLine": "UPDATE default:bench.ch2pp.orders SET ol.ol_delivery_d = $1 FOR ol IN o_orderline END WHERE o_id = $2 AND o_d_id = $3 AND o_w_id = $4", # o_entry_d, no_o_id, d_id, w_id
         "sumOLAmount": "SELECT VALUE (SELECT SUM(ol.ol_amount) as sum_ol_amount FROM o.o_orderline ol)[0] FROM default:bench.ch2pp.orders o where o.o_id = $1 and o.o_d_id = $2 and o.o_w_id = $3",
         "updateCustomer": "UPDATE default:bench.ch2pp.customer USE KEYS [(to_string($4) || '.' || to_string($3) || '.' ||  to_string($2))] SET c_balance = c_balance + $1 ", # ol_total, c_id, d_id, w_id
+        "getNewOrdersBatch": "SELECT no_d_id, MIN([no_o_id, META().id]) AS no FROM default:bench.ch2pp.neworder WHERE no_d_id >= 1 AND no_d_id <= 10 AND no_w_id = $1 AND no_o_id > -1 GROUP BY no_d_id", # w_id
+        "getOrdersBatch": "SELECT META(o).id AS k, o.o_d_id, o.o_c_id, (SELECT RAW SUM(ol.ol_amount) FROM o.o_orderline ol)[0] AS ol_total FROM default:bench.ch2pp.orders o USE KEYS $1", # [o_w_id.o_d_id.o_id, ...]
+        "deleteNewOrdersBatch": "DELETE FROM default:bench.ch2pp.neworder USE KEYS $1", # [neworder key, ...]
+        "updateOrdersBatch": "UPDATE default:bench.ch2pp.orders USE KEYS $2 SET o_carrier_id = $1, ol.ol_delivery_d = $3 FOR ol IN o_orderline END", # o_carrier_id, [o_w_id.o_d_id.o_id, ...], ol_delivery_d
+        "updateCustomersBatch": "UPDATE default:bench.ch2pp.customer c USE KEYS OBJECT_NAMES($1) SET c.c_balance = c.c_balance + $1.[META(c).id]", # {c_w_id.c_d_id.c_id: ol_total, ...}
     },
     "NEW_ORDER": {
         "beginWork": "BEGIN WORK",
@@ -137,9 +166,12 @@ CH2PP_TXN_QUERIES = {
         "incrementNextOrderId": "UPDATE default:bench.ch2pp.district SET d_next_o_id = $1 WHERE d_id = $2 AND d_w_id = $3", # d_next_o_id, d_id, w_id
         "getCustomer": "SELECT c_discount, c_name.c_last, c_credit FROM default:bench.ch2pp.customer USE KEYS [(to_string($1) || '.' ||  to_string($2) || '.' ||  to_string($3))]", # w_id, d_id, c_id
         "createOrder": "INSERT INTO default:bench.ch2pp.orders (KEY, VALUE) VALUES (TO_STRING($3) || '.' ||  TO_STRING($2) || '.' ||  TO_STRING($1), {\\\"o_id\\\":$1, \\\"o_d_id\\\":$2, \\\"o_w_id\\\":$3, \\\"o_c_id\\\":$4, \\\"o_entry_d\\\":$5, \\\"o_carrier_id\\\":$6, \\\"o_ol_cnt\\\":$7, \\\"o_all_local\\\":$8})", # d_next_o_id, d_id, w_id, c_id, o_entry_d, o_carrier_id, o_ol_cnt, o_all_local
+        "createOrderDocument": "INSERT INTO default:bench.ch2pp.orders (KEY, VALUE) VALUES ($1, $2)", # o_w_id.o_d_id.o_id, order document with o_orderline
         "createNewOrder": "INSERT INTO default:bench.ch2pp.neworder(KEY, VALUE) VALUES(TO_STRING($2)|| '.' || TO_STRING($3)|| '.' || TO_STRING($1), {\\\"no_o_id\\\":$1,\\\"no_d_id\\\":$2,\\\"no_w_id\\\":$3})",
         "getItemInfo": "SELECT i_price, i_name, i_data FROM default:bench.ch2pp.item USE KEYS [to_string($1)]", # ol_i_id
         "getStockInfo": "SELECT s_quantity, s_data, s_ytd, s_order_cnt, s_remote_cnt, s_dists FROM default:bench.ch2pp.stock USE KEYS [TO_STRING($2)|| '.' || TO_STRING($1)]", # d_id, ol_i_id, ol_supply_w_id
+        "getItemInfoBatch": "SELECT META(i).id AS k, i.i_price, i.i_name, i.i_data FROM default:bench.ch2pp.item i USE KEYS $1", # [ol_i_id, ...]
+        "getStockInfoBatch": "SELECT META(s).id AS k, s.s_quantity, s.s_data, s.s_ytd, s.s_order_cnt, s.s_remote_cnt, s.s_dists FROM default:bench.ch2pp.stock s USE KEYS $1", # d_id, [ol_supply_w_id.ol_i_id, ...]
         "updateStock": "UPDATE default:bench.ch2pp.stock USE KEYS [to_string($6) || '.' || to_string($5)] SET s_quantity = $1, s_ytd = $2, s_order_cnt = $3, s_remote_cnt = $4 ", # s_quantity, s_order_cnt, s_remote_cnt, ol_i_id, ol_supply_w_id
         "createOrderLine": "UPSERT INTO default:bench.ch2pp.orders(KEY, VALUE) VALUES(TO_STRING($3)|| '.' || TO_STRING($2)|| '.' || TO_STRING($1), { \\\"o_id\\\":$1, \\\"o_d_id\\\":$2, \\\"o_w_id\\\":$3, \\\"o_orderline\\\": [{\\\"ol_number\\\":$4, \\\"ol_i_id\\\":$5, \\\"ol_supply_w_id\\\":$6, \\\"ol_delivery_d\\\":$7, \\\"ol_quantity\\\":$8, \\\"ol_amount\\\":$9, \\\"ol_dist_info\\\":$10}]})"
     },
@@ -175,7 +207,275 @@ CH2PP_TXN_QUERIES = {
     },
 }
 
+## Reads of a transaction that depend only on its input parameters (and, for DELIVERY, on the
+## no_o_id read before them) and not on each other; the writes that use their results are issued afterwards.
+TXN_INDEPENDENT_READS = {
+    "DELIVERY": ("getCId", "sumOLAmount"),
+    "NEW_ORDER": ("getItemInfo", "getItemInfoBatch", "getWarehouseTaxRate", "getDistrict", "getCustomer"),
+    "PAYMENT": ("getCustomerByCustomerId", "getCustomersByLastName", "getWarehouse", "getDistrict"),
+}
+
+## Independent reads of fields no transaction writes (items, tax rates, customer discount and
+## credit, warehouse and district names and addresses). A N1QL transaction must not take
+## concurrent requests, so with PARALLEL_READS these are issued concurrently outside of the
+## transaction while the other reads run in it.
+TXN_STATIC_READS = {
+    "NEW_ORDER": ("getItemInfo", "getItemInfoBatch", "getWarehouseTaxRate", "getCustomer"),
+    "PAYMENT": ("getWarehouse", "getDistrict"),
+}
+
+## N1QL durability levels mapped to the ones of SDK transactions (--txn-mode kv)
+KV_DURABILITY_LEVELS = {
+    "none": DurabilityLevel.NONE,
+    "majority": DurabilityLevel.MAJORITY,
+    "majorityAndPersistActive": DurabilityLevel.MAJORITY_AND_PERSIST_TO_ACTIVE,
+    "persistToMajority": DurabilityLevel.PERSIST_TO_MAJORITY,
+}
+
+class KVAbort(Exception):
+    """Raised from the logic of an SDK transaction to roll it back with the given status"""
+    def __init__(self, status):
+        super(KVAbort, self).__init__(status)
+        self.status = status
+
+## JavaScript library behind --txn-mode udf. Each TPC-C transaction runs the statements of
+## CH2_TXN_QUERIES/CH2PP_TXN_QUERIES (injected as Q, with the constants as C) inside one
+## EXECUTE FUNCTION call. Errors are returned instead of thrown so that retvalN1QLQuery
+## can map them like the errors of the multi-statement path.
+TXN_UDF_LIBRARY = r'''
+function rows(stmt, params) {
+    var it = N1QL(stmt, params);
+    var res = [];
+    for (const row of it) {
+        res.push(row);
+    }
+    it.close();
+    return res;
+}
+
+function asError(e) {
+    try {
+        return JSON.parse(e.message);
+    } catch (e2) {
+        return {"code": e.code, "msg": String(e.message || e), "cause": e.cause};
+    }
+}
+
+function rollback(q, e) {
+    try {
+        rows(q.rollbackWork, []);
+    } catch (e2) {
+    }
+    return {"status": "failed", "errors": [asError(e)]};
+}
+
+function delivery(w_id, o_carrier_id, ol_delivery_d) {
+    var q = Q.DELIVERY;
+    var result = [];
+    var status = "";
+    var failure = null;
+    for (var d_id = 1; d_id <= C.DISTRICTS_PER_WAREHOUSE; d_id++) {
+        rows(q.beginWork, []);
+        try {
+            var newOrder = rows(q.getNewOrder, [d_id, w_id]);
+            if (newOrder.length == 0) {
+                rows(q.rollbackWork, []);
+                continue;
+            }
+            var no_o_id = newOrder[0].no_o_id;
+            var c_id = rows(q.getCId, [no_o_id, d_id, w_id])[0].o_c_id;
+            var ol_total = rows(q.sumOLAmount, [no_o_id, d_id, w_id])[0].sum_ol_amount;
+            rows(q.deleteNewOrder, [d_id, w_id, no_o_id]);
+            rows(q.updateOrders, [o_carrier_id, no_o_id, d_id, w_id]);
+            rows(q.updateOrderLine, [ol_delivery_d, no_o_id, d_id, w_id]);
+            rows(q.updateCustomer, [ol_total, c_id, d_id, w_id]);
+            rows(q.commitWork, []);
+            result.push([d_id, no_o_id]);
+            status = "success";
+        } catch (e) {
+            // Each district is its own transaction: go on with the next one
+            // and report the first failure
+            var f = rollback(q, e);
+            if (failure == null) {
+                failure = f;
+            }
+        }
+    }
+    if (failure != null) {
+        failure.result = result;
+        return failure;
+    }
+    return {"status": status, "result": result};
+}
+
+function newOrder(w_id, d_id, c_id, o_entry_d, i_ids, i_w_ids, i_qtys) {
+    var q = Q.NEW_ORDER;
+    rows(q.beginWork, []);
+    try {
+        var all_local = true;
+        var items = [];
+        for (var i = 0; i < i_ids.length; i++) {
+            all_local = all_local && i_w_ids[i] == w_id;
+            var rs = rows(q.getItemInfo, [i_ids[i]]);
+            if (rs.length == 0) {
+                // TPCC defines 1% of neworder gives a wrong itemid, causing rollback.
+                rows(q.rollbackWork, []);
+                return {"status": "assert"};
+            }
+            items.push(rs[0]);
+        }
+        var customer_info = rows(q.getWarehouseTaxRate, [w_id]);
+        var w_tax = customer_info[0].w_tax;
+        var district = rows(q.getDistrict, [d_id, w_id])[0];
+        var c_discount = rows(q.getCustomer, [w_id, d_id, c_id])[0].c_discount;
+        var d_next_o_id = district.d_next_o_id;
+
+        rows(q.incrementNextOrderId, [d_next_o_id + 1, d_id, w_id]);
+        rows(q.createNewOrder, [d_next_o_id, d_id, w_id]);
+
+        // The order document is written once with all its order lines after the stock updates
+        var order = {"o_id": d_next_o_id, "o_d_id": d_id, "o_w_id": w_id, "o_c_id": c_id, "o_entry_d": o_entry_d,
+                     "o_carrier_id": C.NULL_CARRIER_ID, "o_ol_cnt": i_ids.length, "o_all_local": all_local, "o_orderline": []};
+
+        var item_data = [];
+        var total = 0;
+        for (var i = 0; i < i_ids.length; i++) {
+            var ol_supply_w_id = i_w_ids[i];
+            var ol_quantity = i_qtys[i];
+            var stock = rows(q.getStockInfo[d_id], [i_ids[i], ol_supply_w_id]);
+            if (stock.length == 0) {
+                rows(q.rollbackWork, []);
+                return {"status": "assert"};
+            }
+            var s = stock[0];
+            var s_dist_xx = C.NESTED_DISTS ? s.s_dists[d_id - 1] : s["s_dist_" + (d_id < 10 ? "0" : "") + d_id];
+            s.s_ytd += ol_quantity;
+            if (s.s_quantity >= ol_quantity + 10) {
+                s.s_quantity = s.s_quantity - ol_quantity;
+            } else {
+                s.s_quantity = s.s_quantity + 91 - ol_quantity;
+            }
+            s.s_order_cnt += 1;
+            if (ol_supply_w_id != w_id) {
+                s.s_remote_cnt += 1;
+            }
+            rows(q.updateStock, [s.s_quantity, s.s_ytd, s.s_order_cnt, s.s_remote_cnt, i_ids[i], ol_supply_w_id]);
+
+            var brand_generic = (items[i].i_data.indexOf(C.ORIGINAL_STRING) != -1 && s.s_data.indexOf(C.ORIGINAL_STRING) != -1) ? "B" : "G";
+            var ol_amount = ol_quantity * items[i].i_price;
+            total += ol_amount;
+            order.o_orderline.push({"ol_number": i + 1, "ol_i_id": i_ids[i], "ol_supply_w_id": ol_supply_w_id, "ol_delivery_d": o_entry_d,
+                                    "ol_quantity": ol_quantity, "ol_amount": ol_amount, "ol_dist_info": s_dist_xx});
+            item_data.push([items[i].i_name, s.s_quantity, brand_generic, items[i].i_price, ol_amount]);
+        }
+        rows(q.createOrderDocument, [w_id + "." + d_id + "." + d_next_o_id, order]);
+        rows(q.commitWork, []);
+        total *= (1 - c_discount) * (1 + w_tax + district.d_tax);
+        return {"status": "success", "result": [customer_info, [[w_tax, district.d_tax, d_next_o_id, total]], item_data]};
+    } catch (e) {
+        return rollback(q, e);
+    }
+}
+
+function orderStatus(w_id, d_id, c_id, c_last) {
+    var q = Q.ORDER_STATUS;
+    rows(q.beginWork, []);
+    try {
+        var customers;
+        if (c_id != null) {
+            customers = rows(q.getCustomerByCustomerId, [w_id, d_id, c_id]);
+        } else {
+            customers = rows(q.getCustomersByLastName, [w_id, d_id, c_last]);
+        }
+        if (customers.length == 0) {
+            rows(q.rollbackWork, []);
+            return {"status": "assert"};
+        }
+        // Get the midpoint customer's id
+        var customer = customers[Math.floor((customers.length - 1) / 2)];
+        c_id = customer.c_id;
+        var order = rows(q.getLastOrder, [w_id, d_id, c_id]);
+        var orderLines = [];
+        if (order.length > 0) {
+            orderLines = rows(q.getOrderLines, [w_id, d_id, order[0].o_id]);
+        }
+        rows(q.commitWork, []);
+        return {"status": "success", "result": [customer, order, orderLines]};
+    } catch (e) {
+        return rollback(q, e);
+    }
+}
+
+function payment(w_id, d_id, h_amount, c_w_id, c_d_id, c_id, c_last, h_date) {
+    var q = Q.PAYMENT;
+    rows(q.beginWork, []);
+    try {
+        var customers;
+        if (c_id != null) {
+            customers = rows(q.getCustomerByCustomerId, [w_id, d_id, c_id]);
+        } else {
+            customers = rows(q.getCustomersByLastName, [w_id, d_id, c_last]);
+        }
+        if (customers.length == 0) {
+            rows(q.rollbackWork, []);
+            return {"status": "assert"};
+        }
+        // Get the midpoint customer's id
+        var customer = customers[Math.floor((customers.length - 1) / 2)];
+        c_id = customer.c_id;
+        var c_balance = customer.c_balance - h_amount;
+        var c_ytd_payment = customer.c_ytd_payment + h_amount;
+        var c_payment_cnt = customer.c_payment_cnt + 1;
+
+        var warehouse = rows(q.getWarehouse, [w_id]);
+        var district = rows(q.getDistrict, [w_id, d_id]);
+        rows(q.updateWarehouseBalance, [h_amount, w_id]);
+        rows(q.updateDistrictBalance, [h_amount, w_id, d_id]);
+        if (customer.c_credit == C.BAD_CREDIT) {
+            var newData = [c_id, c_d_id, c_w_id, d_id, w_id, h_amount].join(" ");
+            var c_data = (newData + "|" + customer.c_data).substring(0, C.MAX_C_DATA);
+            rows(q.updateBCCustomer, [c_balance, c_ytd_payment, c_payment_cnt, c_data, c_w_id, c_d_id, c_id]);
+        } else {
+            rows(q.updateGCCustomer, [c_balance, c_ytd_payment, c_payment_cnt, c_w_id, c_d_id, c_id]);
+        }
+        // Concatenate w_name, four spaces, d_name
+        var h_data = warehouse[0].w_name + "    " + district[0].d_name;
+        rows(q.insertHistory, [c_id, c_d_id, c_w_id, d_id, w_id, h_date, h_amount, h_data]);
+        rows(q.commitWork, []);
+        return {"status": "success", "result": [warehouse, district, customer]};
+    } catch (e) {
+        return rollback(q, e);
+    }
+}
+
+function stockLevel(w_id, d_id, threshold) {
+    var q = Q.STOCK_LEVEL;
+    try {
+        var o_id = rows(q.getOId, [w_id, d_id])[0].d_next_o_id;
+        var result = rows(q.getStockCount, [w_id, d_id, o_id, o_id - 20, w_id, threshold]);
+        return {"status": "success", "result": result[0].cnt_ol_i_id};
+    } catch (e) {
+        return {"status": "failed", "errors": [asError(e)]};
+    }
+}
+'''
+
+## JavaScript function and parameters of each transaction in TXN_UDF_LIBRARY
+TXN_UDFS = {
+    "DELIVERY": ("delivery", ["w_id", "o_carrier_id", "ol_delivery_d"]),
+    "NEW_ORDER": ("newOrder", ["w_id", "d_id", "c_id", "o_entry_d", "i_ids", "i_w_ids", "i_qtys"]),
+    "ORDER_STATUS": ("orderStatus", ["w_id", "d_id", "c_id", "c_last"]),
+    "PAYMENT": ("payment", ["w_id", "d_id", "h_amount", "c_w_id", "c_d_id", "c_id", "c_last", "h_date"]),
+    "STOCK_LEVEL": ("stockLevel", ["w_id", "d_id", "threshold"]),
+}
+
 globpool = None
+noderouter = None
+leanrequests = False
+leanheaders = None
+leanprefixes = { }
+requeststats = { }
+requeststatslock = threading.Lock()
 gcreds = '[{"user":"' + os.environ["USER_ID"] + '","pass":"' + os.environ["PASSWORD"] + '"}]'
 
 def pysdk_init(self):
@@ -187,12 +487,43 @@ def pysdk_init(self):
     if bool(int(os.environ['TLS'])):
         endpoint = 'couchbases://{}?ssl=no_verify'.format(str_data_node)
     cluster = Cluster(endpoint, cluster_opts)
+    self.cluster = cluster
     bucket = cluster.bucket(constants.CH2_BUCKET)
     scope = bucket.scope(self.schema)
     self.collections = {}
     for tableName in constants.ALL_TABLES:
         self.collections[tableName] = scope.collection(constants.COLLECTIONS_DICT[tableName])
 
+def makePool():
+    return PoolManager(
+        10,
+        retries=urllib3.Retry(10),
+        maxsize=60,
+        cert_reqs="CERT_NONE",
+        socket_options=[  # Set TCP keep-alive options for long running analytics queries
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+#            (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 120),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 30),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 20),
+        ],
+    )
+
+def nodeRequest(node, method, url, **kwargs):
+    """Send a request to a query or analytics node, through the router when there is one"""
+    if noderouter != None:
+        return noderouter.request(node, method, url, **kwargs)
+    return globpool.request(method, url, **kwargs)
+
+def recordRequestStats(name, serialize=None, parse=None):
+    """Account the client side time spent encoding the request and decoding the response of a prepared statement"""
+    with requeststatslock:
+        stats = requeststats.setdefault(name, {"requests": 0, "serialize_time": 0.0, "parse_time": 0.0})
+        if serialize != None:
+            stats["serialize_time"] += serialize
+        if parse != None:
+            stats["requests"] += 1
+            stats["parse_time"] += parse
+
 def TxTimeoutFactor(txtimeout, factor):
     tx = float(txtimeout)
     if tx == 0 or factor == 0:
@@ -234,14 +565,26 @@ def retvalN1QLQuery(prefix, rj):
 ## runNQuery
 ## ----------------------------------------------
 
-def runNQuery(prefix, query, txid, txtimeout, randomhost):
+def runNQuery(prefix, query, txid, txtimeout, randomhost, scanConsistency=None):
+        if scanConsistency == None:
+            scanConsistency = os.environ["SCAN_CONSISTENCY"]
+        if leanrequests:
+            fields = {'durability_level': os.environ["DURABILITY_LEVEL"], 'scan_consistency': scanConsistency}
+            if txtimeout != "":
+                fields['txtimeout'] = txtimeout
+            if txid != "":
+                fields['txid'] = txid
+            body = n1ql_execute_lean(randomhost, query, fields, None)
+            return retvalN1QLQuery(prefix, body)
+        start = time.time()
         stmt = generate_prepared_query(query)
         stmt['durability_level'] = os.environ["DURABILITY_LEVEL"]
-        stmt['scan_consistency'] = os.environ["SCAN_CONSISTENCY"]
+        stmt['scan_consistency'] = scanConsistency
         if txtimeout != "":
             stmt['txtimeout'] = txtimeout
         if txid != "":
             stmt['txid'] = txid
+        recordRequestStats(query, serialize=time.time() - start)
         body = n1ql_execute(randomhost, stmt)
         return retvalN1QLQuery(prefix, body)
 
@@ -266,6 +609,13 @@ def doQueryParam(query, param, txid, randomhost):
         return retvalN1QLQuery("", body)
 
 def runNQueryParam(query, param, txid, randomhost):
+        if leanrequests:
+            fields = { }
+            if txid != "":
+                fields['txid'] = txid
+            body = n1ql_execute_lean(randomhost, query, fields, param if len(param) > 0 else None)
+            return retvalN1QLQuery("", body)
+        start = time.time()
         stmt = generate_prepared_query(query)
         if txid != "":
             stmt['txid'] = txid
@@ -275,14 +625,54 @@ def runNQueryParam(query, param, txid, randomhost):
              for p in param:
                  if isinstance(p, (bool)):
                      qparam.append(p)
+                 elif p == None or isinstance(p, (list, dict)):
+                     qparam.append(p)
                  elif isinstance(p,(int, float)) and not isinstance(p, (bool)):
                      qparam.append(p)
                  else:
                      qparam.append(str(p))
              stmt['args'] = json.JSONEncoder().encode(qparam)
+        recordRequestStats(query, serialize=time.time() - start)
         body = n1ql_execute(randomhost, stmt)
         return retvalN1QLQuery("", body)
 
+def deployTxnUDFs(query_node, schema, txnQueries):
+    """Upload TXN_UDF_LIBRARY with the statements of the schema and create one function per transaction.
+    Returns the names of the functions by transaction."""
+    q = { }
+    for txn, queries in txnQueries.items():
+        q[txn] = { }
+        for query, statement in queries.items():
+            stmt = statement.replace('\\"', '"')
+            if schema == constants.CH2_DRIVER_SCHEMA["CH2P"]:
+                stmt = re.sub("default:bench\.ch2pp\.", "default:bench.ch2p.", stmt)
+            if query in ("getStockInfo", "getStockInfoBatch"):
+                stmt = dict((i, stmt % i if schema == constants.CH2_DRIVER_SCHEMA["CH2"] else stmt) for i in range(1, 11))
+            q[txn][query] = stmt
+    c = {"DISTRICTS_PER_WAREHOUSE": constants.DISTRICTS_PER_WAREHOUSE, "NULL_CARRIER_ID": constants.NULL_CARRIER_ID,
+         "ORIGINAL_STRING": constants.ORIGINAL_STRING, "BAD_CREDIT": constants.BAD_CREDIT, "MAX_C_DATA": constants.MAX_C_DATA,
+         "NESTED_DISTS": schema != constants.CH2_DRIVER_SCHEMA["CH2"]}
+    library = "%s_txn" % (schema)
+    source = "var Q = %s;\nvar C = %s;\n%s" % (json.dumps(q), json.dumps(c), TXN_UDF_LIBRARY)
+
+    protocol = 'http://'
+    if bool(int(os.environ['TLS'])):
+        protocol = 'https://'
+    headers = urllib3.make_headers(basic_auth=os.environ["USER_ID"] + ":" + os.environ["PASSWORD"])
+    response = globpool.request('POST', "{}{}/evaluator/v1/libraries/{}".format(protocol, query_node, library), body=source, headers=headers)
+    if response.status != 200:
+        raise RuntimeError("Failed to deploy the %s library: %s" % (library, response.data.decode('utf8')))
+
+    functions = { }
+    for txn, (function, params) in TXN_UDFS.items():
+        name = "%s_%s" % (library, function)
+        stmt = 'CREATE OR REPLACE FUNCTION %s(%s) LANGUAGE JAVASCRIPT AS "%s" AT "%s"' % (name, ", ".join(params), function, library)
+        body = n1ql_execute(query_node, {"statement": stmt})
+        if body.get('status') != "success":
+            raise RuntimeError("Failed to create function %s: %s" % (name, body.get('errors')))
+        functions[txn] = name
+    return functions
+
 def generate_prepared_query (name):
     return {'prepared': '"' + name + '"'}
 
@@ -303,11 +693,14 @@ def n1ql_execute(node, stmt, query=1):
         url = "{}{}/analytics/service".format(protocol, node)
     try:
         if query:
-            response = globpool.request('POST', url, fields=stmt, encode_multipart=False)
+            response = nodeRequest(node, 'POST', url, fields=stmt, encode_multipart=False)
         else:
-            response = globpool.request('POST', url, fields=stmt, headers=headers, encode_multipart=False)
+            response = nodeRequest(node, 'POST', url, fields=stmt, headers=headers, encode_multipart=False)
         response.read(cache_content=False)
+        start = time.time()
         body = json.loads(response.data.decode('utf8'))
+        if query and 'prepared' in stmt:
+            recordRequestStats(stmt['prepared'].strip('"'), parse=time.time() - start)
         if body['status'] != "success":
             logging.debug("%s --- %s" % (stmt, json.JSONEncoder().encode(body)))
         return body
@@ -316,6 +709,93 @@ def n1ql_execute(node, stmt, query=1):
         logging.debug(traceback.format_exc())
     return {}
 
+def n1ql_stream(node, stmt, checksum=False):
+    """Run an analytics statement and consume the response as it arrives (--stream-analytics).
+    Returns the response without its results, the number of result rows, their checksum
+    (None unless asked for) and the seconds spent receiving the body."""
+    headers = urllib3.make_headers(
+        basic_auth=os.environ["USER_ID_ANALYTICS"] + ":" + os.environ["PASSWORD_ANALYTICS"]
+    )
+    protocol = 'http://'
+    if bool(int(os.environ['TLS'])):
+        protocol = 'https://'
+    url = "{}{}/analytics/service".format(protocol, node)
+    try:
+        response = nodeRequest(node, 'POST', url, fields=stmt, headers=headers, encode_multipart=False, preload_content=False)
+        start = time.time()
+        try:
+            streamed = StreamedResponse(response.stream(constants.ANALYTICS_STREAM_CHUNK_SIZE), checksum)
+            ## The parser stops at the closing brace: read what may follow it before reusing the connection
+            response.drain_conn()
+        except Exception:
+            ## The rest of the body is still on the connection: close it rather than return it to the pool
+            response.close()
+            raise
+        finally:
+            response.release_conn()
+        receive = time.time() - start
+        if streamed.body.get('status') != "success":
+            logging.debug("%s --- %s" % (stmt, json.JSONEncoder().encode(streamed.body)))
+        return streamed.body, streamed.rowCount, streamed.checksum, receive
+    except Exception as ex:
+        logging.info("Exception occured when executing query: %s: %s" % (type(ex).__name__, ex))
+        logging.debug(traceback.format_exc())
+    return {}, 0, None, 0.0
+
+def analytics_cancel(node, clientContextId):
+    """Ask the analytics service to cancel the running request with clientContextId.
+    Returns True if the request was still running."""
+    headers = urllib3.make_headers(
+        basic_auth=os.environ["USER_ID_ANALYTICS"] + ":" + os.environ["PASSWORD_ANALYTICS"]
+    )
+    protocol = 'http://'
+    if bool(int(os.environ['TLS'])):
+        protocol = 'https://'
+    url = "{}{}/analytics/admin/active_requests".format(protocol, node)
+    try:
+        response = nodeRequest(node, 'DELETE', url, fields={"client_context_id": clientContextId}, headers=headers)
+        return response.status == 200
+    except Exception as ex:
+        logging.info("Exception occured when cancelling query %s: %s: %s" % (clientContextId, type(ex).__name__, ex))
+        logging.debug(traceback.format_exc())
+    return False
+
+def n1ql_execute_lean(node, name, fields, args):
+    """POST a prepared statement as a JSON body (--lean-requests).
+    The constant part of the body is encoded once per statement, the auth header once per
+    process, and the query service is asked for a compact, compressed response without
+    metrics or signature."""
+    start = time.time()
+    prefix = leanprefixes.get(name)
+    if prefix == None:
+        prefix = json.dumps({"prepared": name, "pretty": False, "metrics": False, "signature": False})[:-1]
+        leanprefixes[name] = prefix
+    parts = [ prefix ]
+    for k, v in fields.items():
+        parts.append(', "%s": %s' % (k, json.dumps(v)))
+    if args != None:
+        ## Values JSON cannot encode (dates, decimals) are sent as strings, like runNQueryParam() does
+        parts.append(', "args": ' + json.dumps(args, default=str))
+    parts.append('}')
+    data = "".join(parts).encode('utf8')
+    serialize = time.time() - start
+    protocol = 'http://'
+    if bool(int(os.environ['TLS'])):
+        protocol = 'https://'
+    url = "{}{}/query/service".format(protocol, node)
+    try:
+        response = nodeRequest(node, 'POST', url, body=data, headers=leanheaders)
+        start = time.time()
+        body = json.loads(response.data)
+        recordRequestStats(name, serialize, time.time() - start)
+        if body['status'] != "success":
+            logging.debug("%s --- %s" % (data, json.JSONEncoder().encode(body)))
+        return body
+    except Exception as ex:
+        logging.info("Exception occured when executing query: %s: %s" % (type(ex).__name__, ex))
+        logging.debug(traceback.format_exc())
+    return {}
+
 def n1ql_load(query_node, stmt):
     global gcred
     global globpool
@@ -370,6 +850,9 @@ class NestcollectionsDriver(AbstractDriver):
                  kv_timeout=constants.CH2_DRIVER_KV_TIMEOUT,
                  bulkload_batch_size=constants.CH2_DRIVER_BULKLOAD_BATCH_SIZE):
         global globpool
+        global noderouter
+        global leanrequests
+        global leanheaders
         super(NestcollectionsDriver, self).__init__("nestcollections", ddl)
         QUERY_URL = os.environ["QUERY_URL"]
         DATA_URL = os.environ["DATA_URL"]
@@ -402,23 +885,43 @@ class NestcollectionsDriver(AbstractDriver):
         self.stock_txtimeout = TxTimeoutFactor(os.environ["TXTIMEOUT"], 40)
         self.denormalize = False
         self.w_orders = {}
+        self.batch_item_stock = bool(int(os.environ.get("BATCH_ITEM_STOCK", "0")))
+        self.single_write_order = bool(int(os.environ.get("SINGLE_WRITE_ORDER", "0")))
+        self.txn_mode = os.environ.get("TXN_MODE", "n1ql")
+        self.delivery_mode = os.environ.get("DELIVERY_MODE", "serial")
+        self.stream_analytics = bool(int(os.environ.get("STREAM_ANALYTICS", "0")))
+        self.analytics_checksum = bool(int(os.environ.get("ANALYTICS_CHECKSUM", "0")))
+        ## Seconds an analytical query may run, by query id; "" is the default of the others
+        self.query_timeouts = {"": float(os.environ.get("QUERY_TIMEOUT", "0"))}
+        for override in filter(None, os.environ.get("QUERY_TIMEOUT_OVERRIDES", "").split(",")):
+            qry, seconds = override.split("=")
+            self.query_timeouts[qry] = float(seconds)
+        self.freshness_probe = None
+        self.transaction_statements = None
+        self.query_streams = None
+        if TAFlag == "A" and clientId >= 0 and os.environ.get("QUERY_TEMPLATES", "") != "":
+            templates = querytemplates.loadTemplates(os.environ["QUERY_TEMPLATES"])
+            self.query_streams = querytemplates.makeQueryStreams(templates, int(os.environ.get("QUERY_SEED", "0")), clientId, constants.QUERY_STREAM_ITERATIONS)
+            logging.debug("Client ID # %d generated %d query iterations from %d templates" % (clientId, len(self.query_streams), len(templates)))
+        self.query_pool = None
+        if TAFlag == "A" and clientId >= 0 and int(os.environ.get("QUERY_CONCURRENCY", "1")) > 1:
+            self.query_pool = ThreadPoolExecutor(max_workers=int(os.environ["QUERY_CONCURRENCY"]))
+        ## Set up by executeStart()
+        self.read_your_writes = None
+        self.read_pool = None
         if (self.load_mode == constants.CH2_DRIVER_LOAD_MODE["DATASVC_BULKLOAD"] or
             self.load_mode == constants.CH2_DRIVER_LOAD_MODE["DATASVC_LOAD"]):
             pysdk_init(self)
         if globpool == None:
             gcreds = '[{"user":"' + os.environ["USER_ID"] + '","pass":"' + os.environ["PASSWORD"] + '"}]'
-            globpool = PoolManager(
-                10,
-                retries=urllib3.Retry(10),
-                maxsize=60,
-                cert_reqs="CERT_NONE",
-                socket_options=[  # Set TCP keep-alive options for long running analytics queries
-                    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
-#                    (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 120),
-                    (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 30),
-                    (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 20),
-                ],
-            )
+            globpool = makePool()
+        routing = os.environ.get("QUERY_ROUTING", "pinned")
+        if noderouter == None and routing != "pinned":
+            noderouter = QueryNodeRouter(self.MULTI_QUERY_LIST, routing, makePool)
+        leanrequests = bool(int(os.environ.get("LEAN_REQUESTS", "0")))
+        if leanrequests and leanheaders == None:
+            leanheaders = urllib3.make_headers(basic_auth=os.environ["USER_ID"] + ":" + os.environ["PASSWORD"], accept_encoding=True)
+            leanheaders['Content-Type'] = "application/json"
 
         if clientId >= 0:
             self.prepared_dict = preparedTransactionQueries
@@ -432,32 +935,35 @@ class NestcollectionsDriver(AbstractDriver):
                 txnQueries = CH2_TXN_QUERIES
             else:
                 txnQueries = CH2PP_TXN_QUERIES
+            statements = { }
             for txn, queries in txnQueries.items():
                 for query, statement in queries.items():
                     stmt = statement
                     if self.schema == constants.CH2_DRIVER_SCHEMA["CH2P"]:
                         stmt = re.sub("default:bench\.ch2pp\.", "default:bench.ch2p.", statement)
-                    if query == "getStockInfo":
+                    if query.startswith("getStockInfo"):
                         for i in range(1,11):
                             if self.schema == constants.CH2_DRIVER_SCHEMA["CH2"]:
                                 converted_district = stmt % i
                             else:
                                  converted_district = stmt
-                            prepare_query = "PREPARE %s_%s_%s_%s " % (self.schema, txn, i, query) + "FROM %s" % converted_district
-                            jsonStmt = json.loads('{"statement" : "' + str(prepare_query) + '"}')
-                            body = n1ql_execute(self.query_node, jsonStmt)
-                            preparedTransactionQueries[self.schema + txn + str(i) + query] = body['results'][0]['name']
+                            name = "%s_%s_%s_%s" % (self.schema, txn, i, query)
+                            statements[self.schema + txn + str(i) + query] = (name, json.loads('"' + converted_district + '"'))
                     else:
-                        prepare_query = "PREPARE %s_%s_%s " % (self.schema, txn, query) + "FROM %s" % stmt
-                        jsonStmt = json.loads('{"statement" : "' + str(prepare_query) + '"}')
-                        body = n1ql_execute(self.query_node, jsonStmt)
-                        preparedTransactionQueries[self.schema + txn + query] = body['results'][0]['name']
+                        name = "%s_%s_%s" % (self.schema, txn, query)
+                        statements[self.schema + txn + query] = (name, json.loads('"' + stmt + '"'))
+            if self.txn_mode == "udf":
+                functions = deployTxnUDFs(self.query_node, self.schema, txnQueries)
+                for txn, name in functions.items():
+                    params = ", ".join("$%d" % (i + 1) for i in range(len(TXN_UDFS[txn][1])))
+                    statements[self.schema + txn + "udf"] = ("%s_%s_udf" % (self.schema, txn), "EXECUTE FUNCTION %s(%s)" % (name, params))
+            ## The first node prepares everything, then the others are polled until they have it all
+            nodes = [ self.query_node ] + [ node for node in self.MULTI_QUERY_LIST if node != self.query_node ]
+            manager = PreparedStatementManager(nodes, n1ql_execute, os.environ.get("PREPARED_CACHE") or None)
+            preparedTransactionQueries.update(manager.prepare(self.schema, statements))
+            self.transaction_statements = statements
             self.prepared_dict = preparedTransactionQueries
 
-        # wait prepare statements populate other query nodes
-        if len(self.MULTI_QUERY_LIST) > 1:
-            time.sleep(15)
-
     ## ----------------------------------------------
     ## makeDefaultConfig
     ## ----------------------------------------------
@@ -475,9 +981,103 @@ class NestcollectionsDriver(AbstractDriver):
         self.denormalize = config['denormalize']
         return
 
+    ## ----------------------------------------------
+    ## executeStart / executeFinish
+    ## ----------------------------------------------
+    def executeStart(self):
+        ## The resources of a transaction client are set up here rather than in __init__: the
+        ## driver of the main process (clientId -1) prepares the statements and only executes
+        ## when it is the only client, so it must get them then but not otherwise
+        if self.TAFlag != "T":
+            return
+        if os.environ.get("READ_YOUR_WRITES", "") != "":
+            if self.txn_mode == "udf":
+                raise RuntimeError("--read-your-writes does not apply to --txn-mode udf")
+            self.read_your_writes = ReadYourWrites(os.environ["READ_YOUR_WRITES"])
+        if bool(int(os.environ.get("PARALLEL_READS", "0"))):
+            self.read_pool = ThreadPoolExecutor(max_workers=constants.MAX_OL_CNT + 3)
+        if self.txn_mode == "kv" and not hasattr(self, "cluster"):
+            pysdk_init(self)
+
+        ## One probe per run, in the first transaction client; an executing clientId -1 is the only client
+        interval = float(os.environ.get("FRESHNESS_INTERVAL", "0"))
+        if interval > 0 and self.client_id in (-1, int(os.environ.get("FRESHNESS_CLIENT", "-1"))):
+            self.freshness_probe = FreshnessProbe(self.writeFreshnessMarker, self.freshnessMarkerVisible, interval)
+            self.freshness_probe.start()
+
+    def executeFinish(self):
+        if self.freshness_probe == None:
+            return
+        self.freshness_probe.stop()
+        keys = self.freshness_probe.keys
+        if len(keys) > 0:
+            stmt = "DELETE FROM default:%s.%s.%s USE KEYS $1" % (constants.CH2_BUCKET, self.schema, constants.COLLECTIONS_DICT[constants.TABLENAME_HISTORY])
+            body = n1ql_execute(self.query_node, {"statement": stmt, "args": json.JSONEncoder().encode([keys])})
+            if body.get('status') != "success":
+                logging.warning("Failed to delete %d freshness markers: %s" % (len(keys), body.get('errors')))
+        self.freshness_probe = None
+
+    def writeFreshnessMarker(self, key):
+        """Insert a history row tagged as a freshness marker through the query service"""
+        stmt = 'INSERT INTO default:%s.%s.%s (KEY, VALUE) VALUES ($1, {"h_data": $2, "h_date": $3, "h_amount": 0})' % (
+            constants.CH2_BUCKET, self.schema, constants.COLLECTIONS_DICT[constants.TABLENAME_HISTORY])
+        args = [key, constants.FRESHNESS_MARKER_TAG, str(datetime.now())]
+        body = n1ql_execute(self.query_node, {"statement": stmt, "args": json.JSONEncoder().encode(args)})
+        return body.get('status') == "success"
+
+    def freshnessMarkerVisible(self, key):
+        stmt = 'SELECT VALUE COUNT(*) FROM %s h WHERE META(h).id = "%s"' % (constants.FRESHNESS_ANALYTICS_COLLECTION, key)
+        body = n1ql_execute(self.analytics_node, {"statement": stmt}, 0)
+        return body.get('results', [0])[0] > 0
+
+    def getFreshness(self):
+        if self.freshness_probe == None:
+            return None
+        return self.freshness_probe.getSamples()
+
     def txStatus(self):
         return self.tx_status
 
+    def pickQueryNode(self):
+        """Query node for the next transaction: the routed choice, or the node of this client"""
+        if noderouter != None:
+            return noderouter.pick()
+        return self.query_node
+
+    def getStats(self):
+        stats = { }
+        if noderouter != None:
+            stats.update(noderouter.getStats())
+        if self.read_your_writes != None:
+            stats.update(self.read_your_writes.getStats())
+        with requeststatslock:
+            if len(requeststats) > 0:
+                section = "N1QL Request Encoding (%s)" % ("lean" if leanrequests else "form")
+                stats[section] = dict((name, dict(counters)) for name, counters in requeststats.items())
+        if len(stats) == 0:
+            return None
+        return stats
+
+    ## ----------------------------------------------
+    ## runReads
+    ## ----------------------------------------------
+    def runReads(self, txnType, reads, txid, randomhost):
+        """Run a list of (query, params) reads declared independent in TXN_INDEPENDENT_READS.
+        Returns their (results, status) pairs in the same order. The reads in the transaction
+        txid run one at a time; with PARALLEL_READS the TXN_STATIC_READS run concurrently with
+        them, without the txid."""
+        txn = self.schema + txnType
+        for query, param in reads:
+            assert query in TXN_INDEPENDENT_READS[txnType], "%s is not an independent read of %s" % (query, txnType)
+        static = TXN_STATIC_READS.get(txnType, ())
+        if self.read_pool == None or not any(query in static for query, param in reads):
+            return [ runNQueryParam(self.prepared_dict[txn + query], param, txid, randomhost) for query, param in reads ]
+        futures = dict((i, self.read_pool.submit(runNQueryParam, self.prepared_dict[txn + query], param, "", randomhost))
+                       for i, (query, param) in enumerate(reads) if query in static)
+        results = [ None if i in futures else runNQueryParam(self.prepared_dict[txn + query], param, txid, randomhost)
+                    for i, (query, param) in enumerate(reads) ]
+        return [ futures[i].result() if i in futures else results[i] for i in range(len(reads)) ]
+
     def tryDataSvcBulkLoad(self, collection, cur_batch):
         for i in range(constants.NUM_LOAD_RETRIES):
             try:
@@ -589,8 +1189,14 @@ class NestcollectionsDriver(AbstractDriver):
     ## doDelivery
     ## ----------------------------------------------
     def doDelivery(self, params):
+        if self.txn_mode == "kv":
+            return self.doDeliveryKV(params)
+        if self.txn_mode == "udf":
+            return self.runTxnUDF("DELIVERY", params)
+        if self.delivery_mode == "batch":
+            return self.doDeliveryBatch(params)
         self.tx_status = ""
-        randomhost = self.query_node
+        randomhost = self.pickQueryNode()
 
         # print ("Entering doDelivery")
         txn = self.schema + "DELIVERY"
@@ -609,14 +1215,10 @@ class NestcollectionsDriver(AbstractDriver):
                 ## No orders for this district: skip it. Note: This must be reported if > 1%
                 continue
             no_o_id = newOrder[0]['no_o_id']
-            rs, status = runNQueryParam(self.prepared_dict[txn + "getCId"], [no_o_id, d_id, w_id],txid, randomhost)
-            if (status != "success"):
+            (rs, status), (rs2, status2) = self.runReads("DELIVERY", [("getCId", [no_o_id, d_id, w_id]), ("sumOLAmount", [no_o_id, d_id, w_id])], txid, randomhost)
+            if (status != "success" or status2 != "success"):
                 continue
             c_id = rs[0]['o_c_id']
-
-            rs2,status = runNQueryParam(self.prepared_dict[txn + "sumOLAmount"], [no_o_id, d_id, w_id], txid, randomhost)
-            if (status != "success"):
-                continue
             ol_total = rs2[0]['sum_ol_amount']
 
             result,status = runNQueryParam(self.prepared_dict[txn + "deleteNewOrder"], [d_id, w_id, no_o_id], txid, randomhost)
@@ -648,13 +1250,64 @@ class NestcollectionsDriver(AbstractDriver):
 
         return result
 
+    ## ----------------------------------------------
+    ## doDeliveryBatch
+    ## ----------------------------------------------
+    def doDeliveryBatch(self, params):
+        """Deliver the oldest new order of every district in one transaction with set-based statements"""
+        self.tx_status = ""
+        randomhost = self.pickQueryNode()
+
+        txn = self.schema + "DELIVERY"
+        w_id = params["w_id"]
+        o_carrier_id = params["o_carrier_id"]
+        ol_delivery_d = params["ol_delivery_d"]
+
+        rs, status = runNQuery("begin", self.prepared_dict[txn + "beginWork"],"",self.delivery_txtimeout, randomhost)
+        txid = rs[0]['txid']
+
+        ## Oldest new order ([no_o_id, key]) of each district
+        newOrders, status = runNQueryParam(self.prepared_dict[txn + "getNewOrdersBatch"], [w_id], txid, randomhost)
+        if (status != "success"):
+            trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
+            return
+        if len(newOrders) == 0:
+            ## No orders for any district. Note: This must be reported if > 1%
+            trs, self.tx_status = runNQuery("commit", self.prepared_dict[txn + "commitWork"], txid, "", randomhost)
+            return [ ]
+        delivered = sorted((no['no_d_id'], no['no'][0]) for no in newOrders)
+        orderKeys = [ "%s.%s.%s" % (w_id, d_id, no_o_id) for d_id, no_o_id in delivered ]
+
+        orders, status = runNQueryParam(self.prepared_dict[txn + "getOrdersBatch"], [orderKeys], txid, randomhost)
+        if (status != "success" or len(orders) != len(orderKeys)):
+            trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
+            return
+        ## Different districts never share a customer, so each customer key gets a single order total
+        balances = dict(("%s.%s.%s" % (w_id, o['o_d_id'], o['o_c_id']), o['ol_total']) for o in orders)
+
+        for query, param in (("deleteNewOrdersBatch", [ [ no['no'][1] for no in newOrders ] ]),
+                             ("updateOrdersBatch", [o_carrier_id, orderKeys, ol_delivery_d]),
+                             ("updateCustomersBatch", [balances])):
+            rs, status = runNQueryParam(self.prepared_dict[txn + query], param, txid, randomhost)
+            if (status != "success"):
+                trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
+                return
+        ## FOR
+
+        trs, self.tx_status = runNQuery("commit", self.prepared_dict[txn + "commitWork"], txid, "", randomhost)
+        return delivered
+
     ## ----------------------------------------------
     ## doNewOrder
     ## ----------------------------------------------
     def doNewOrder(self, params):
 
+        if self.txn_mode == "kv":
+            return self.doNewOrderKV(params)
+        if self.txn_mode == "udf":
+            return self.runTxnUDF("NEW_ORDER", params)
         self.tx_status = ""
-        randomhost = self.query_node
+        randomhost = self.pickQueryNode()
 
         # print "Entering doNewOrder"
         txn = self.schema + "NEW_ORDER"
@@ -677,10 +1330,35 @@ class NestcollectionsDriver(AbstractDriver):
         rs, tstatus  = runNQuery("begin", self.prepared_dict[txn + "beginWork"],"",self.txtimeout, randomhost)
         txid = rs[0]['txid']
         #print txid
+        if self.batch_item_stock:
+            reads = [ ("getItemInfoBatch", [ [ str(i_id) for i_id in set(i_ids) ] ]) ]
+        else:
+            reads = [ ("getItemInfo", [i_id]) for i_id in i_ids ]
+        reads.append(("getWarehouseTaxRate", [w_id]))
+        reads.append(("getDistrict", [d_id, w_id]))
+        reads.append(("getCustomer", [w_id, d_id, c_id]))
+        readResults = self.runReads("NEW_ORDER", reads, txid, randomhost)
+        nItemReads = len(reads) - 3
+        if self.batch_item_stock:
+            rs, status = readResults[0]
+            if status != "success":
+                trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
+                self.tx_status = status
+                return
+            ## Re-associate the item documents with the order lines by key
+            itemsByKey = dict((row['k'], row) for row in rs)
         for i in range(len(i_ids)):
             ## Determine if this is an all local order or not
             all_local = all_local and i_w_ids[i] == w_id
-            rs, status = runNQueryParam(self.prepared_dict[txn + "getItemInfo"], [i_ids[i]], txid, randomhost)
+            if self.batch_item_stock:
+                item = itemsByKey.get(str(i_ids[i]))
+                rs = [ item ] if item != None else [ ]
+            else:
+                rs, status = readResults[i]
+                if status != "success":
+                    trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
+                    self.tx_status = status
+                    return
             if len(rs) == 0:
                 trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
                 self.tx_status = "assert"
@@ -701,7 +1379,7 @@ class NestcollectionsDriver(AbstractDriver):
         ## ----------------
         ## Collect Information from WAREHOUSE, DISTRICT, and CUSTOMER
         ## ----------------
-        rs, status = runNQueryParam(self.prepared_dict[txn + "getWarehouseTaxRate"], [w_id], txid, randomhost)
+        rs, status = readResults[nItemReads]
         customer_info = rs
         if (status != "success"):
              trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
@@ -709,12 +1387,12 @@ class NestcollectionsDriver(AbstractDriver):
         if len(rs) > 0:
             w_tax = rs[0]['w_tax']
 
-        district_info, status = runNQueryParam(self.prepared_dict[txn +"getDistrict"], [d_id, w_id], txid, randomhost)
+        district_info, status = readResults[nItemReads + 1]
         if len(district_info) != 0:
             d_tax = district_info[0]['d_tax']
             d_next_o_id = district_info[0]['d_next_o_id']
 
-        rs, status = runNQueryParam(self.prepared_dict[txn + "getCustomer"], [w_id, d_id, c_id], txid, randomhost)
+        rs, status = readResults[nItemReads + 2]
         if len(rs) != 0:
             c_discount = rs[0]['c_discount']
 
@@ -729,10 +1407,15 @@ class NestcollectionsDriver(AbstractDriver):
              trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
              return
 
-        rs, status = runNQueryParam(self.prepared_dict[txn + "createOrder"], [d_next_o_id, d_id, w_id, c_id, o_entry_d, o_carrier_id, ol_cnt, all_local], txid, randomhost)
-        if (status != "success"):
-             trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
-             return
+        if self.single_write_order:
+            ## The order document is written once with all its order lines after the stock updates
+            order = {"o_id": d_next_o_id, "o_d_id": d_id, "o_w_id": w_id, "o_c_id": c_id, "o_entry_d": str(o_entry_d),
+                     "o_carrier_id": o_carrier_id, "o_ol_cnt": ol_cnt, "o_all_local": all_local, "o_orderline": [ ]}
+        else:
+            rs, status = runNQueryParam(self.prepared_dict[txn + "createOrder"], [d_next_o_id, d_id, w_id, c_id, o_entry_d, o_carrier_id, ol_cnt, all_local], txid, randomhost)
+            if (status != "success"):
+                 trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
+                 return
 
         rs,status = runNQueryParam(self.prepared_dict[txn + "createNewOrder"], [d_next_o_id, d_id, w_id], txid, randomhost)
         if (status != "success"):
@@ -746,6 +1429,16 @@ class NestcollectionsDriver(AbstractDriver):
         ## ----------------
         item_data = [ ]
         total = 0
+        if self.batch_item_stock:
+            ## One read for all stock documents; order lines with the same key share the
+            ## document, so its updates are applied in order line order as in the serial path
+            stockKeys = [ "%s.%s" % (i_w_ids[i], i_ids[i]) for i in range(len(i_ids)) ]
+            rs, status = runNQueryParam(self.prepared_dict[txn + str(d_id) + "getStockInfoBatch"], [list(set(stockKeys))], txid, randomhost)
+            if (status != "success"):
+                trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
+                self.tx_status = status
+                return
+            stocksByKey = dict((row['k'], row) for row in rs)
         # print  len(i_ids)
         for i in range(len(i_ids)):
             ol_number = i + 1
@@ -760,7 +1453,15 @@ class NestcollectionsDriver(AbstractDriver):
             i_price = itemInfo["i_price"]
 
             # print "NewOrder Stage #3"
-            stockInfo, status = runNQueryParam(self.prepared_dict[txn + str(d_id) + "getStockInfo"], [ol_i_id, ol_supply_w_id], txid, randomhost)
+            if self.batch_item_stock:
+                stock = stocksByKey.get(stockKeys[i])
+                stockInfo = [ stock ] if stock != None else [ ]
+            else:
+                stockInfo, status = runNQueryParam(self.prepared_dict[txn + str(d_id) + "getStockInfo"], [ol_i_id, ol_supply_w_id], txid, randomhost)
+                if (status != "success"):
+                    trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
+                    self.tx_status = status
+                    return
             if len(stockInfo) == 0:
                 trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
                 logging.warn("No STOCK record for (ol_i_id=%d, ol_supply_w_id=%d)" % (ol_i_id, ol_supply_w_id))
@@ -793,6 +1494,8 @@ class NestcollectionsDriver(AbstractDriver):
             s_order_cnt += 1
 
             if ol_supply_w_id != w_id: s_remote_cnt += 1
+            if self.batch_item_stock:
+                stock.update(s_quantity=s_quantity, s_ytd=s_ytd, s_order_cnt=s_order_cnt, s_remote_cnt=s_remote_cnt)
 
             # print "NewOrder Stage #5"
             rs, status = runNQueryParam(self.prepared_dict[txn + "updateStock"], [s_quantity, s_ytd, s_order_cnt, s_remote_cnt, ol_i_id, ol_supply_w_id], txid, randomhost)
@@ -809,13 +1512,24 @@ class NestcollectionsDriver(AbstractDriver):
             ol_amount = ol_quantity * i_price
             total += ol_amount
 
-            rs, status = runNQueryParam(self.prepared_dict[txn + "createOrderLine"], [d_next_o_id, d_id, w_id, ol_number, ol_i_id, ol_supply_w_id, o_entry_d, ol_quantity, ol_amount, s_dist_xx], txid, randomhost)
+            if self.single_write_order:
+                order["o_orderline"].append({"ol_number": ol_number, "ol_i_id": ol_i_id, "ol_supply_w_id": ol_supply_w_id, "ol_delivery_d": str(o_entry_d),
+                                             "ol_quantity": ol_quantity, "ol_amount": ol_amount, "ol_dist_info": s_dist_xx})
+            else:
+                rs, status = runNQueryParam(self.prepared_dict[txn + "createOrderLine"], [d_next_o_id, d_id, w_id, ol_number, ol_i_id, ol_supply_w_id, o_entry_d, ol_quantity, ol_amount, s_dist_xx], txid, randomhost)
 
 
             ## Add the info to be returned
             item_data.append( (i_name, s_quantity, brand_generic, i_price, ol_amount) )
         ## FOR
+        if self.single_write_order:
+            rs, status = runNQueryParam(self.prepared_dict[txn + "createOrderDocument"], ["%s.%s.%s" % (w_id, d_id, d_next_o_id), order], txid, randomhost)
+            if (status != "success"):
+                 trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
+                 return
         trs, self.tx_status = runNQuery("commit", self.prepared_dict[txn + "commitWork"], txid, "",randomhost)
+        if self.read_your_writes != None and self.tx_status == "success":
+            self.read_your_writes.wrote(w_id, d_id, c_id)
 
         ## Adjust the total for the discount
         #print "c_discount:", c_discount, type(c_discount)
@@ -833,9 +1547,21 @@ class NestcollectionsDriver(AbstractDriver):
     ## doOrderStatus
     ## ----------------------------------------------
     def doOrderStatus(self, params):
-
+        if self.read_your_writes == None:
+            return self.orderStatus(params, None)
+        policy, level, start = self.read_your_writes.begin(params["w_id"], params["d_id"], params["c_id"])
+        ret = self.orderStatus(params, level)
+        self.read_your_writes.finish(policy, level, start, self.tx_status == "success")
+        return ret
+
+    def orderStatus(self, params, scanConsistency):
+        """Order-Status with the given scan consistency (None for --scan_consistency)"""
+        if self.txn_mode == "kv":
+            return self.doOrderStatusKV(params, scanConsistency)
+        if self.txn_mode == "udf":
+            return self.runTxnUDF("ORDER_STATUS", params)
         self.tx_status = ""
-        randomhost = self.query_node
+        randomhost = self.pickQueryNode()
 
 #       print ("Entering doOrderStatus")
         txn = self.schema + "ORDER_STATUS"
@@ -847,7 +1573,7 @@ class NestcollectionsDriver(AbstractDriver):
         assert w_id, pformat(params)
         assert d_id, pformat(params)
 
-        rs, tstatus = runNQuery("begin", self.prepared_dict[txn + "beginWork"],"",self.txtimeout, randomhost)
+        rs, tstatus = runNQuery("begin", self.prepared_dict[txn + "beginWork"],"",self.txtimeout, randomhost, scanConsistency)
         txid = rs[0]['txid']
         if c_id != None:
             customerlist,status = runNQueryParam(self.prepared_dict[txn + "getCustomerByCustomerId"], [w_id, d_id, c_id], txid, randomhost)
@@ -892,8 +1618,12 @@ class NestcollectionsDriver(AbstractDriver):
     def doPayment(self, params):
         # print "Entering doPayment"
 
+        if self.txn_mode == "kv":
+            return self.doPaymentKV(params)
+        if self.txn_mode == "udf":
+            return self.runTxnUDF("PAYMENT", params)
         self.tx_status = ""
-        randomhost = self.query_node
+        randomhost = self.pickQueryNode()
 
         txn = self.schema + "PAYMENT"
         w_id = params["w_id"]
@@ -909,7 +1639,12 @@ class NestcollectionsDriver(AbstractDriver):
         txid = rs[0]['txid']
 
         if c_id != None:
-            customerlist,status = runNQueryParam(self.prepared_dict[txn + "getCustomerByCustomerId"], [w_id, d_id, c_id], txid, randomhost)
+            customerRead = ("getCustomerByCustomerId", [w_id, d_id, c_id])
+        else:
+            customerRead = ("getCustomersByLastName", [w_id, d_id, c_last])
+        (customerlist, status), (warehouse, wstatus), (district, dstatus) = self.runReads("PAYMENT", [customerRead, ("getWarehouse", [w_id]), ("getDistrict", [w_id, d_id])], txid, randomhost)
+
+        if c_id != None:
             if len(customerlist) == 0 :
                  trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
                  self.tx_status = "assert"
@@ -919,7 +1654,7 @@ class NestcollectionsDriver(AbstractDriver):
             customer = customerlist[0]
         else:
             # Get the midpoint customer's id
-            all_customers,status = runNQueryParam(self.prepared_dict[txn + "getCustomersByLastName"], [w_id, d_id, c_last], txid, randomhost)
+            all_customers = customerlist
             if len(all_customers) == 0 :
                  trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
                  self.tx_status = "assert"
@@ -944,13 +1679,7 @@ class NestcollectionsDriver(AbstractDriver):
 
         #print "doPayment: Stage 2"
 
-        warehouse,status = runNQueryParam(self.prepared_dict[txn + "getWarehouse"], [w_id], txid, randomhost)
-        if (status != "success"):
-             trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
-             return
-
-        district,status = runNQueryParam(self.prepared_dict[txn + "getDistrict"], [w_id, d_id], txid, randomhost)
-        if (status != "success"):
+        if (wstatus != "success" or dstatus != "success"):
              trs, self.tx_status = runNQuery("rollback", self.prepared_dict[txn + "rollbackWork"],txid,"",randomhost)
              return
 
@@ -1012,8 +1741,10 @@ class NestcollectionsDriver(AbstractDriver):
     ## ----------------------------------------------
     def doStockLevel(self, params):
 
+        if self.txn_mode == "udf":
+            return self.runTxnUDF("STOCK_LEVEL", params)
         self.tx_status = ""
-        randomhost = self.query_node
+        randomhost = self.pickQueryNode()
 
         # print "Entering doStockLevel"
         txn = self.schema + "STOCK_LEVEL"
@@ -1039,70 +1770,450 @@ class NestcollectionsDriver(AbstractDriver):
         return int(result[0]['cnt_ol_i_id'])
 
 
-    def runCH2Queries(self, duration, endBenchmarkTime, queryIterNum):
-        qry_times = {}
-        if self.TAFlag == "A":
-            # ch2_queries_perm = list(constants.CH2_QUERIES.keys())
-            # Pick a good seed based on client_id and query iteration number
-            # to guarantee repeatibility of order between runs but still
-            # good randomness for different clients and different query iterations.
-            #random.seed(self.client_id*9973 + queryIterNum*19997)
-            #random.shuffle(ch2_queries_perm)
-            #logging.info(f"{self.schema=}")
-            #logging.info(f"{self.analyticalQueries=}")
+    ## ----------------------------------------------
+    ## runTxnUDF
+    ## ----------------------------------------------
+    def runTxnUDF(self, txnType, params):
+        """Run a whole transaction with one EXECUTE FUNCTION call (--txn-mode udf)"""
+        args = [ params[p] for p in TXN_UDFS[txnType][1] ]
+        rs, self.tx_status = runNQueryParam(self.prepared_dict[self.schema + txnType + "udf"], args, "", self.pickQueryNode())
+        if self.tx_status != "success":
+            return
+        ret = rs[0]
+        if "errors" in ret:
+            ## Map the error of the failed statement like the multi-statement path does
+            rs, self.tx_status = retvalN1QLQuery("udf", {"status": ret["status"], "errors": ret["errors"]})
+            return
+        self.tx_status = ret["status"]
+        return ret.get("result")
 
-            ch2_queries_perm = constants.CH2_QUERIES_PERM[self.client_id]
-            if self.schema == constants.CH2_DRIVER_SCHEMA["CH2"]:
-                if self.analyticalQueries == constants.CH2_DRIVER_ANALYTICAL_QUERIES["HAND_OPTIMIZED_QUERIES"]:
-                    ch2_queries = constants.CH2_QUERIES
+    ## ----------------------------------------------
+    ## SDK transactions (--txn-mode kv)
+    ## ----------------------------------------------
+    def txnStatement(self, txnType, query):
+        """Text of a transaction statement for the current schema, for use through the SDK"""
+        if self.schema == constants.CH2_DRIVER_SCHEMA["CH2"]:
+            stmt = CH2_TXN_QUERIES[txnType][query]
+        else:
+            stmt = CH2PP_TXN_QUERIES[txnType][query]
+        if self.schema == constants.CH2_DRIVER_SCHEMA["CH2P"]:
+            stmt = re.sub("default:bench\.ch2pp\.", "default:bench.ch2p.", stmt)
+        return stmt
+
+    def kvQuery(self, txnType, query, param, scanConsistency=None):
+        """Run one of the statements that needs an index outside of the SDK transaction.
+        The rows are read at the scan consistency of the request, not from the transaction's
+        snapshot: the documents they name are then read again through the transaction."""
+        if scanConsistency == None:
+            scanConsistency = os.environ["SCAN_CONSISTENCY"]
+        opts = QueryOptions(positional_parameters=param, scan_consistency=QueryScanConsistency(scanConsistency))
+        return list(self.cluster.query(self.txnStatement(txnType, query), opts).rows())
+
+    def kvGet(self, ctx, tableName, key):
+        """Transactional get that returns None for a missing document"""
+        try:
+            return ctx.get(self.collections[tableName], key)
+        except DocumentNotFoundException:
+            return None
+
+    def runKVTransaction(self, logic, txtimeout):
+        """Run logic(ctx) as an SDK transaction and set tx_status from its outcome"""
+        aborted = [ ]
+        def attempt(ctx):
+            try:
+                logic(ctx)
+            except KVAbort as e:
+                aborted.append(e.status)
+                raise
+        opts = TransactionOptions(timeout=timedelta(seconds=parseDuration(txtimeout) / 1e9),
+                                  durability=ServerDurability(KV_DURABILITY_LEVELS.get(os.environ["DURABILITY_LEVEL"], DurabilityLevel.NONE)))
+        try:
+            self.cluster.transactions.run(attempt, opts)
+            self.tx_status = "success"
+        except TransactionExpired:
+            self.tx_status = "kv-expired"
+        except TransactionCommitAmbiguous:
+            self.tx_status = "kv-ambiguous"
+        except (TransactionFailed, KVAbort):
+            self.tx_status = aborted[-1] if len(aborted) > 0 else "kv-failed"
+        return self.tx_status == "success"
+
+    def doDeliveryKV(self, params):
+        self.tx_status = ""
+        w_id = params["w_id"]
+        o_carrier_id = params["o_carrier_id"]
+        ol_delivery_d = str(params["ol_delivery_d"])
+
+        result = [ ]
+        for d_id in range(1, constants.DISTRICTS_PER_WAREHOUSE+1):
+            newOrder = self.kvQuery("DELIVERY", "getNewOrderKey", [d_id, w_id])
+            if len(newOrder) == 0:
+                ## No orders for this district: skip it. Note: This must be reported if > 1%
+                continue
+            no_o_id = newOrder[0]['no_o_id']
+
+            def logic(ctx):
+                no = self.kvGet(ctx, constants.TABLENAME_NEWORDER, newOrder[0]['k'])
+                if no == None:
+                    ## Delivered by a concurrent transaction since the lookup
+                    raise KVAbort("delivered")
+                ctx.remove(no)
+
+                order = ctx.get(self.collections[constants.TABLENAME_ORDERS], "%s.%s.%s" % (w_id, d_id, no_o_id))
+                o = order.content_as[dict]
+                o["o_carrier_id"] = o_carrier_id
+                ol_total = 0
+                for ol in o.get("o_orderline", [ ]):
+                    ol["ol_delivery_d"] = ol_delivery_d
+                    ol_total += ol["ol_amount"]
+                ctx.replace(order, o)
+
+                customer = ctx.get(self.collections[constants.TABLENAME_CUSTOMER], "%s.%s.%s" % (w_id, d_id, o["o_c_id"]))
+                c = customer.content_as[dict]
+                c["c_balance"] += ol_total
+                ctx.replace(customer, c)
+
+            if self.runKVTransaction(logic, self.delivery_txtimeout):
+                result.append((d_id, no_o_id))
+        ## FOR
+
+        return result
+
+    def doNewOrderKV(self, params):
+        self.tx_status = ""
+        w_id = params["w_id"]
+        d_id = params["d_id"]
+        c_id = params["c_id"]
+        o_entry_d = str(params["o_entry_d"])
+        i_ids = params["i_ids"]
+        i_w_ids = params["i_w_ids"]
+        i_qtys = params["i_qtys"]
+
+        assert len(i_ids) > 0
+        assert len(i_ids) == len(i_w_ids)
+        assert len(i_ids) == len(i_qtys)
+
+        out = { }
+        def logic(ctx):
+            items = [ ]
+            for i_id in i_ids:
+                item = self.kvGet(ctx, constants.TABLENAME_ITEM, str(i_id))
+                ## TPCC defines 1% of neworder gives a wrong itemid, causing rollback.
+                if item == None:
+                    raise KVAbort("assert")
+                items.append(item.content_as[dict])
+
+            w_tax = ctx.get(self.collections[constants.TABLENAME_WAREHOUSE], str(w_id)).content_as[dict]["w_tax"]
+            district = ctx.get(self.collections[constants.TABLENAME_DISTRICT], "%s.%s" % (w_id, d_id))
+            d = district.content_as[dict]
+            c_discount = ctx.get(self.collections[constants.TABLENAME_CUSTOMER], "%s.%s.%s" % (w_id, d_id, c_id)).content_as[dict]["c_discount"]
+
+            d_next_o_id = d["d_next_o_id"]
+            d["d_next_o_id"] = d_next_o_id + 1
+            ctx.replace(district, d)
+
+            all_local = all(i_w_id == w_id for i_w_id in i_w_ids)
+            order = {"o_id": d_next_o_id, "o_d_id": d_id, "o_w_id": w_id, "o_c_id": c_id, "o_entry_d": o_entry_d,
+                     "o_carrier_id": constants.NULL_CARRIER_ID, "o_ol_cnt": len(i_ids), "o_all_local": all_local, "o_orderline": [ ]}
+
+            ## Order lines that share a stock document update it in order line order
+            stocks = { }
+            item_data = [ ]
+            total = 0
+            for i in range(len(i_ids)):
+                ol_supply_w_id = i_w_ids[i]
+                ol_quantity = i_qtys[i]
+                key = "%s.%s" % (ol_supply_w_id, i_ids[i])
+                if key in stocks:
+                    stock, s = stocks[key]
                 else:
-                    ch2_queries = constants.CH2_QUERIES_NON_OPTIMIZED
-            else:
-                if self.analyticalQueries == constants.CH2_DRIVER_ANALYTICAL_QUERIES["HAND_OPTIMIZED_QUERIES"]:
-                    ch2_queries = constants.CH2PP_QUERIES
+                    stock = ctx.get(self.collections[constants.TABLENAME_STOCK], key)
+                    s = stock.content_as[dict]
+
+                if self.schema == constants.CH2_DRIVER_SCHEMA["CH2"]:
+                    s_dist_xx = s["s_dist_" + str(d_id).zfill(2)]
+                else:
+                    s_dist_xx = s["s_dists"][d_id-1]
+                s["s_ytd"] += ol_quantity
+                if s["s_quantity"] >= ol_quantity + 10:
+                    s["s_quantity"] = s["s_quantity"] - ol_quantity
+                else:
+                    s["s_quantity"] = s["s_quantity"] + 91 - ol_quantity
+                s["s_order_cnt"] += 1
+                if ol_supply_w_id != w_id: s["s_remote_cnt"] += 1
+                stocks[key] = (ctx.replace(stock, s), s)
+
+                i_data = items[i]["i_data"]
+                i_price = items[i]["i_price"]
+                if i_data.find(constants.ORIGINAL_STRING) != -1 and s["s_data"].find(constants.ORIGINAL_STRING) != -1:
+                    brand_generic = 'B'
                 else:
-                    ch2_queries = constants.CH2PP_QUERIES_NON_OPTIMIZED
+                    brand_generic = 'G'
+                ol_amount = ol_quantity * i_price
+                total += ol_amount
+                order["o_orderline"].append({"ol_number": i + 1, "ol_i_id": i_ids[i], "ol_supply_w_id": ol_supply_w_id, "ol_delivery_d": o_entry_d,
+                                             "ol_quantity": ol_quantity, "ol_amount": ol_amount, "ol_dist_info": s_dist_xx})
+                item_data.append( (items[i]["i_name"], s["s_quantity"], brand_generic, i_price, ol_amount) )
+            ## FOR
+
+            ctx.insert(self.collections[constants.TABLENAME_ORDERS], "%s.%s.%s" % (w_id, d_id, d_next_o_id), order)
+            ctx.insert(self.collections[constants.TABLENAME_NEWORDER], "%s.%s.%s" % (d_id, w_id, d_next_o_id),
+                       {"no_o_id": d_next_o_id, "no_d_id": d_id, "no_w_id": w_id})
+
+            total *= (1 - c_discount) * (1 + w_tax + d["d_tax"])
+            out["result"] = [ [ {"w_tax": w_tax} ], [ (w_tax, d["d_tax"], d_next_o_id, total) ], item_data ]
+
+        if not self.runKVTransaction(logic, self.txtimeout):
+            return
+        if self.read_your_writes != None:
+            self.read_your_writes.wrote(w_id, d_id, c_id)
+        return out["result"]
 
-            if bool(int(os.environ.get("IGNORE_SKIP_INDEX_HINTS", 0))):
-                pattern = re.compile(r"\/\*\+\sskip-index\s\*\/")
-                ch2_queries = {
-                    k: re.sub(pattern, "", v) for k, v in ch2_queries.items()
-                }
+    def doOrderStatusKV(self, params, scanConsistency=None):
+        self.tx_status = ""
+        w_id = params["w_id"]
+        d_id = params["d_id"]
+        c_id = params["c_id"]
+        c_last = params["c_last"]
 
-            for qry in ch2_queries_perm:
-                query_id_str = "AClient %d:Loop %d:%s:" % (self.client_id + 1, queryIterNum + 1, qry)
-                query = ch2_queries[qry]
-                stmt = json.loads('{"statement" : "' + str(query) + '"}')
+        assert w_id, pformat(params)
+        assert d_id, pformat(params)
 
-                start = time.time()
-                startTime = time.strftime("%H:%M:%S", time.localtime(start))
+        if c_id == None:
+            # Get the midpoint customer's id
+            all_customers = self.kvQuery("ORDER_STATUS", "getCustomersByLastName", [w_id, d_id, c_last], scanConsistency)
+            if len(all_customers) == 0:
+                self.tx_status = "assert"
+                return
+            c_id = all_customers[int((len(all_customers)-1)/2)]['c_id']
+        order = self.kvQuery("ORDER_STATUS", "getLastOrder", [w_id, d_id, c_id], scanConsistency)
+
+        out = { }
+        def logic(ctx):
+            customer = self.kvGet(ctx, constants.TABLENAME_CUSTOMER, "%s.%s.%s" % (w_id, d_id, c_id))
+            if customer == None:
+                raise KVAbort("assert")
+            orderLines = [ ]
+            if len(order) > 0:
+                o = ctx.get(self.collections[constants.TABLENAME_ORDERS], "%s.%s.%s" % (w_id, d_id, order[0]['o_id'])).content_as[dict]
+                orderLines = o.get("o_orderline", [ ])
+            out["result"] = [ customer.content_as[dict], order, orderLines ]
 
-                # In benchmark run mode, if the duration has elapsed, stop executing queries
-                if duration is not None:
-                    if start > endBenchmarkTime:
-                        logging.debug("%s started at:   %s (started after the duration of the benchmark)" % (query_id_str, startTime))
-                        break
+        if not self.runKVTransaction(logic, self.txtimeout):
+            return
+        return out["result"]
 
-                logging.info("%s started at: %s " % (query_id_str, startTime))
-                body = n1ql_execute(self.analytics_node, stmt, 0)
-                end = time.time()
-                endTime = time.strftime("%H:%M:%S", time.localtime(end))
+    def doPaymentKV(self, params):
+        self.tx_status = ""
+        w_id = params["w_id"]
+        d_id = params["d_id"]
+        h_amount = params["h_amount"]
+        c_w_id = params["c_w_id"]
+        c_d_id = params["c_d_id"]
+        c_id = params["c_id"]
+        c_last = params["c_last"]
+        h_date = str(params["h_date"])
 
-                # In benchmark run mode, if the duration has elapsed, stop reporting queries
-                if duration is not None:
-                    if end > endBenchmarkTime:
-                        logging.debug("%s ended at:   %s (ended after the duration of the benchmark)" % (query_id_str, endTime))
-                        break
+        if c_id == None:
+            # Get the midpoint customer's id
+            all_customers = self.kvQuery("PAYMENT", "getCustomersByLastName", [w_id, d_id, c_last])
+            if len(all_customers) == 0:
+                self.tx_status = "assert"
+                return
+            c_id = all_customers[int((len(all_customers)-1)/2)]['c_id']
+
+        out = { }
+        def logic(ctx):
+            customer = self.kvGet(ctx, constants.TABLENAME_CUSTOMER, "%s.%s.%s" % (w_id, d_id, c_id))
+            if customer == None:
+                raise KVAbort("assert")
+            c = customer.content_as[dict]
+
+            warehouse = ctx.get(self.collections[constants.TABLENAME_WAREHOUSE], str(w_id))
+            w = warehouse.content_as[dict]
+            w["w_ytd"] += h_amount
+            ctx.replace(warehouse, w)
+
+            district = ctx.get(self.collections[constants.TABLENAME_DISTRICT], "%s.%s" % (w_id, d_id))
+            d = district.content_as[dict]
+            d["d_ytd"] += h_amount
+            ctx.replace(district, d)
+
+            c["c_balance"] -= h_amount
+            c["c_ytd_payment"] += h_amount
+            c["c_payment_cnt"] += 1
+            if c["c_credit"] == constants.BAD_CREDIT:
+                newData = " ".join(map(str, [c_id, c_d_id, c_w_id, d_id, w_id, h_amount]))
+                c["c_data"] = (newData + "|" + c["c_data"])[:constants.MAX_C_DATA]
+            ctx.replace(customer, c)
+
+            # Concatenate w_name, four spaces, d_name
+            h_data = "%s    %s" % (w['w_name'], d['d_name'])
+            ctx.insert(self.collections[constants.TABLENAME_HISTORY], h_date,
+                       {"h_c_id": c_id, "h_c_d_id": c_d_id, "h_c_w_id": c_w_id, "h_d_id": d_id, "h_w_id": w_id, "h_date": h_date, "h_amount": h_amount, "h_data": h_data})
+            out["result"] = [ [ w ], [ d ], c ]
+
+        if not self.runKVTransaction(logic, self.txtimeout):
+            return
+        return out["result"]
 
-                logging.info("%s ended at:   %s" % (query_id_str, endTime))
-                logging.info("%s metrics:    %s" % (query_id_str, body.get("metrics")))
+    def runCH2Queries(self, duration, endBenchmarkTime, queryIterNum):
+        qry_times = {}
+        if self.TAFlag == "A":
+            #logging.info(f"{self.schema=}")
+            #logging.info(f"{self.analyticalQueries=}")
 
-                qry_times[qry] = [
-                    self.client_id + 1,
-                    queryIterNum + 1,
-                    startTime,
-                    body.get("metrics", {}).get("executionTime", "infs"),
-                    endTime,
-                ]
+            # Repeatable order per client; with --vary-query-order also per query iteration
+            orderIteration = queryIterNum if bool(int(os.environ.get("VARY_QUERY_ORDER", "0"))) else 0
+            ch2_queries_perm = queryorder.makeQueryPermutation(int(os.environ.get("QUERY_SEED", "0")), self.client_id, orderIteration)
+            ch2_queries = self.getCH2Queries()
+
+            jobs = [ ]
+            for qry in ch2_queries_perm:
+                if self.query_streams != None and qry in self.query_streams[0]:
+                    ## Fresh parameters every loop; longer runs start over from the first loop
+                    stmt = {"statement": self.query_streams[queryIterNum % len(self.query_streams)][qry]}
+                else:
+                    query = ch2_queries[qry]
+                    stmt = json.loads('{"statement" : "' + str(query) + '"}')
+                jobs.append((qry, stmt))
+
+            if self.query_pool == None:
+                for qry, stmt in jobs:
+                    times = self.runCH2Query(qry, stmt, duration, endBenchmarkTime, queryIterNum)
+                    if times == None:
+                        break
+                    qry_times[qry] = times
+            else:
+                ## --query-concurrency: the queries start in permutation order as soon as one of
+                ## the K threads is free, and each checks the deadline when it actually starts
+                futures = [ (qry, self.query_pool.submit(self.runCH2Query, qry, stmt, duration, endBenchmarkTime, queryIterNum)) for qry, stmt in jobs ]
+                for qry, future in futures:
+                    times = future.result()
+                    if times != None:
+                        qry_times[qry] = times
         return qry_times
+
+    def getCH2Queries(self):
+        """The analytical queries of the schema and query set of this run, by query id"""
+        if self.schema == constants.CH2_DRIVER_SCHEMA["CH2"]:
+            if self.analyticalQueries == constants.CH2_DRIVER_ANALYTICAL_QUERIES["HAND_OPTIMIZED_QUERIES"]:
+                ch2_queries = constants.CH2_QUERIES
+            else:
+                ch2_queries = constants.CH2_QUERIES_NON_OPTIMIZED
+        else:
+            if self.analyticalQueries == constants.CH2_DRIVER_ANALYTICAL_QUERIES["HAND_OPTIMIZED_QUERIES"]:
+                ch2_queries = constants.CH2PP_QUERIES
+            else:
+                ch2_queries = constants.CH2PP_QUERIES_NON_OPTIMIZED
+
+        if bool(int(os.environ.get("IGNORE_SKIP_INDEX_HINTS", 0))):
+            pattern = re.compile(r"\/\*\+\sskip-index\s\*\/")
+            ch2_queries = {
+                k: re.sub(pattern, "", v) for k, v in ch2_queries.items()
+            }
+        return ch2_queries
+
+    def capturePlans(self, transactions, analytics):
+        plans = { }
+        if transactions and self.transaction_statements != None:
+            plans["transactions"] = { }
+            for key, (name, text) in sorted(self.transaction_statements.items()):
+                body = n1ql_execute(self.query_node, {"statement": "EXPLAIN " + text})
+                plans["transactions"][name] = self.explainedPlan(name, body)
+        if analytics:
+            plans["analytics"] = { }
+            for qry, query in sorted(self.getCH2Queries().items()):
+                body = n1ql_execute(self.analytics_node, {"statement": "EXPLAIN " + json.loads('"' + query + '"')}, 0)
+                plans["analytics"][qry] = self.explainedPlan(qry, body)
+        return plans
+
+    def explainedPlan(self, name, body):
+        if body.get('status') != "success" or len(body.get('results', [ ])) == 0:
+            logging.warning("Could not EXPLAIN %s: %s" % (name, body.get('errors')))
+            return {"error": body.get('errors')}
+        return body['results'][0]
+
+    def runCH2Query(self, qry, stmt, duration, endBenchmarkTime, queryIterNum):
+        """Run one analytical query. Returns its qry_times entry, or None when the benchmark
+        duration elapsed before it started or finished. The entry of a query cancelled at its
+        timeout or at the end of the benchmark names the reason in its "cancelled" measurement."""
+        query_id_str = "AClient %d:Loop %d:%s:" % (self.client_id + 1, queryIterNum + 1, qry)
+        start = time.time()
+        startTime = time.strftime("%H:%M:%S", time.localtime(start))
+
+        # In benchmark run mode, if the duration has elapsed, stop executing queries
+        if duration is not None:
+            if start > endBenchmarkTime:
+                logging.debug("%s started at:   %s (started after the duration of the benchmark)" % (query_id_str, startTime))
+                return None
+
+        ## Queries that run into their timeout or the end of the benchmark are cancelled on the
+        ## server, so that they neither hold up the client nor keep loading the cluster
+        limit = self.query_timeouts.get(qry, self.query_timeouts[""])
+        cancelAt = [ ]
+        if limit > 0:
+            cancelAt.append((start + limit, "timeout"))
+            stmt = dict(stmt, timeout="%gs" % limit)
+        if duration is not None:
+            cancelAt.append((endBenchmarkTime, "deadline"))
+        cancelled = [ ]
+        timer = None
+        if len(cancelAt) > 0:
+            at, reason = min(cancelAt)
+            contextId = "ch2-%d-%d-%s-%s" % (self.client_id + 1, queryIterNum + 1, qry, uuid.uuid4().hex[:8])
+            stmt = dict(stmt, client_context_id=contextId)
+            def cancel():
+                cancelled.append(reason)
+                logging.info("%s cancelling at the %s: %s" % (query_id_str, reason, analytics_cancel(self.analytics_node, contextId)))
+            timer = threading.Timer(max(0, at - time.time()), cancel)
+            timer.daemon = True
+            timer.start()
+
+        logging.info("%s started at: %s " % (query_id_str, startTime))
+        if self.stream_analytics:
+            body, rowCount, checksum, receive = n1ql_stream(self.analytics_node, stmt, self.analytics_checksum)
+        else:
+            body = n1ql_execute(self.analytics_node, stmt, 0)
+        if timer != None:
+            timer.cancel()
+        end = time.time()
+        endTime = time.strftime("%H:%M:%S", time.localtime(end))
+
+        if len(cancelled) == 0 and any(e.get("code") == constants.ANALYTICS_TIMEOUT_ERROR for e in body.get("errors", [ ])):
+            cancelled.append("timeout")
+        if len(cancelled) > 0:
+            ## Kept apart from the completed queries by Results
+            logging.info("%s %s at:   %s" % (query_id_str, "timed out" if cancelled[0] == "timeout" else "cancelled", endTime))
+            return [
+                self.client_id + 1,
+                queryIterNum + 1,
+                startTime,
+                "infs",
+                endTime,
+                {"rtt": end - start, "metrics": parseMetrics(body.get("metrics", {})), "cancelled": cancelled[0], "limit": limit},
+            ]
+
+        # In benchmark run mode, if the duration has elapsed, stop reporting queries
+        if duration is not None:
+            if end > endBenchmarkTime:
+                logging.debug("%s ended at:   %s (ended after the duration of the benchmark)" % (query_id_str, endTime))
+                return None
+
+        logging.info("%s ended at:   %s" % (query_id_str, endTime))
+        logging.info("%s metrics:    %s" % (query_id_str, body.get("metrics")))
+
+        ## Numeric server metrics (durations in ns) and the client side round trip time
+        extra = {"rtt": end - start, "metrics": parseMetrics(body.get("metrics", {}))}
+        if self.stream_analytics:
+            logging.info("%s rows: %d receive time: %.3fs checksum: %s" % (query_id_str, rowCount, receive, "-" if checksum == None else "%016x" % checksum))
+            extra.update(receive=receive, rows=rowCount, checksum=checksum)
+        return [
+            self.client_id + 1,
+            queryIterNum + 1,
+            startTime,
+            body.get("metrics", {}).get("executionTime", "infs"),
+            endTime,
+            extra,
+        ]
 ## CLASS
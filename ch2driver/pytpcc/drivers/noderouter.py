@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import time
+
+import constants
+
+ROUTING_POLICIES = ("least-outstanding", "latency")
+
+class QueryNodeRouter:
+    """Picks the query node of each transaction from the in-flight requests and the
+    EWMA latency of every node, and keeps one connection pool per node and process.
+
+    The in-flight counts, latencies and health of the nodes live in shared memory, so
+    a router created before the client processes are forked balances the load of all
+    of them. Nodes that fail ROUTER_MAX_FAILURES requests in a row are skipped for
+    ROUTER_RETRY_INTERVAL seconds. Requests to nodes that are not routed (e.g. the
+    analytics node) still get their own pool and counters.
+    """
+
+    def __init__(self, nodes, policy, makePool):
+        assert policy in ROUTING_POLICIES, "Unexpected routing policy: " + policy
+        self.nodes = list(nodes)
+        self.policy = policy
+        self.makePool = makePool
+        self.inflight = multiprocessing.Array('i', len(self.nodes))
+        self.ewma = multiprocessing.Array('d', len(self.nodes))
+        self.failures = multiprocessing.Array('i', len(self.nodes))
+        self.downUntil = multiprocessing.Array('d', len(self.nodes))
+        self.lock = threading.Lock()
+        self.pid = None
+        self.pools = { }
+        self.stats = { }
+    ## DEF
+
+    def pool(self, node):
+        """Connection pool of a node in this process"""
+        with self.lock:
+            if self.pid != os.getpid():
+                ## Forked: connections and counters of the parent are not ours
+                self.pid = os.getpid()
+                self.pools = { }
+                self.stats = { }
+            if node not in self.pools:
+                self.pools[node] = self.makePool()
+                self.stats[node] = {"requests": 0, "errors": 0, "time": 0.0}
+            return self.pools[node]
+    ## DEF
+
+    def pick(self):
+        """Choose the node for a new transaction; all of its statements go to that node"""
+        now = time.time()
+        candidates = [ i for i in range(len(self.nodes)) if self.downUntil[i] <= now ]
+        if len(candidates) == 0:
+            candidates = list(range(len(self.nodes)))
+        random.shuffle(candidates)
+        if self.policy == "least-outstanding":
+            best = min(candidates, key=lambda i: (self.inflight[i], self.ewma[i]))
+        else:
+            ## Expected wait behind the requests already in flight; unmeasured nodes go first
+            best = min(candidates, key=lambda i: self.ewma[i] * (self.inflight[i] + 1))
+        return self.nodes[best]
+    ## DEF
+
+    def request(self, node, method, url, **kwargs):
+        """urllib3 request on the pool of node, accounted to that node"""
+        pool = self.pool(node)
+        i = self.nodes.index(node) if node in self.nodes else None
+        if i != None:
+            with self.inflight.get_lock():
+                self.inflight[i] += 1
+        ok = False
+        start = time.time()
+        try:
+            response = pool.request(method, url, **kwargs)
+            ok = response.status < 500
+            return response
+        finally:
+            self.record(node, i, time.time() - start, ok)
+    ## DEF
+
+    def record(self, node, i, elapsed, ok):
+        with self.lock:
+            stats = self.stats[node]
+            stats["requests"] += 1
+            stats["time"] += elapsed
+            if not ok: stats["errors"] += 1
+        if i == None:
+            return
+        with self.inflight.get_lock():
+            self.inflight[i] -= 1
+        with self.ewma.get_lock():
+            if self.ewma[i] == 0:
+                self.ewma[i] = elapsed
+            else:
+                self.ewma[i] = constants.ROUTER_EWMA_ALPHA * elapsed + (1 - constants.ROUTER_EWMA_ALPHA) * self.ewma[i]
+        with self.failures.get_lock():
+            if ok:
+                self.failures[i] = 0
+            else:
+                self.failures[i] += 1
+                if self.failures[i] >= constants.ROUTER_MAX_FAILURES:
+                    logging.warning("Query node %s failed %d requests in a row, skipping it for %d seconds" % (node, self.failures[i], constants.ROUTER_RETRY_INTERVAL))
+                    self.failures[i] = 0
+                    self.downUntil[i] = time.time() + constants.ROUTER_RETRY_INTERVAL
+    ## DEF
+
+    def getStats(self):
+        """Per node counters of this process, in the format of Results.driver_stats"""
+        with self.lock:
+            return {"Query Node Routing (%s)" % self.policy: dict((node, dict(stats)) for node, stats in self.stats.items())}
+    ## DEF
+## CLASS
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import constants
+
+class PreparedStatementManager:
+    """Prepares the transaction statements of a run and waits until every query node
+    can execute them.
+
+    The PREPAREs are issued concurrently on the first node. The other nodes pick the
+    statements up asynchronously, so system:prepareds of each node is polled until all
+    names show up; statements a node still misses after PREPARE_READY_TIMEOUT seconds
+    are prepared on that node directly. The names are remembered in cacheFile, keyed by
+    the query nodes, the schema and the statement text, and a later run reuses them
+    without preparing anything when every node still has them.
+    """
+
+    def __init__(self, nodes, execute, cacheFile=None):
+        self.nodes = list(nodes)
+        self.execute = execute
+        self.cacheFile = cacheFile
+    ## DEF
+
+    def prepare(self, schema, statements):
+        """statements maps the key of each statement to its (name, text); returns the
+        key -> prepared name dict"""
+        cacheKey = self.cacheKey(schema, statements)
+        cached = self.loadCache().get(cacheKey)
+        if cached != None and set(cached.keys()) == set(statements.keys()):
+            if len(self.missing(self.nodes, cached.values())) == 0:
+                logging.info("Reusing %d prepared statements from %s" % (len(cached), self.cacheFile))
+                return cached
+
+        start = time.time()
+        prepared = dict(zip(statements.keys(), self.prepareOn(self.nodes[0], statements.values())))
+        self.waitReady(statements, prepared)
+        logging.info("Prepared %d statements on %d query nodes in %.1f sec" % (len(prepared), len(self.nodes), time.time() - start))
+        self.saveCache(cacheKey, prepared)
+        return prepared
+    ## DEF
+
+    def prepareOn(self, node, statements):
+        """PREPARE (name, text) pairs on node concurrently; returns the prepared names in order"""
+        def prepareOne(statement):
+            (name, text) = statement
+            body = self.execute(node, {"statement": "PREPARE %s FROM %s" % (name, text)})
+            if body.get('status') != "success":
+                raise RuntimeError("Failed to prepare %s on %s: %s" % (name, node, body.get('errors')))
+            return body['results'][0]['name']
+        with ThreadPoolExecutor(max_workers=constants.PREPARE_THREADS) as pool:
+            return list(pool.map(prepareOne, list(statements)))
+    ## DEF
+
+    def missing(self, nodes, names):
+        """Map each of nodes to the names it does not have a prepared statement for yet"""
+        names = set(names)
+        missing = { }
+        for node in nodes:
+            body = self.execute(node, {"statement": "SELECT RAW name FROM system:prepareds WHERE node = NODE_NAME()"})
+            if body.get('status') != "success":
+                missing[node] = names
+                continue
+            absent = names - set(body.get('results', [ ]))
+            if len(absent) > 0:
+                missing[node] = absent
+        return missing
+    ## DEF
+
+    def waitReady(self, statements, prepared):
+        if len(self.nodes) == 1:
+            return
+        others = self.nodes[1:]
+        deadline = time.time() + constants.PREPARE_READY_TIMEOUT
+        missing = self.missing(others, prepared.values())
+        while len(missing) > 0 and time.time() < deadline:
+            time.sleep(constants.PREPARE_POLL_INTERVAL)
+            missing = self.missing(list(missing.keys()), prepared.values())
+        ## WHILE
+
+        for node, names in missing.items():
+            logging.warning("Query node %s is missing %d prepared statements, preparing them there" % (node, len(names)))
+            self.prepareOn(node, [ statements[key] for key, name in prepared.items() if name in names ])
+    ## DEF
+
+    def cacheKey(self, schema, statements):
+        digest = hashlib.sha1()
+        for key in sorted(statements.keys()):
+            (name, text) = statements[key]
+            digest.update(("%s\0%s\0%s\0" % (key, name, text)).encode('utf8'))
+        return "%s|%s|%s" % (",".join(sorted(self.nodes)), schema, digest.hexdigest())
+    ## DEF
+
+    def loadCache(self):
+        if not self.cacheFile or not os.path.exists(self.cacheFile):
+            return { }
+        try:
+            with open(self.cacheFile) as f:
+                return json.load(f)
+        except (IOError, ValueError) as ex:
+            logging.warning("Ignoring prepared statement cache %s: %s" % (self.cacheFile, ex))
+            return { }
+    ## DEF
+
+    def saveCache(self, cacheKey, prepared):
+        if not self.cacheFile:
+            return
+        cache = self.loadCache()
+        cache[cacheKey] = prepared
+        try:
+            with open(self.cacheFile, "w") as f:
+                json.dump(cache, f, indent=1, sort_keys=True)
+        except IOError as ex:
+            logging.warning("Could not save the prepared statement cache %s: %s" % (self.cacheFile, ex))
+    ## DEF
+## CLASS
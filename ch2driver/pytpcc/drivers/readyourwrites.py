@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import time
+
+import constants
+
+## Scan consistency policies of Order-Status, in the order --read-your-writes compare cycles through them
+POLICIES = ("not_bounded", "own_writes", "request_plus")
+
+class ReadYourWrites:
+    """Picks the scan consistency of each Order-Status so that it sees the orders this
+    client placed, without paying for request_plus when there is nothing to wait for.
+
+    New-Order records the customers it committed an order for. With the own_writes policy
+    an Order-Status runs request_plus only while its customer has such an order that no
+    request_plus scan has started after (for a lookup by last name: any customer of the
+    district), and not_bounded otherwise. An order is only forgotten once a request_plus
+    scan that started after it succeeded; when more than READ_YOUR_WRITES_MAX_PENDING
+    customers are waiting, the next Order-Status runs request_plus to clear them. In compare mode the Order-Status cycle through
+    not_bounded, own_writes and request_plus, so the three are measured under the same load.
+    """
+
+    def __init__(self, mode):
+        assert mode in ("own_writes", "compare"), "Unexpected read-your-writes mode: " + mode
+        self.mode = mode
+        self.pending = { }
+        self.size = 0
+        self.next = 0
+        self.stats = dict((policy, {"requests": 0, "time": 0.0, "request_plus": 0}) for policy in POLICIES)
+    ## DEF
+
+    def wrote(self, w_id, d_id, c_id):
+        """A New-Order of the customer committed"""
+        district = self.pending.setdefault((w_id, d_id), { })
+        if c_id not in district:
+            self.size += 1
+        district[c_id] = time.time()
+    ## DEF
+
+    def forget(self, before):
+        """Drop the orders committed before the given time"""
+        for key in list(self.pending.keys()):
+            district = dict((c_id, t) for c_id, t in self.pending[key].items() if t >= before)
+            if len(district) > 0:
+                self.pending[key] = district
+            else:
+                del self.pending[key]
+        self.size = sum(len(district) for district in self.pending.values())
+    ## DEF
+
+    def begin(self, w_id, d_id, c_id):
+        """(policy, scan consistency, start time) of an Order-Status; c_id is None for a lookup by last name"""
+        policy = self.mode
+        if policy == "compare":
+            policy = POLICIES[self.next % len(POLICIES)]
+            self.next += 1
+        if policy == "own_writes":
+            district = self.pending.get((w_id, d_id), { })
+            unseen = len(district) > 0 if c_id == None else c_id in district
+            if self.size >= constants.READ_YOUR_WRITES_MAX_PENDING:
+                unseen = True
+            return (policy, "request_plus" if unseen else "not_bounded", time.time())
+        return (policy, policy, time.time())
+    ## DEF
+
+    def finish(self, policy, level, start, ok):
+        stats = self.stats[policy]
+        stats["requests"] += 1
+        stats["time"] += time.time() - start
+        if level != "request_plus":
+            return
+        stats["request_plus"] += 1
+        if ok:
+            ## A request_plus scan sees every write that committed before it started
+            self.forget(start)
+    ## DEF
+
+    def getStats(self):
+        """Order-Status counters per policy, in the format of Results.driver_stats"""
+        rows = dict((policy, dict(stats)) for policy, stats in self.stats.items() if stats["requests"] > 0)
+        return {"Order-Status Scan Consistency (%s)" % self.mode: rows}
+    ## DEF
+## CLASS
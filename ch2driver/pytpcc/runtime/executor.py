@@ -42,7 +42,7 @@ from util import *
 
 
 class Executor:
-    def __init__(self, clientId, driver, qDone, warmupDurationQ, scaleParameters, TAFlag, warmupDuration, warmupQueryIterations, stop_on_error = False):
+    def __init__(self, clientId, driver, qDone, warmupDurationQ, scaleParameters, TAFlag, warmupDuration, warmupQueryIterations, stop_on_error = False, homeDistricts = None, paramStream = False, measureOverhead = False, maxWarmupDuration = None):
         self.clientId = clientId
         self.TAFlag = TAFlag
         self.driver = driver
@@ -53,11 +53,24 @@ class Executor:
         self.scaleParameters = scaleParameters
         self.stop_on_error = stop_on_error
         self.randomGen = rand.Rand()
+        ## Home (w_id, d_id) pairs of this terminal when running with warehouse affinity
+        self.homeDistricts = homeDistricts
+        self.homeDistrict = None
+        self.paramStream = None
+        if paramStream and TAFlag == "T":
+            if self.randomGen.nurandVar is None:
+                self.randomGen.setNURand(nurand.makeForLoad(self.randomGen.rng))
+            self.paramStream = paramstream.ParameterStream(scaleParameters, self.randomGen.nurandVar, homeDistricts)
+        ## Only the transaction loop is metered: analytics clients spend all of their time in the driver
+        self.measureOverhead = measureOverhead and TAFlag == "T"
+        ## Adaptive warmup: the cutoff is detected at run time, but never later than maxWarmupDuration
+        self.maxWarmupDuration = maxWarmupDuration
     ## DEF
     
     def execute(self, duration, numQueryIterations, warmupDuration, warmupQueryIterations, numAnalyticsClients):
         r = results.Results(warmupDuration, warmupQueryIterations)
         assert r
+        r.maxWarmupDuration = self.maxWarmupDuration
         if duration != None:
             if duration == 1:
                 logging.info("Executing benchmark for %d second" % duration)
@@ -76,8 +89,19 @@ class Executor:
         etime = stime
         if duration != None:
             etime = stime + duration
+        measure = self.measureOverhead
+        if measure:
+            meter = { "txns": 0, "param": 0.0, "driver": 0.0, "bookkeeping": 0.0 }
+            cpuStart = time.process_time()
+            wallStart = time.perf_counter()
+        ## Only the first transactional client detects steady state, on its own throughput, so
+        ## the cutoff is declared once; the other clients take it from warmupDurationQ
+        detector = None
+        if self.maxWarmupDuration != None and self.TAFlag == "T" and self.clientId == numAnalyticsClients:
+            detector = steadystate.SteadyStateDetector(start)
 
         while 1:
+            if measure: loopStart = time.perf_counter()
             if self.warmupDuration == None and self.warmupQueryIterations != None and queryIterNum == self.warmupQueryIterations:
                 self.warmupDuration = time.time() - start
                 self.warmupDurationQ.put(self.warmupDuration)
@@ -85,6 +109,9 @@ class Executor:
                 r.warmupDuration = self.warmupDurationQ.get()
                 self.warmupDuration = r.warmupDuration
                 self.warmupDurationQ.put(r.warmupDuration)
+            if detector != None and self.warmupDuration == None and (time.time() - start) > self.maxWarmupDuration:
+                logging.info("Client ID # %d did not reach steady state within %d seconds" % (self.clientId, self.maxWarmupDuration))
+                self.declareSteadyState(r, self.maxWarmupDuration)
                 
             if duration != None:
                 if (time.time() - start) > duration:
@@ -92,8 +119,11 @@ class Executor:
             elif self.qDone.qsize() == numAnalyticsClients:
                 break
             
+            if measure: genStart = time.perf_counter()
             txn, params = self.doOne()
+            if measure: genTime = time.perf_counter() - genStart
             txn_id = r.startTransaction(txn)
+            if detector != None: txnStart = time.time()
             status = "fatal"
             
             tnum = tnum + 1
@@ -103,7 +133,9 @@ class Executor:
                   
             if debug: logging.debug("Executing '%s' transaction" % txn)
             try:
+                if measure: driverStart = time.perf_counter()
                 val = self.driver.executeTransaction(txn, params, duration, etime, queryIterNum)
+                if measure: driverTime = time.perf_counter() - driverStart
                 if self.TAFlag == "A":
                     queryIterNum += 1
                     r.query_times.append(val[0]) #executeTransaction returns a tuple [query_times, status]
@@ -125,21 +157,57 @@ class Executor:
                 if debug: traceback.print_exc(file=sys.stdout)
                 if self.stop_on_error: raise
                 r.abortTransaction(txn_id)
+                if measure: self.meterTransaction(meter, loopStart, genTime, time.perf_counter() - driverStart)
                 continue
 
             #if debug: logging.debug("%s\nParameters:\n%s\nResult:\n%s" % (txn, pformat(params), pformat(val)))
             r.stopTransaction(txn_id, status)
+            if detector != None and self.warmupDuration == None:
+                now = time.time()
+                if detector.record(now, now - txnStart):
+                    logging.info("Client ID # %d detected steady state after %d seconds" % (self.clientId, now - start))
+                    self.declareSteadyState(r, now - start)
+            if measure: self.meterTransaction(meter, loopStart, genTime, driverTime)
         ## WHILE
         r.stopBenchmark()
+        r.mergeDriverStats(self.driver.getStats())
+        r.mergeFreshness(self.driver.getFreshness())
+        if measure:
+            meter["client"] = self.clientId + 1
+            meter["wall"] = time.perf_counter() - wallStart
+            meter["cpu"] = time.process_time() - cpuStart
+            if meter["wall"] > 0 and meter["cpu"] / meter["wall"] >= constants.CLIENT_CPU_SATURATION:
+                logging.warning("Client ID # %d used %.0f%% of a CPU: the client host may be limiting the results" % (self.clientId, 100 * meter["cpu"] / meter["wall"]))
+            r.harness_overhead.append(meter)
         return (r)
     ## DEF
     
+    def declareSteadyState(self, r, warmupDuration):
+        """End the warmup of this client and broadcast the cutoff to all the other clients.
+        Called at most once, by the only client that runs the detector."""
+        self.warmupDuration = warmupDuration
+        r.warmupDuration = warmupDuration
+        self.warmupDurationQ.put(warmupDuration)
+    ## DEF
+
+    def meterTransaction(self, meter, loopStart, genTime, driverTime):
+        """Split the wall time of one loop iteration into parameter generation, driver call and
+        harness bookkeeping (results dicts, warmup/done queue polling and logging)."""
+        loopTime = time.perf_counter() - loopStart
+        meter["txns"] += 1
+        meter["param"] += genTime
+        meter["driver"] += driverTime
+        meter["bookkeeping"] += loopTime - genTime - driverTime
+    ## DEF
+
     def doOne(self):
         """Selects and executes a transaction at random. The number of new order transactions executed per minute is the official "tpmC" metric. See TPC-C 5.4.2 (page 71)."""
         
         ## This is not strictly accurate: The requirement is for certain
         ## *minimum* percentages to be maintained. This is close to the right
         ## thing, but not precisely correct. See TPC-C 5.2.4 (page 68).
+        if self.paramStream != None:
+            return self.paramStream.next()
         x = self.randomGen.number(1, 100)
         params = None
         txn = None
@@ -256,7 +324,8 @@ class Executor:
             ## select in range [1, num_warehouses] excluding w_id
             c_w_id = self.randomGen.numberExcluding(self.scaleParameters.starting_warehouse, self.scaleParameters.ending_warehouse, w_id)
             assert c_w_id != w_id
-            c_d_id = self.makeDistrictId()
+            ## Remote customers are not bound to the terminal's home district
+            c_d_id = self.randomGen.number(1, self.scaleParameters.districtsPerWarehouse)
 
         ## 60%: payment by last name
         if y <= 60:
@@ -281,6 +350,11 @@ class Executor:
     ## DEF
 
     def makeWarehouseId(self):
+        if self.homeDistricts != None:
+            ## Pick one of the home districts for this transaction. makeDistrictId()
+            ## returns the matching d_id until the next call to makeWarehouseId().
+            self.homeDistrict = self.homeDistricts[self.randomGen.number(0, len(self.homeDistricts) - 1)]
+            return self.homeDistrict[0]
         w_id = self.randomGen.number(self.scaleParameters.starting_warehouse, self.scaleParameters.ending_warehouse)
         assert(w_id >= self.scaleParameters.starting_warehouse), "Invalid W_ID: %d" % w_id
         assert(w_id <= self.scaleParameters.ending_warehouse), "Invalid W_ID: %d" % w_id
@@ -288,6 +362,8 @@ class Executor:
     ## DEF
 
     def makeDistrictId(self):
+        if self.homeDistrict != None:
+            return self.homeDistrict[1]
         return self.randomGen.number(1, self.scaleParameters.districtsPerWarehouse)
     ## DEF
 
@@ -303,3 +379,21 @@ class Executor:
 def makeParameterDict(values, *args):
     return dict(map(lambda x: (x, values[x]), args))
 ## DEF
+
+def makeHomeDistricts(scaleParameters, clientIdx, numClients):
+    """Return the home (w_id, d_id) pairs of transaction client clientIdx out of numClients.
+    The districts of all warehouses are split into contiguous ranges, one per client, so that
+    every terminal keeps a fixed home warehouse and district (TPC-C 2.2.1.1). When there are
+    more clients than districts, the clients wrap around and share districts."""
+    assert 0 <= clientIdx and clientIdx < numClients
+    pairs = [ ]
+    for w_id in range(scaleParameters.starting_warehouse, scaleParameters.ending_warehouse+1):
+        for d_id in range(1, scaleParameters.districtsPerWarehouse+1):
+            pairs.append((w_id, d_id))
+    ## FOR
+    if numClients >= len(pairs):
+        return [ pairs[clientIdx % len(pairs)] ]
+    first = int(clientIdx * len(pairs) / numClients)
+    last = int((clientIdx + 1) * len(pairs) / numClients)
+    return pairs[first:last]
+## DEF
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+## The driver modules import each other from the pytpcc directory (e.g. "import constants")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from util import checksums
+from util.jsonstream import rowChecksum, StreamedResponse
+
+class TestRowChecksum(unittest.TestCase):
+
+    def testFieldOrder(self):
+        self.assertEqual(rowChecksum({"a": 1, "b": "x"}), rowChecksum({"b": "x", "a": 1}))
+
+    def testIntegralFloats(self):
+        self.assertEqual(rowChecksum({"x": 1.0}), rowChecksum({"x": 1}))
+        self.assertEqual(rowChecksum({"x": [2.0, {"y": -0.0}]}), rowChecksum({"x": [2, {"y": 0}]}))
+
+    def testFloatPrecision(self):
+        self.assertEqual(rowChecksum({"x": 0.1 + 0.2}), rowChecksum({"x": 0.3}))
+        self.assertNotEqual(rowChecksum({"x": 1.5}), rowChecksum({"x": 2}))
+
+    def testRowOrder(self):
+        body = b'{"results": [{"a": 1}, {"a": 2.0}, {"a": 3}], "status": "success"}'
+        reordered = b'{"results": [{"a": 3.0}, {"a": 1}, {"a": 2}], "status": "success"}'
+        one = StreamedResponse([ body ], True)
+        other = StreamedResponse([ reordered ], True)
+        self.assertEqual(one.rowCount, 3)
+        self.assertEqual(one.checksum, other.checksum)
+
+class TestExpectedChecksums(unittest.TestCase):
+
+    def testSaveAndLoad(self):
+        fileName = os.path.join(tempfile.mkdtemp(), "expected.json")
+        key = checksums.checksumKey("CH2", 10, 42)
+        self.assertEqual(checksums.loadExpected(fileName, key), { })
+        checksums.saveExpected(fileName, key, {"Q01": (5, 0xabc)})
+        checksums.saveExpected(fileName, checksums.checksumKey("CH2", 20, 42), {"Q01": (9, 0x1)})
+        self.assertEqual(checksums.loadExpected(fileName, key), {"Q01": (5, 0xabc)})
+
+    def testConflictingResultsAreNotRecorded(self):
+        def entry(rows, checksum):
+            return [ 1, 1, "", "1s", "", {"rows": rows, "checksum": checksum} ]
+        clients = [ [ {"Q01": entry(5, 1), "Q02": entry(3, 1)}, {"Q01": entry(5, 1), "Q02": entry(3, 2)} ] ]
+        self.assertEqual(checksums.observedChecksums(clients), {"Q01": (5, 1)})
+
+if __name__ == '__main__':
+    unittest.main()
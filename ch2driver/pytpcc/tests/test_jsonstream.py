@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from util.jsonstream import StreamedResponse
+
+BODY = {
+    "requestID": "0f3c",
+    "signature": {"*": "*"},
+    "results": [ {"n": 12345, "f": -1.5e-3, "s": "quote \" and \\ and é中\U0001F600"}, [ 1, [ ] ], {}, 7, "x", None ],
+    "plans": {},
+    "status": "success",
+    "metrics": {"elapsedTime": "12.5ms", "executionTime": 12000000, "resultCount": 6},
+}
+
+def chunked(data, size):
+    return [ data[i:i + size] for i in range(0, len(data), size) ]
+
+class TestStreamedResponse(unittest.TestCase):
+
+    def check(self, data, size):
+        whole = StreamedResponse([ data ], True)
+        streamed = StreamedResponse(chunked(data, size), True)
+        expected = dict((k, v) for k, v in BODY.items() if k != "results")
+        self.assertEqual(streamed.body, expected, "chunk size %d" % size)
+        self.assertEqual(streamed.rowCount, len(BODY["results"]), "chunk size %d" % size)
+        self.assertEqual(streamed.checksum, whole.checksum, "chunk size %d" % size)
+
+    def testChunkBoundaries(self):
+        ## Every chunk size splits the body at a different place: inside strings, escapes,
+        ## multi-byte characters, numbers and between tokens
+        data = json.dumps(BODY, ensure_ascii=False).encode('utf8')
+        for size in range(1, len(data) + 1):
+            self.check(data, size)
+
+    def testEscapedUnicode(self):
+        data = json.dumps(BODY, indent=2).encode('utf8')
+        for size in range(1, 40):
+            self.check(data, size)
+
+    def testNumberAtChunkEnd(self):
+        streamed = StreamedResponse([ b'{"results": [12', b'34, 5', b'6], "status": "succ', b'ess"}' ], True)
+        self.assertEqual(streamed.rowCount, 2)
+        self.assertEqual(streamed.checksum, StreamedResponse([ b'{"results": [1234, 56]}' ], True).checksum)
+        self.assertEqual(streamed.body, {"status": "success"})
+
+    def testEmptyResults(self):
+        streamed = StreamedResponse([ b'{"results": [', b' ], "status": "success"}' ])
+        self.assertEqual(streamed.rowCount, 0)
+        self.assertEqual(streamed.body, {"status": "success"})
+
+    def testTruncated(self):
+        with self.assertRaises(ValueError):
+            StreamedResponse([ b'{"results": [{"a": 1}, {"a"' ])
+
+if __name__ == '__main__':
+    unittest.main()
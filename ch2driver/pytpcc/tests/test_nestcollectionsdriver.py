@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("urllib3")
+pytest.importorskip("couchbase")
+
+import constants
+
+ENV = {
+    "USER_ID": "user", "PASSWORD": "password", "USER_ID_ANALYTICS": "user", "PASSWORD_ANALYTICS": "password", "TLS": "0",
+    "QUERY_URL": "127.0.0.1:8093", "MULTI_QUERY_URL": "127.0.0.1:8093", "DATA_URL": "127.0.0.1", "MULTI_DATA_URL": "127.0.0.1",
+    "ANALYTICS_URL": "127.0.0.1:8095", "TXTIMEOUT": "3",
+}
+
+with mock.patch.dict(os.environ, ENV):
+    from drivers import nestcollectionsdriver
+
+class DriverTestCase(unittest.TestCase):
+
+    def makeDriver(self, env):
+        """The driver of the main process (clientId -1) of a transaction run, without a cluster"""
+        with mock.patch.dict(os.environ, dict(ENV, **env)), \
+             mock.patch.object(nestcollectionsdriver, "PreparedStatementManager") as manager, \
+             mock.patch.object(nestcollectionsdriver, "pysdk_init") as sdk:
+            manager.return_value.prepare.return_value = { }
+            driver = nestcollectionsdriver.NestcollectionsDriver("", -1, "T", constants.CH2_DRIVER_SCHEMA["CH2"], { }, { })
+        self.assertFalse(sdk.called)
+        return driver
+
+    def executeStart(self, driver, env):
+        with mock.patch.dict(os.environ, dict(ENV, **env)), \
+             mock.patch.object(nestcollectionsdriver, "pysdk_init") as sdk:
+            driver.executeStart()
+        return sdk
+
+class TestSingleClientExecution(DriverTestCase):
+    """With one client, tpcc.py executes with the driver of the main process (clientId -1),
+    which also prepares the statements; with more, that driver never executes."""
+
+    def testKVMode(self):
+        env = {"TXN_MODE": "kv"}
+        driver = self.makeDriver(env)
+        sdk = self.executeStart(driver, env)
+        sdk.assert_called_once_with(driver)
+
+    def testParallelReads(self):
+        env = {"PARALLEL_READS": "1"}
+        driver = self.makeDriver(env)
+        self.assertIsNone(driver.read_pool)
+        self.executeStart(driver, env)
+        self.assertIsNotNone(driver.read_pool)
+
+    def testReadYourWrites(self):
+        env = {"READ_YOUR_WRITES": "own_writes"}
+        driver = self.makeDriver(env)
+        self.executeStart(driver, env)
+        self.assertIsNotNone(driver.read_your_writes)
+
+    def testFreshnessProbe(self):
+        ## A transaction-only run has no analytics client, so the first transaction client is 0
+        env = {"FRESHNESS_INTERVAL": "5", "FRESHNESS_CLIENT": "0"}
+        driver = self.makeDriver(env)
+        with mock.patch.object(nestcollectionsdriver, "FreshnessProbe") as probe:
+            self.executeStart(driver, env)
+        probe.return_value.start.assert_called_once_with()
+        self.assertIs(driver.freshness_probe, probe.return_value)
+
+class TestParallelReads(DriverTestCase):
+
+    def testPaymentStaticReads(self):
+        ## The warehouse and district names go out without the txid, the customer read in the transaction
+        calls = [ ]
+        def runNQueryParam(prepared, param, txid, randomhost):
+            calls.append((prepared, txid))
+            return ([ prepared ], "success")
+        driver = self.makeDriver({"PARALLEL_READS": "1"})
+        self.executeStart(driver, {"PARALLEL_READS": "1"})
+        driver.prepared_dict = dict((driver.schema + "PAYMENT" + q, q) for q in ("getCustomersByLastName", "getWarehouse", "getDistrict"))
+        with mock.patch.object(nestcollectionsdriver, "runNQueryParam", runNQueryParam):
+            rs = driver.runReads("PAYMENT", [ ("getCustomersByLastName", [ 1, 1, "BAR" ]), ("getWarehouse", [ 1 ]), ("getDistrict", [ 1, 1 ]) ], "tx1", "node")
+        self.assertEqual([ r[0] for r in rs ], [ [ "getCustomersByLastName" ], [ "getWarehouse" ], [ "getDistrict" ] ])
+        self.assertEqual(sorted(calls), [ ("getCustomersByLastName", "tx1"), ("getDistrict", ""), ("getWarehouse", "") ])
+
+if __name__ == '__main__':
+    unittest.main()
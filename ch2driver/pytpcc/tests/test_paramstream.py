@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import constants
+from util import nurand, paramstream, scaleparameters
+
+def withoutDates(params):
+    """The parameters without the datetime.now() fields"""
+    return dict((k, v) for k, v in params.items() if k not in ("o_entry_d", "h_date", "ol_delivery_d"))
+
+class TestParameterStream(unittest.TestCase):
+
+    def makeStream(self, seed, homeDistricts=None):
+        sp = scaleparameters.makeWithScaleFactor(4, 1, 100)
+        nurandVar = nurand.makeForRun(nurand.makeForLoad(random.Random(1)), random.Random(2))
+        return paramstream.ParameterStream(sp, nurandVar, homeDistricts, blockSize=64, seed=seed)
+
+    def testSameSeedSameStream(self):
+        one = self.makeStream(7)
+        other = self.makeStream(7)
+        for i in range(200):
+            (txn, params), (txn2, params2) = one.next(), other.next()
+            self.assertEqual(txn, txn2)
+            self.assertEqual(withoutDates(params), withoutDates(params2))
+
+    def testParameterRanges(self):
+        stream = self.makeStream(3)
+        seen = set()
+        for i in range(1000):
+            txn, params = stream.next()
+            seen.add(txn)
+            self.assertTrue(1 <= params["w_id"] <= 4)
+            self.assertIsInstance(params["w_id"], int)
+            if txn == constants.TransactionTypes.NEW_ORDER:
+                self.assertTrue(constants.MIN_OL_CNT <= len(params["i_ids"]) <= constants.MAX_OL_CNT)
+                self.assertEqual(len(params["i_ids"]), len(params["i_qtys"]))
+            elif txn in (constants.TransactionTypes.PAYMENT, constants.TransactionTypes.ORDER_STATUS):
+                self.assertTrue((params["c_id"] == None) != (params["c_last"] == None))
+        self.assertEqual(seen, set(paramstream.TXN_TYPES))
+
+    def testHomeDistricts(self):
+        stream = self.makeStream(5, homeDistricts=[ (2, 3), (4, 7) ])
+        for i in range(200):
+            txn, params = stream.next()
+            if "d_id" in params:
+                self.assertIn((params["w_id"], params["d_id"]), [ (2, 3), (4, 7) ])
+
+if __name__ == '__main__':
+    unittest.main()
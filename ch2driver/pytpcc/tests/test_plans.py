@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from util import plans
+
+def scanPlan(index, cost=10.5, cardinality=100):
+    return {"#operator": "Sequence", "~children": [
+        {"#operator": "IndexScan3", "index": index, "cost": cost, "cardinality": cardinality},
+        {"#operator": "Fetch", "keyspace": "orders", "optimizer_estimates": {"size": 12}},
+    ], "#stats": {"execTime": "1ms"}, "text": "SELECT ..."}
+
+class TestPlans(unittest.TestCase):
+
+    def testFingerprintIgnoresVolatileFields(self):
+        self.assertEqual(plans.planFingerprint(scanPlan("o_idx", 10.5, 100)), plans.planFingerprint(scanPlan("o_idx", 99.0, 7)))
+        self.assertNotEqual(plans.planFingerprint(scanPlan("o_idx")), plans.planFingerprint(scanPlan("o_idx2")))
+
+    def testFirstDifference(self):
+        old = plans.normalizePlan(scanPlan("o_idx"))
+        new = plans.normalizePlan(scanPlan("o_idx2"))
+        self.assertEqual(plans.firstDifference(old, new), "$.~children[0].index")
+        self.assertEqual(plans.firstDifference(old, old), None)
+        self.assertEqual(plans.firstDifference([ 1 ], [ 1, 2 ]), "$[1]")
+
+    def testComparePlans(self):
+        baseline = plans.makePlanRecord({"transactions": {"a": scanPlan("x"), "b": scanPlan("y"), "gone": scanPlan("z")}})
+        current = plans.makePlanRecord({"transactions": {"a": scanPlan("x", cost=1), "b": scanPlan("y2"), "added": scanPlan("z")}})
+        changes = plans.comparePlans(baseline, current)
+        self.assertEqual([ (c[1], c[2]) for c in changes ], [ ("added", "new"), ("b", "changed"), ("gone", "missing") ])
+        self.assertTrue(changes[1][3].endswith(" at $.~children[0].index"))
+        self.assertEqual(plans.comparePlans(baseline, baseline), [ ])
+
+if __name__ == '__main__':
+    unittest.main()
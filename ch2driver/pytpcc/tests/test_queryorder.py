@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import constants
+from util.queryorder import makeQueryPermutation
+
+class TestQueryPermutation(unittest.TestCase):
+
+    def testHandWrittenPermutations(self):
+        for clientId in range(len(constants.CH2_QUERIES_PERM)):
+            self.assertEqual(makeQueryPermutation(0, clientId, 0), list(constants.CH2_QUERIES_PERM[clientId]))
+
+    def testGeneratedPermutations(self):
+        queries = sorted(constants.CH2_QUERIES_PERM[0])
+        self.assertEqual(len(queries), 22)
+        for seed, clientId, iteration in [ (0, len(constants.CH2_QUERIES_PERM), 0), (0, 0, 1), (3, 0, 0), (3, 500, 7) ]:
+            self.assertEqual(sorted(makeQueryPermutation(seed, clientId, iteration)), queries)
+
+    def testDeterministic(self):
+        self.assertEqual(makeQueryPermutation(3, 500, 7), makeQueryPermutation(3, 500, 7))
+        self.assertNotEqual(makeQueryPermutation(3, 500, 7), makeQueryPermutation(3, 500, 8))
+        self.assertNotEqual(makeQueryPermutation(3, 500, 7), makeQueryPermutation(3, 501, 7))
+        self.assertNotEqual(makeQueryPermutation(0, 0, 0), makeQueryPermutation(1, 0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
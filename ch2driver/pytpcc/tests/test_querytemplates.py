@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+import unittest
+
+from util import querytemplates
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "querygen", "query_templates")
+
+TEMPLATE = """-- A test query
+define LOW = random(10, 20, uniform);
+define HIGH = [LOW]*2 + (7 - 1)/4;
+define NAME = text({"a, b", 1}, {"c", 0});
+define IDS = ulist(random(1, 3, uniform), 3);
+
+SELECT * FROM t
+WHERE x BETWEEN [LOW] AND [HIGH] AND n = '[NAME]' AND id IN ([IDS.1], [IDS.2], [IDS.3]);
+"""
+
+class TestQueryTemplate(unittest.TestCase):
+
+    def testGenerate(self):
+        template = querytemplates.QueryTemplate("Q99", TEMPLATE)
+        for seed in range(20):
+            query = template.generate(random.Random(seed))
+            self.assertTrue(query.startswith("SELECT * FROM t WHERE x BETWEEN "), query)
+            self.assertFalse(query.endswith(";"))
+            words = query.split()
+            low, high = int(words[7]), int(words[9])
+            self.assertTrue(10 <= low <= 20)
+            self.assertEqual(high, low * 2 + 1)
+            self.assertIn("n = 'a, b'", query)
+            self.assertEqual(sorted(query[query.index("IN (") + 4:-1].split(", ")), [ "1", "2", "3" ])
+
+    def testUndefinedSubstitution(self):
+        template = querytemplates.QueryTemplate("Q99", "SELECT [MISSING];")
+        with self.assertRaises(ValueError):
+            template.generate(random.Random(0))
+
+class TestQueryStreams(unittest.TestCase):
+
+    def setUp(self):
+        self.templates = querytemplates.loadTemplates(TEMPLATES_DIR)
+
+    def testShippedTemplates(self):
+        self.assertEqual(sorted(self.templates.keys()), [ "Q%02d" % i for i in range(1, 23) ])
+        for query in self.makeStreams(0, 0, 1)[0].values():
+            self.assertIsNone(querytemplates.REFERENCE.search(query), query)
+
+    def makeStreams(self, seed, clientId, iterations):
+        return querytemplates.makeQueryStreams(self.templates, seed, clientId, iterations)
+
+    def testDeterministic(self):
+        self.assertEqual(self.makeStreams(5, 2, 3), self.makeStreams(5, 2, 3))
+        ## A stream does not depend on how many iterations were generated
+        self.assertEqual(self.makeStreams(5, 2, 1)[0], self.makeStreams(5, 2, 3)[0])
+
+    def testClientsAndIterationsDiffer(self):
+        streams = self.makeStreams(5, 0, 2)
+        self.assertNotEqual(streams[0], streams[1])
+        self.assertNotEqual(streams[0], self.makeStreams(5, 1, 1)[0])
+        self.assertNotEqual(streams[0], self.makeStreams(6, 0, 1)[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+from unittest import mock
+
+import constants
+from drivers.readyourwrites import ReadYourWrites
+
+class TestReadYourWrites(unittest.TestCase):
+
+    def testOwnWrites(self):
+        ryw = ReadYourWrites("own_writes")
+        self.assertEqual(ryw.begin(1, 1, 5)[1], "not_bounded")
+        ryw.wrote(1, 1, 5)
+        self.assertEqual(ryw.begin(1, 1, 5)[1], "request_plus")
+        self.assertEqual(ryw.begin(1, 1, None)[1], "request_plus")
+        self.assertEqual(ryw.begin(1, 1, 6)[1], "not_bounded")
+        self.assertEqual(ryw.begin(1, 2, None)[1], "not_bounded")
+
+    def testKeptUntilSeen(self):
+        ryw = ReadYourWrites("own_writes")
+        ryw.wrote(1, 1, 5)
+        ## Neither time nor a failed request_plus scan forgets the order
+        with mock.patch.object(time, "time", return_value=time.time() + 3600):
+            policy, level, start = ryw.begin(1, 1, 5)
+            self.assertEqual(level, "request_plus")
+            ryw.finish(policy, level, start, False)
+            self.assertEqual(ryw.begin(1, 1, 5)[1], "request_plus")
+            ## A request_plus scan that started after it sees it
+            policy, level, start = ryw.begin(1, 1, 5)
+            ryw.finish(policy, level, start, True)
+        self.assertEqual(ryw.begin(1, 1, 5)[1], "not_bounded")
+        self.assertEqual(ryw.pending, { })
+
+    def testBounded(self):
+        ryw = ReadYourWrites("own_writes")
+        with mock.patch.object(constants, "READ_YOUR_WRITES_MAX_PENDING", 3):
+            for c_id in range(3):
+                ryw.wrote(1, 1, c_id)
+            ## Every Order-Status is request_plus until one clears the pending orders
+            policy, level, start = ryw.begin(2, 2, 1)
+            self.assertEqual(level, "request_plus")
+            ryw.finish(policy, level, start, True)
+            self.assertEqual(ryw.size, 0)
+            self.assertEqual(ryw.begin(2, 2, 1)[1], "not_bounded")
+
+    def testCompare(self):
+        ryw = ReadYourWrites("compare")
+        self.assertEqual([ ryw.begin(1, 1, 5)[0] for i in range(4) ], [ "not_bounded", "own_writes", "request_plus", "not_bounded" ])
+
+if __name__ == '__main__':
+    unittest.main()
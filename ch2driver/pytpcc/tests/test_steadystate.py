@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from util.steadystate import SteadyStateDetector
+
+def feed(detector, rates, latency=0.01, interval=1):
+    """Complete rates[i] transactions in the i-th interval of the detector.
+    Returns the index of the interval in which steady state was first reported, or None."""
+    for i, rate in enumerate(rates):
+        for j in range(rate):
+            if detector.record(i * interval + (j + 0.5) * interval / rate, latency):
+                return i
+    return None
+
+class TestSteadyStateDetector(unittest.TestCase):
+
+    def testRampUpThenStable(self):
+        detector = SteadyStateDetector(0, interval=1, window=4, tolerance=0.1)
+        ## The window holds the last 4 closed intervals; steady state is reported in the
+        ## interval after the 4th stable one closed
+        self.assertEqual(feed(detector, [ 10, 40, 70, 100, 100, 101, 99, 100, 100, 100 ]), 7)
+
+    def testNeedsAFullWindow(self):
+        detector = SteadyStateDetector(0, interval=1, window=4, tolerance=0.1)
+        self.assertEqual(feed(detector, [ 100, 100, 100, 100 ]), None)
+
+    def testNoisyThroughput(self):
+        detector = SteadyStateDetector(0, interval=1, window=4, tolerance=0.1)
+        self.assertEqual(feed(detector, [ 100, 60, 140, 70, 130, 60, 140, 80, 120 ]), None)
+
+    def testSlowTrend(self):
+        ## Every window has a low coefficient of variation, but the newer half is 14% above the older one
+        detector = SteadyStateDetector(0, interval=1, window=4, tolerance=0.1)
+        self.assertEqual(feed(detector, [ int(100 * 1.07 ** i) for i in range(15) ]), None)
+
+    def testUnstableLatency(self):
+        detector = SteadyStateDetector(0, interval=1, window=4, tolerance=0.1)
+        for i in range(10):
+            for j in range(100):
+                self.assertFalse(detector.record(i + (j + 0.5) / 100, 0.01 * (i + 1)))
+
+if __name__ == '__main__':
+    unittest.main()
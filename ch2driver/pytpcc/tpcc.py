@@ -34,6 +34,7 @@ import logging
 import re
 import argparse
 import glob
+import json
 import time
 import multiprocessing
 from configparser import ConfigParser
@@ -48,6 +49,9 @@ logging.basicConfig(level = logging.INFO,
                     datefmt="%m-%d-%Y %H:%M:%S",
                     stream = sys.stdout)
 
+## Templates of the analytical queries shipped with the repository (see querygen/README.md)
+QUERY_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "querygen", "query_templates")
+
 ## ==============================================
 ## createDriverClass
 ## ==============================================
@@ -163,12 +167,118 @@ def startExecution(driverClass, schema, preparedTransactionQueries, analyticalQu
         if type(r) == int and r == -1: sys.exit(1)
         total_results.warmupDuration = r.warmupDuration
         total_results.warmupQueryIterations = r.warmupQueryIterations
+        total_results.maxWarmupDuration = r.maxWarmupDuration
         total_results.append(r)
     ## FOR
 
     return (total_results)
 ## DEF
 
+## ==============================================
+## startCapacitySearch
+## ==============================================
+def startCapacitySearch(driverClass, schema, preparedTransactionQueries, analyticalQueries, warmupDuration, warmupQueryIterations, scaleParameters, args, config):
+    """Run one measurement step per transaction client count against the already loaded
+    data, stepping linearly (or doubling and then bisecting), until the New-Order p90
+    latency violates the SLO or the tpmC stops improving."""
+    m = multiprocessing.Manager()
+    slo = args['search_slo_ms'] / 1000.0
+    steps = [ ]
+    measured = { }
+
+    def runStep(numTClients):
+        if numTClients in measured:
+            return measured[numTClients]
+        logging.info("Capacity search: running with %d transaction clients" % numTClients)
+        stepArgs = dict(args)
+        stepArgs['tclients'] = numTClients
+        r = startExecution(driverClass, schema, preparedTransactionQueries, analyticalQueries, m.Queue(), m.Queue(), warmupDuration, warmupQueryIterations, scaleParameters, stepArgs, config)
+        res_duration = r.measuredDuration(args['duration'])
+        step = {
+            "tclients": numTClients,
+            "tpmC": r.tpmC(args['duration']),
+            "p90": r.latencyPercentile(constants.TransactionTypes.NEW_ORDER, 90),
+            "txnRate": sum(r.txn_counters.values()) / res_duration,
+            "stop": "",
+        }
+        logging.info("Capacity search: %d transaction clients, tpmC %.02f, New-Order p90 %s" % (numTClients, step["tpmC"], step["p90"]))
+        measured[numTClients] = step
+        steps.append(step)
+        return step
+
+    def meetsSLO(step):
+        return step["p90"] != None and step["p90"] <= slo
+
+    knee = None
+    lastGood = None
+    firstBad = None
+    numTClients = args['tclients']
+    while numTClients <= args['search_max']:
+        step = runStep(numTClients)
+        if not meetsSLO(step):
+            step["stop"] = "SLO violated"
+            firstBad = numTClients
+            break
+        if knee != None and step["tpmC"] < knee["tpmC"] * (1 + args['search_plateau']):
+            step["stop"] = "plateau"
+            if step["tpmC"] > knee["tpmC"]:
+                knee = step
+            break
+        knee = step
+        lastGood = numTClients
+        if args['search_mode'] == "binary":
+            numTClients *= 2
+        else:
+            numTClients += args['search_step']
+    ## WHILE
+
+    ## Bisect between the last client count that met the SLO and the first one that did not
+    if args['search_mode'] == "binary" and lastGood != None and firstBad != None:
+        while firstBad - lastGood > 1:
+            mid = int((lastGood + firstBad) / 2)
+            step = runStep(mid)
+            if meetsSLO(step):
+                lastGood = mid
+                if step["tpmC"] > knee["tpmC"]:
+                    knee = step
+            else:
+                step["stop"] = "SLO violated"
+                firstBad = mid
+        ## WHILE
+
+    steps.sort(key=lambda x: x["tclients"])
+    return results.showCapacityCurve(steps, knee, slo)
+## DEF
+
+## ==============================================
+## startInterference
+## ==============================================
+def startInterference(driverClass, schema, preparedTransactionQueries, analyticalQueries, warmupDuration, warmupQueryIterations, scaleParameters, args, config):
+    """Run the transaction clients alone, then the analytics clients alone, then both,
+    each for the same duration against the already loaded data, and compare the phases.
+    The transactions of the earlier phases stay in the data of the later ones."""
+    m = multiprocessing.Manager()
+    numAStreams = args['aclients'] * args['query_concurrency']
+    phases = { }
+    for phase, numTClients, numAClients in (("transactions", args['tclients'], 0), ("analytics", 0, args['aclients']), ("mixed", args['tclients'], args['aclients'])):
+        logging.info("Interference: running %s phase with %d transaction and %d analytics clients" % (phase, numTClients, numAClients))
+        phaseArgs = dict(args)
+        phaseArgs['tclients'] = numTClients
+        phaseArgs['aclients'] = numAClients
+        phaseWarmupDuration = warmupDuration
+        if numTClients == 0 and args['max_warmup_duration'] != None:
+            ## No transaction client detects steady state: warm up for the adaptive upper bound
+            phaseArgs['max_warmup_duration'] = None
+            phaseWarmupDuration = args['max_warmup_duration']
+        r = startExecution(driverClass, schema, preparedTransactionQueries, analyticalQueries, m.Queue(), m.Queue(), phaseWarmupDuration, warmupQueryIterations, scaleParameters, phaseArgs, config)
+        r.txn_mode = args['txn_mode']
+        print ("\n\nInterference phase: %s" % phase)
+        print (r.show(args['duration'], args['query_iterations'], numTClients + numAClients, numAClients * args['query_concurrency']))
+        phases[phase] = r
+    ## FOR
+    return results.showInterference(phases["transactions"], phases["analytics"], phases["mixed"], args['duration'], numAStreams)
+## DEF
+
 ## ==============================================
 ## executorFunc
 ## ==============================================
@@ -180,7 +290,11 @@ def executorFunc(clientId, TAFlag, driverClass, schema, preparedTransactionQueri
     config['execute'] = True
     config['reset'] = False
     driver.loadConfig(config)
-    e = executor.Executor(clientId, driver, qDone, warmupDurationQ, scaleParameters, TAFlag, warmupDuration, warmupQueryIterations, stop_on_error=args['stop_on_error'])
+    homeDistricts = None
+    if args['warehouse_affinity'] and TAFlag == "T":
+        homeDistricts = executor.makeHomeDistricts(scaleParameters, clientId - numAClients, args['tclients'])
+        logging.debug("Client ID # %d home districts: %s" % (clientId, homeDistricts))
+    e = executor.Executor(clientId, driver, qDone, warmupDurationQ, scaleParameters, TAFlag, warmupDuration, warmupQueryIterations, stop_on_error=args['stop_on_error'], homeDistricts=homeDistricts, paramStream=args['param_stream'], measureOverhead=args['measure_overhead'], maxWarmupDuration=args['max_warmup_duration'])
     driver.executeStart()
     results = e.execute(args['duration'], args['query_iterations'], warmupDuration, warmupQueryIterations, numAClients)
     driver.executeFinish()
@@ -188,6 +302,30 @@ def executorFunc(clientId, TAFlag, driverClass, schema, preparedTransactionQueri
     return results
 ## DEF
 
+## ==============================================
+## capturePlans
+## ==============================================
+def capturePlans(driver, schema, args, transactions, analytics):
+    captured = driver.capturePlans(transactions, analytics)
+    if captured == None:
+        logging.warning("The %s driver does not capture query plans" % args['system'])
+        return
+    record = {"schema": schema, "warehouses": args['warehouses'], "plans": plans.makePlanRecord(captured)}
+    if args['capture_plans']:
+        with open(args['capture_plans'], "w") as f:
+            json.dump(record, f, indent=2, sort_keys=True)
+        logging.info("Saved the plans of %d statements to %s" % (sum(len(s) for s in captured.values()), args['capture_plans']))
+    if args['plan_baseline']:
+        with open(args['plan_baseline']) as f:
+            baseline = json.load(f)
+        if baseline.get("schema") != schema or baseline.get("warehouses") != args['warehouses']:
+            logging.warning("Plan baseline %s is of %s with %s warehouses" % (args['plan_baseline'], baseline.get("schema"), baseline.get("warehouses")))
+        changes = plans.comparePlans(baseline["plans"], record["plans"])
+        for category, name, status, detail in changes:
+            logging.warning("Plan of %s statement %s is %s (%s)" % (category, name, status, detail))
+        print (plans.showPlanChanges(changes, args['plan_baseline']))
+## DEF
+
 ## ==============================================
 ## main
 ## ==============================================
@@ -228,6 +366,8 @@ if __name__ == '__main__':
                          help='How long to run the benchmark in seconds')
     aparser.add_argument('--warmup-duration', type=int, metavar='WD',
                          help='Warm up duration of the benchmark in seconds')
+    aparser.add_argument('--adaptive-warmup', action='store_true',
+                         help='End the warmup once the throughput and latency of the first transaction client are stable, for all the clients; --warmup-duration becomes the upper bound (default: half of the duration)')
     aparser.add_argument('--query-iterations', type=int, metavar='QI',
                          help='How many iterations of the queries to run')
     aparser.add_argument('--warmup-query-iterations', type=int, metavar='WQI',
@@ -238,6 +378,26 @@ if __name__ == '__main__':
                          help='The number of blocking transaction clients to fork')
     aparser.add_argument('--aclients', default=0, type=int, metavar='AC',
                          help='The number of blocking analytics clients to fork')
+    aparser.add_argument('--warehouse-affinity', action='store_true',
+                         help='Give every transaction client a fixed range of home warehouses/districts')
+    aparser.add_argument('--param-stream', action='store_true',
+                         help='Pre-generate the transaction input parameters in blocks with NumPy')
+    aparser.add_argument('--measure-overhead', action='store_true',
+                         help='Break down the time of every transaction client into parameter generation, driver call and harness bookkeeping')
+    aparser.add_argument('--capacity-search', action='store_true',
+                         help='Search for the maximum sustainable tpmC, starting with --tclients transaction clients')
+    aparser.add_argument('--search-mode', choices=['linear', 'binary'], default='linear',
+                         help='Add --search-step clients per step, or double the clients and bisect once the SLO is violated')
+    aparser.add_argument('--search-step', default=1, type=int,
+                         help='Number of transaction clients added per capacity search step')
+    aparser.add_argument('--search-max', default=256, type=int,
+                         help='Maximum number of transaction clients in the capacity search')
+    aparser.add_argument('--search-slo-ms', default=5000, type=float,
+                         help='New-Order 90th percentile response time SLO in milliseconds')
+    aparser.add_argument('--search-plateau', default=0.02, type=float,
+                         help='Stop the capacity search when tpmC improves by less than this fraction')
+    aparser.add_argument('--interference', action='store_true',
+                         help='Run the transaction clients alone, the analytics clients alone and both together, and report how much each workload slows down the other')
     aparser.add_argument('--stop-on-error', action='store_true',
                          help='Stop the transaction execution when the driver throws an exception.')
     aparser.add_argument('--no-load', action='store_true',
@@ -279,12 +439,56 @@ if __name__ == '__main__':
                          help='txtimeout number in sec(ex: 2.5)')
     aparser.add_argument('--scan_consistency', metavar='not_bounded', default="not_bounded",
                          help='not_bounded,request_plus')
+    aparser.add_argument('--read-your-writes', choices=['own_writes', 'compare'],
+                         help='Run Order-Status request_plus only while it may miss an order this client placed (until a request_plus scan started after the order), not_bounded otherwise (own_writes), or alternate between not_bounded, own_writes and request_plus to compare their cost (compare)')
     aparser.add_argument('--run-date',
                          help='run date for CH2 data', default = "2021-01-01 00:00:00")
     aparser.add_argument('--tls', action='store_true',
                          help='Connect to Couchbase using TLS')
     aparser.add_argument('--ignore-skip-index-hints', action='store_true',
                          help='Ignore any "skip index" hints in the analytics queries')
+    aparser.add_argument('--parallel-reads', action='store_true',
+                         help='Issue the reads of data no transaction changes (items, tax rates, customer discount, warehouse and district names) concurrently, outside of the transaction')
+    aparser.add_argument('--batch-item-stock', action='store_true',
+                         help='Fetch the items and the stock of a New-Order with one multi-key read each')
+    aparser.add_argument('--single-write-order', action='store_true',
+                         help='Build the complete New-Order order document on the client and write it once (--txn-mode udf always does)')
+    aparser.add_argument('--query-routing', choices=['pinned', 'least-outstanding', 'latency'], default='pinned',
+                         help='Pin each client to one of --multi-query-url, or pick the query node of each transaction by outstanding requests or latency')
+    aparser.add_argument('--delivery-mode', choices=['serial', 'batch'], default='serial',
+                         help='Deliver the districts one transaction at a time, or all in one transaction with set-based statements (batch)')
+    aparser.add_argument('--txn-mode', choices=['n1ql', 'kv', 'udf'], default='n1ql',
+                         help='Run the transactions as N1QL statements, as SDK transactions with KV reads and writes (kv; the index lookups by last name and of the oldest new order run outside the transaction), or as one server-side JavaScript function call each (udf)')
+    aparser.add_argument('--stream-analytics', action='store_true',
+                         help='Consume the analytics responses as they arrive, counting the result rows instead of keeping them')
+    aparser.add_argument('--analytics-checksum', action='store_true',
+                         help='With --stream-analytics, report an order-insensitive checksum of the result rows of every query')
+    aparser.add_argument('--expected-checksums', metavar='FILE',
+                         help='Compare the row count and checksum of every analytical query with the ones in FILE for this schema, warehouse count and --datagenSeed (implies --analytics-checksum)')
+    aparser.add_argument('--record-checksums', action='store_true',
+                         help='Store the row counts and checksums of this run in --expected-checksums instead of comparing them')
+    aparser.add_argument('--freshness-interval', type=float, default=0, metavar='SECONDS',
+                         help='Have the first transaction client write a marker every SECONDS and report how long analytics takes to see it (0 to disable)')
+    aparser.add_argument('--query-templates', nargs='?', metavar='DIR', const=QUERY_TEMPLATES_DIR,
+                         help='Generate the analytical queries of every client and loop from the querygen templates in DIR (default %s); CH2 schema only, and the templates replace the --nonOptimizedQueries choice and --ignore-skip-index-hints' % QUERY_TEMPLATES_DIR)
+    aparser.add_argument('--query-seed', type=int, default=0,
+                         help='Seed of the query order of the analytics clients and of the query parameters generated from --query-templates')
+    aparser.add_argument('--query-concurrency', type=int, default=1, metavar='K',
+                         help='Number of analytical queries every analytics client runs at a time')
+    aparser.add_argument('--query-timeout', type=float, default=0, metavar='SECONDS',
+                         help='Cancel analytical queries that run longer than SECONDS (0 for no limit)')
+    aparser.add_argument('--query-timeout-override', action='append', default=[], metavar='QUERY=SECONDS',
+                         help='Timeout of one analytical query, e.g. Q18=1200, instead of --query-timeout; can be repeated')
+    aparser.add_argument('--vary-query-order', action='store_true',
+                         help='Give every query iteration of an analytics client its own query order instead of repeating the first one')
+    aparser.add_argument('--lean-requests', action='store_true',
+                         help='Send the transaction statements as precompiled JSON bodies and ask for compact, compressed responses')
+    aparser.add_argument('--prepared-cache', metavar='FILE', default=constants.PREPARED_CACHE_FILE,
+                         help='File remembering the prepared transaction statements per cluster and schema, reused by later runs (empty to disable)')
+    aparser.add_argument('--capture-plans', metavar='FILE',
+                         help='EXPLAIN the transaction statements and the analytical queries before the run and save their plans to FILE')
+    aparser.add_argument('--plan-baseline', metavar='FILE',
+                         help='Report the statements whose plans differ from the ones saved by an earlier --capture-plans to FILE')
     args = vars(aparser.parse_args())
     print (args)
     if args['debug']: logging.getLogger().setLevel(logging.DEBUG)
@@ -299,6 +503,12 @@ if __name__ == '__main__':
     use_tls = '0'
     unoptimized_queries = '0'
     ignore_skip_index_hints = "0"
+    parallel_reads = "0"
+    batch_item_stock = "0"
+    single_write_order = "0"
+    lean_requests = "0"
+    stream_analytics = "0"
+    analytics_checksum = "0"
 
     if args['query_url']:
         query_url = args['query_url']
@@ -333,6 +543,7 @@ if __name__ == '__main__':
 
     if args['scan_consistency']:
         os.environ["SCAN_CONSISTENCY"] = args['scan_consistency']
+    os.environ["READ_YOUR_WRITES"] = args['read_your_writes'] or ""
 
     if args['userid']:
         userid = args['userid']
@@ -362,6 +573,46 @@ if __name__ == '__main__':
         ignore_skip_index_hints = "1"
     os.environ["IGNORE_SKIP_INDEX_HINTS"] = ignore_skip_index_hints
 
+    if args["parallel_reads"]:
+        parallel_reads = "1"
+    os.environ["PARALLEL_READS"] = parallel_reads
+
+    if args["batch_item_stock"]:
+        batch_item_stock = "1"
+    os.environ["BATCH_ITEM_STOCK"] = batch_item_stock
+
+    if args["single_write_order"]:
+        single_write_order = "1"
+    os.environ["SINGLE_WRITE_ORDER"] = single_write_order
+
+    os.environ["TXN_MODE"] = args["txn_mode"]
+    os.environ["DELIVERY_MODE"] = args["delivery_mode"]
+    os.environ["QUERY_ROUTING"] = args["query_routing"]
+    os.environ["PREPARED_CACHE"] = args["prepared_cache"]
+
+    if args["lean_requests"]:
+        lean_requests = "1"
+    os.environ["LEAN_REQUESTS"] = lean_requests
+
+    os.environ["QUERY_TEMPLATES"] = args["query_templates"] or ""
+    os.environ["QUERY_SEED"] = str(args["query_seed"])
+    os.environ["VARY_QUERY_ORDER"] = "1" if args["vary_query_order"] else "0"
+    os.environ["QUERY_CONCURRENCY"] = str(args["query_concurrency"])
+    os.environ["QUERY_TIMEOUT"] = str(args["query_timeout"])
+    os.environ["QUERY_TIMEOUT_OVERRIDES"] = ",".join(args["query_timeout_override"])
+
+    ## Clients 0 .. aclients-1 run the analytics queries, so the first transaction client is aclients
+    os.environ["FRESHNESS_INTERVAL"] = str(args["freshness_interval"])
+    os.environ["FRESHNESS_CLIENT"] = str(args["aclients"])
+
+    if args["stream_analytics"] or args["expected_checksums"]:
+        stream_analytics = "1"
+    os.environ["STREAM_ANALYTICS"] = stream_analytics
+
+    if args["analytics_checksum"] or args["expected_checksums"]:
+        analytics_checksum = "1"
+    os.environ["ANALYTICS_CHECKSUM"] = analytics_checksum
+
     schema = constants.CH2_DRIVER_SCHEMA["CH2"]
     analyticalQueries = constants.CH2_DRIVER_ANALYTICAL_QUERIES["HAND_OPTIMIZED_QUERIES"]
     load_mode = constants.CH2_DRIVER_LOAD_MODE["NOT_SET"]
@@ -452,6 +703,15 @@ if __name__ == '__main__':
         logging.info("Cannot specify both duration and query-iterations parameter to run")
         sys.exit(0)
 
+    if args['query_concurrency'] < 1:
+        logging.info("Need at least one query at a time per analytics client")
+        sys.exit(0)
+
+    for override in args['query_timeout_override']:
+        if not re.match(r"^Q[0-9]+=[0-9]+(\.[0-9]*)?$", override):
+            logging.info("Query timeout overrides look like Q18=1200, not %s" % override)
+            sys.exit(0)
+
     if ((duration != None and duration <= 0) or (queryIterations != None and queryIterations <= 0)):
         logging.info("Need a positive non-zero duration/query-iterations parameter to run")
         sys.exit(0)
@@ -480,10 +740,52 @@ if __name__ == '__main__':
         logging.info("Total number of query iterations cannot be less than the number of warmup query iterations")
         sys.exit(0)
 
-    if (warmupDuration == None and warmupQueryIterations == None):
+    args['max_warmup_duration'] = None
+    if args['adaptive_warmup']:
+        if duration == None or numTClients == 0:
+            logging.info("Adaptive warmup needs a duration parameter and transaction clients")
+            sys.exit(0)
+        if warmupQueryIterations != None:
+            logging.info("Cannot specify both adaptive warmup and warmup query-iterations parameter to run")
+            sys.exit(0)
+        args['max_warmup_duration'] = warmupDuration if warmupDuration != None else duration / 2
+        warmupDuration = None
+    elif (warmupDuration == None and warmupQueryIterations == None):
         warmupDuration = 0
         warmupQueryIterations = 0
 
+    if args['capacity_search'] and (duration == None or numTClients == 0):
+        logging.info("Capacity search needs a duration parameter and a starting number of transaction clients")
+        sys.exit(0)
+
+    if args['interference'] and (duration == None or numTClients == 0 or numAClients == 0):
+        logging.info("Interference mode needs a duration parameter and both transaction and analytics clients")
+        sys.exit(0)
+
+    ## The templates use the flat CH2 columns; the nested CH2P/CH2PP documents would make them return wrong or empty results
+    if args['query_templates'] and schema != constants.CH2_DRIVER_SCHEMA["CH2"]:
+        logging.info("--query-templates only supports the CH2 schema")
+        sys.exit(0)
+
+    if args['read_your_writes'] and args['txn_mode'] == "udf":
+        logging.info("--read-your-writes does not apply to --txn-mode udf")
+        sys.exit(0)
+
+    if args['record_checksums'] and not args['expected_checksums']:
+        logging.info("Need an --expected-checksums file to record the checksums in")
+        sys.exit(0)
+
+    if args['expected_checksums']:
+        if datagenSeed == constants.CH2_DATAGEN_SEED_NOT_SET:
+            logging.info("Result checksums need data generated with a fixed --datagenSeed")
+            sys.exit(0)
+        if args['query_templates']:
+            logging.info("Result checksums cannot be compared with queries generated from --query-templates")
+            sys.exit(0)
+        if numTClients > 0:
+            logging.warning("Transaction clients change the data while the queries run, so the result checksums may differ")
+    checksumKey = checksums.checksumKey(schema, args['warehouses'], datagenSeed)
+
     ## Create a handle to the target client driver
     driverClass = createDriverClass(args['system'])
     assert driverClass != None, "Failed to find '%s' class" % args['system']
@@ -544,17 +846,31 @@ if __name__ == '__main__':
         load_time = time.time() - load_start
     ## IF
 
+    ## QUERY PLANS
+    if not args['no_execute'] and (args['capture_plans'] or args['plan_baseline']):
+        capturePlans(driver, schema, args, numTClients > 0, numAClients > 0)
+    ## IF
+
     ## WORKLOAD DRIVER!!!
     if not args['no_execute']:
         m = multiprocessing.Manager()
         qDone = m.Queue()
         warmupDurationQ = m.Queue()
+        if args['capacity_search']:
+            print (startCapacitySearch(driverClass, schema, preparedTransactionQueries, analyticalQueries, warmupDuration, warmupQueryIterations, scaleParameters, args, config))
+            sys.exit(0)
+        if args['interference']:
+            print (startInterference(driverClass, schema, preparedTransactionQueries, analyticalQueries, warmupDuration, warmupQueryIterations, scaleParameters, args, config))
+            sys.exit(0)
         if numClients == 1:
             if numTClients == 1:
                 TAFlag = "T"
             else:
                 TAFlag = "A"
-            e = executor.Executor(0, driver, qDone, warmupDurationQ, scaleParameters, TAFlag, warmupDuration, warmupQueryIterations, stop_on_error=args['stop_on_error'])
+            homeDistricts = None
+            if args['warehouse_affinity'] and TAFlag == "T":
+                homeDistricts = executor.makeHomeDistricts(scaleParameters, 0, 1)
+            e = executor.Executor(0, driver, qDone, warmupDurationQ, scaleParameters, TAFlag, warmupDuration, warmupQueryIterations, stop_on_error=args['stop_on_error'], homeDistricts=homeDistricts, paramStream=args['param_stream'], measureOverhead=args['measure_overhead'], maxWarmupDuration=args['max_warmup_duration'])
             driver.executeStart()
             results = e.execute(duration, queryIterations, warmupDuration, warmupQueryIterations, numAClients)
             driver.executeFinish()
@@ -562,7 +878,15 @@ if __name__ == '__main__':
             results = startExecution(driverClass, schema, preparedTransactionQueries, analyticalQueries, qDone, warmupDurationQ, warmupDuration, warmupQueryIterations, scaleParameters, args, config)
             print('Execution Completed')
         assert results
-        print (results.show(duration, queryIterations, numClients, numAClients, load_time))
+        results.txn_mode = args['txn_mode']
+        if args['expected_checksums'] and not args['record_checksums']:
+            results.expected_checksums = checksums.loadExpected(args['expected_checksums'], checksumKey)
+        ## Every analytics client runs --query-concurrency query streams
+        print (results.show(duration, queryIterations, numClients, numAClients * args['query_concurrency'], load_time))
+        if args['record_checksums']:
+            observed = checksums.observedChecksums(results.clientQueryTimes())
+            checksums.saveExpected(args['expected_checksums'], checksumKey, observed)
+            logging.info("Recorded the results of %d queries for %s in %s" % (len(observed), checksumKey, args['expected_checksums']))
     ## IF
 
 ## MAIN
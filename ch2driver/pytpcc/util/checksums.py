@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import json
+import logging
+import os
+
+def checksumKey(schema, warehouses, seed):
+    """Key of the expected results of a data set: same schema, size and generator seed"""
+    return "%s/%d/%d" % (schema, warehouses, seed)
+
+def loadExpected(fileName, key):
+    """{query: (rows, checksum)} expected for key, empty if the file or the key does not exist yet"""
+    if not os.path.exists(fileName):
+        return { }
+    with open(fileName) as f:
+        expected = json.load(f).get(key, { })
+    return dict((qry, (v["rows"], int(v["checksum"], 16))) for qry, v in expected.items())
+
+def saveExpected(fileName, key, observed):
+    """Store observed {query: (rows, checksum)} as the expected results of key, keeping the other keys"""
+    stored = { }
+    if os.path.exists(fileName):
+        with open(fileName) as f:
+            stored = json.load(f)
+    stored[key] = dict((qry, {"rows": rows, "checksum": "%016x" % checksum}) for qry, (rows, checksum) in sorted(observed.items()))
+    with open(fileName, "w") as f:
+        json.dump(stored, f, indent=2, sort_keys=True)
+
+def observedChecksums(clientQueryTimes):
+    """{query: (rows, checksum)} of the streamed, completed queries of Results.clientQueryTimes().
+    Queries that returned different results in the same run are left out."""
+    observed = { }
+    conflicting = set()
+    for qry_times in clientQueryTimes:
+        for qry_dict in qry_times:
+            for qry, entry in qry_dict.items():
+                extra = entry[5] if len(entry) > 5 else { }
+                if extra.get("checksum") == None or "cancelled" in extra:
+                    continue
+                value = (extra["rows"], extra["checksum"])
+                if observed.setdefault(qry, value) != value:
+                    conflicting.add(qry)
+    for qry in sorted(conflicting):
+        logging.warning("%s returned different results within the run, not recording it" % qry)
+        del observed[qry]
+    return observed
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+
+import codecs
+import hashlib
+import json
+import math
+
+CHECKSUM_MASK = (1 << 64) - 1
+## Floats are compared to this many significant digits, so that sums computed in a
+## different order or as another numeric type still give the same checksum
+CHECKSUM_SIGNIFICANT_DIGITS = 12
+WHITESPACE = " \t\r\n"
+
+def normalizeNumbers(value):
+    """Copy of a decoded JSON value with every float rounded to CHECKSUM_SIGNIFICANT_DIGITS
+    and integral floats turned into ints, i.e. 1.0 becomes 1"""
+    if isinstance(value, dict):
+        return dict((k, normalizeNumbers(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [ normalizeNumbers(v) for v in value ]
+    if isinstance(value, float) and math.isfinite(value):
+        value = float("%.*g" % (CHECKSUM_SIGNIFICANT_DIGITS, value))
+        return int(value) if value.is_integer() else value
+    return value
+
+def rowChecksum(row):
+    """64-bit hash of a result row that does not depend on the order of its fields nor on
+    how its numbers are represented"""
+    digest = hashlib.md5(json.dumps(normalizeNumbers(row), sort_keys=True, separators=(",", ":")).encode('utf8')).digest()
+    return int.from_bytes(digest[:8], "little")
+
+class StreamedResponse:
+    """Consumes a JSON query response from an iterable of byte chunks without keeping
+    the result set in memory.
+
+    The elements of the top level "results" array are decoded one at a time, counted,
+    optionally folded into a checksum and dropped; every other top level field (status,
+    errors, metrics, ...) ends up in `body`. The checksum is the sum of the row hashes
+    modulo 2^64, so it does not depend on the order of the rows either.
+    """
+
+    def __init__(self, chunks, checksum=False):
+        self.chunks = iter(chunks)
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.body = { }
+        self.rowCount = 0
+        self.checksum = 0 if checksum else None
+        self.parse()
+    ## DEF
+
+    def more(self):
+        """Append the next chunk to the unread part of the buffer; False at the end of the input"""
+        if self.eof:
+            return False
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            chunk = b""
+        self.buf = self.buf[self.pos:] + self.utf8.decode(chunk, final=self.eof)
+        self.pos = 0
+        return True
+    ## DEF
+
+    def peek(self):
+        """Next character that is not whitespace"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                raise ValueError("Truncated JSON response")
+        ## WHILE
+    ## DEF
+
+    def expect(self, c):
+        if self.peek() != c:
+            raise ValueError("Expected '%s' at '%s'" % (c, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+    ## DEF
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                (v, end) = self.decoder.raw_decode(self.buf, self.pos)
+                ## A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return v
+            except ValueError:
+                if self.eof:
+                    raise
+            self.more()
+    ## DEF
+
+    def parse(self):
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            if key == "results" and self.peek() == "[":
+                self.rows()
+            else:
+                self.body[key] = self.value()
+            c = self.peek()
+            self.pos += 1
+            if c == "}":
+                return
+            if c != ",":
+                raise ValueError("Expected ',' or '}' in the JSON response, got '%s'" % c)
+        ## WHILE
+    ## DEF
+
+    def rows(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            row = self.value()
+            self.rowCount += 1
+            if self.checksum != None:
+                self.checksum = (self.checksum + rowChecksum(row)) & CHECKSUM_MASK
+            c = self.peek()
+            self.pos += 1
+            if c == "]":
+                return
+            if c != ",":
+                raise ValueError("Expected ',' or ']' in the result rows, got '%s'" % c)
+        ## WHILE
+    ## DEF
+## CLASS
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+from datetime import datetime
+import numpy as np
+
+import constants
+from . import rand
+
+## Transaction mix of Executor.doOne(), indexed by the codes stored in a block
+TXN_TYPES = (
+    constants.TransactionTypes.STOCK_LEVEL,
+    constants.TransactionTypes.DELIVERY,
+    constants.TransactionTypes.ORDER_STATUS,
+    constants.TransactionTypes.PAYMENT,
+    constants.TransactionTypes.NEW_ORDER,
+)
+TXN_MIX_BOUNDS = [ 4, 4 + 4, 4 + 4 + 4, 43 + 4 + 4 + 4 ]
+
+class ParameterStream:
+    """Pre-generates blocks of transaction types and input parameters with NumPy.
+
+    Every column of a block is drawn with one vectorized call and kept as a compact
+    array; next() only slices the current row into the parameter dict the driver
+    expects. The distributions are the same as the ones in Executor.generate*Params().
+    """
+
+    def __init__(self, scaleParameters, nurandVar, homeDistricts=None, blockSize=constants.PARAM_STREAM_BLOCK_SIZE, seed=None):
+        self.scaleParameters = scaleParameters
+        self.nurandVar = nurandVar
+        self.blockSize = blockSize
+        self.nprng = np.random.default_rng(seed)
+        self.homeW = None
+        self.homeD = None
+        if homeDistricts != None:
+            self.homeW = np.array([ w for (w, d) in homeDistricts ], dtype=np.int32)
+            self.homeD = np.array([ d for (w, d) in homeDistricts ], dtype=np.int16)
+
+        r = rand.Rand()
+        self.lastNames = [ r.makeLastName(i) for i in range(1000) ]
+        self.maxLastNameId = min(999, scaleParameters.customersPerDistrict - 1)
+        self.pos = blockSize
+    ## DEF
+
+    def next(self):
+        """Return the next (txn, params) pair, generating a new block when needed."""
+        if self.pos == self.blockSize:
+            self.fillBlock()
+        i = self.pos
+        self.pos += 1
+
+        ## item() and tolist() hand back native Python values, so the drivers can
+        ## serialize the parameters without knowing about NumPy scalar types.
+        txn = TXN_TYPES[self.txn.item(i)]
+        w_id = self.w_id.item(i)
+        if txn == constants.TransactionTypes.NEW_ORDER:
+            ol_cnt = self.ol_cnt.item(i)
+            params = {"w_id": w_id, "d_id": self.d_id.item(i), "c_id": self.c_id.item(i), "o_entry_d": datetime.now(),
+                      "i_ids": self.i_ids[i, :ol_cnt].tolist(), "i_w_ids": self.i_w_ids[i, :ol_cnt].tolist(), "i_qtys": self.i_qtys[i, :ol_cnt].tolist()}
+        elif txn == constants.TransactionTypes.PAYMENT:
+            c_id, c_last = self.customer(i)
+            params = {"w_id": w_id, "d_id": self.d_id.item(i), "h_amount": self.h_amount.item(i) / 100.0, "c_w_id": self.c_w_id.item(i), "c_d_id": self.c_d_id.item(i),
+                      "c_id": c_id, "c_last": c_last, "h_date": datetime.now()}
+        elif txn == constants.TransactionTypes.ORDER_STATUS:
+            c_id, c_last = self.customer(i)
+            params = {"w_id": w_id, "d_id": self.d_id.item(i), "c_id": c_id, "c_last": c_last}
+        elif txn == constants.TransactionTypes.DELIVERY:
+            params = {"w_id": w_id, "o_carrier_id": self.o_carrier_id.item(i), "ol_delivery_d": datetime.now()}
+        else:
+            params = {"w_id": w_id, "d_id": self.d_id.item(i), "threshold": self.threshold.item(i)}
+        return (txn, params)
+    ## DEF
+
+    def customer(self, i):
+        """60% of Payment and Order-Status select the customer by last name (TPC-C 2.5.1.2, 2.6.1.2)"""
+        if self.by_last_name.item(i):
+            return (None, self.lastNames[self.c_last.item(i)])
+        return (self.c_id.item(i), None)
+    ## DEF
+
+    def nuRand(self, a, c, x, y, size):
+        """Vectorized version of Rand.nuRand() (TPC-C 2.1.6)"""
+        return (((self.nprng.integers(0, a, size, endpoint=True) | self.nprng.integers(x, y, size, endpoint=True)) + c) % (y - x + 1)) + x
+    ## DEF
+
+    def excluding(self, w_ids, size):
+        """Vectorized version of Rand.numberExcluding() over the warehouse range"""
+        sp = self.scaleParameters
+        other = self.nprng.integers(sp.starting_warehouse, sp.ending_warehouse - 1, size, endpoint=True)
+        return other + (other >= w_ids)
+    ## DEF
+
+    def fillBlock(self):
+        n = self.blockSize
+        sp = self.scaleParameters
+        maxOl = constants.MAX_OL_CNT
+
+        txn = np.searchsorted(TXN_MIX_BOUNDS, self.nprng.integers(1, 100, n, endpoint=True)).astype(np.uint8)
+
+        if self.homeW is not None:
+            home = self.nprng.integers(0, len(self.homeW), n)
+            w_id = self.homeW[home]
+            d_id = self.homeD[home]
+        else:
+            w_id = self.nprng.integers(sp.starting_warehouse, sp.ending_warehouse, n, endpoint=True, dtype=np.int32)
+            d_id = self.nprng.integers(1, sp.districtsPerWarehouse, n, endpoint=True, dtype=np.int16)
+        c_id = self.nuRand(1023, self.nurandVar.cId, 1, sp.customersPerDistrict, n).astype(np.int32)
+        by_last_name = self.nprng.integers(1, 100, n, endpoint=True) <= 60
+        c_last = self.nuRand(255, self.nurandVar.cLast, 0, self.maxLastNameId, n).astype(np.int16)
+
+        ## NEW_ORDER: 1% of the order lines are supplied by a remote warehouse
+        ol_cnt = self.nprng.integers(constants.MIN_OL_CNT, constants.MAX_OL_CNT, n, endpoint=True, dtype=np.int8)
+        i_ids = self.nuRand(8191, self.nurandVar.orderLineItemId, 1, sp.items, (n, maxOl)).astype(np.int32)
+        i_w_ids = np.repeat(w_id[:, None], maxOl, axis=1).astype(np.int32)
+        if sp.warehouses > 1:
+            remote = self.nprng.integers(1, 100, (n, maxOl), endpoint=True) == 1
+            i_w_ids = np.where(remote, self.excluding(i_w_ids, (n, maxOl)), i_w_ids)
+        i_qtys = self.nprng.integers(1, constants.MAX_OL_QUANTITY, (n, maxOl), endpoint=True, dtype=np.int8)
+
+        ## PAYMENT: 15% of the customers belong to a remote warehouse
+        h_amount = self.nprng.integers(int(constants.MIN_PAYMENT * 100 + 0.5), int(constants.MAX_PAYMENT * 100 + 0.5), n, endpoint=True, dtype=np.int32)
+        c_w_id = w_id.astype(np.int32)
+        c_d_id = d_id.astype(np.int16)
+        if sp.warehouses > 1:
+            remote = self.nprng.integers(1, 100, n, endpoint=True) > 85
+            c_w_id = np.where(remote, self.excluding(w_id, n), c_w_id)
+            c_d_id = np.where(remote, self.nprng.integers(1, sp.districtsPerWarehouse, n, endpoint=True, dtype=np.int16), c_d_id)
+
+        o_carrier_id = self.nprng.integers(constants.MIN_CARRIER_ID, constants.MAX_CARRIER_ID, n, endpoint=True, dtype=np.int8)
+        threshold = self.nprng.integers(constants.MIN_STOCK_LEVEL_THRESHOLD, constants.MAX_STOCK_LEVEL_THRESHOLD, n, endpoint=True, dtype=np.int8)
+
+        self.txn = txn
+        self.w_id = w_id
+        self.d_id = d_id
+        self.c_id = c_id
+        self.by_last_name = by_last_name
+        self.c_last = c_last
+        self.ol_cnt = ol_cnt
+        self.i_ids = i_ids
+        self.i_w_ids = i_w_ids
+        self.i_qtys = i_qtys
+        self.h_amount = h_amount
+        self.c_w_id = c_w_id
+        self.c_d_id = c_d_id
+        self.o_carrier_id = o_carrier_id
+        self.threshold = threshold
+        self.pos = 0
+    ## DEF
+## CLASS
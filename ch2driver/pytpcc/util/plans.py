@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+
+import hashlib
+import json
+import re
+
+## Plan fields that change with statistics, timing or text layout rather than with the
+## shape of the plan: cost and cardinality estimates, timings, the statement text
+VOLATILE_KEYS = re.compile(r"(cost|cardinality|estimate|selectivity|size|time|#stats|^text$|^~versions$)", re.IGNORECASE)
+
+def normalizePlan(plan):
+    """Copy of plan without the VOLATILE_KEYS fields"""
+    if isinstance(plan, dict):
+        return dict((k, normalizePlan(v)) for k, v in plan.items() if not VOLATILE_KEYS.search(k))
+    if isinstance(plan, list):
+        return [ normalizePlan(v) for v in plan ]
+    return plan
+
+def planFingerprint(plan):
+    return hashlib.sha1(json.dumps(normalizePlan(plan), sort_keys=True).encode('utf8')).hexdigest()[:16]
+
+def firstDifference(a, b, path="$"):
+    """JSON path of the first place where two normalized plans differ, or None"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        for k in sorted(set(a.keys()) | set(b.keys())):
+            if k not in a or k not in b:
+                return "%s.%s" % (path, k)
+            diff = firstDifference(a[k], b[k], "%s.%s" % (path, k))
+            if diff != None:
+                return diff
+        return None
+    if isinstance(a, list) and isinstance(b, list):
+        for i in range(min(len(a), len(b))):
+            diff = firstDifference(a[i], b[i], "%s[%d]" % (path, i))
+            if diff != None:
+                return diff
+        return None if len(a) == len(b) else "%s[%d]" % (path, min(len(a), len(b)))
+    return None if a == b else path
+
+def makePlanRecord(plans):
+    """{category: {statement: plan}} -> the document stored by --capture-plans"""
+    record = { }
+    for category, statements in plans.items():
+        record[category] = dict((name, {"fingerprint": planFingerprint(plan), "plan": plan}) for name, plan in statements.items())
+    return record
+
+def comparePlans(baseline, current):
+    """(category, statement, status, detail) of every statement whose plan is not the same in both records"""
+    changes = [ ]
+    for category in sorted(set(baseline.keys()) | set(current.keys())):
+        old = baseline.get(category, { })
+        new = current.get(category, { })
+        for name in sorted(set(old.keys()) | set(new.keys())):
+            if name not in old:
+                changes.append((category, name, "new", new[name]["fingerprint"]))
+            elif name not in new:
+                changes.append((category, name, "missing", old[name]["fingerprint"]))
+            elif old[name]["fingerprint"] != new[name]["fingerprint"]:
+                detail = "%s -> %s at %s" % (old[name]["fingerprint"], new[name]["fingerprint"],
+                                             firstDifference(normalizePlan(old[name]["plan"]), normalizePlan(new[name]["plan"])))
+                changes.append((category, name, "changed", detail))
+    return changes
+
+def showPlanChanges(changes, baselineFile):
+    line = "-"*100
+    ret = "\n\nQuery Plan Changes against %s\n%s" % (baselineFile, line)
+    if len(changes) == 0:
+        return ret + "\n  No plan changes\n" + line
+    f = "\n  %-14s%-40s%-10s%s"
+    ret += f % ("Category", "Statement", "Status", "Fingerprints")
+    for change in changes:
+        ret += f % change
+    return ret + "\n" + line
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+
+import random
+
+import constants
+
+def makeQueryPermutation(seed, clientId, iteration):
+    """Order in which an analytics client runs the queries in a query iteration.
+
+    With seed 0, iteration 0 of the first len(CH2_QUERIES_PERM) clients uses the
+    hand-written permutations, so results stay comparable with earlier runs. Every
+    other (seed, client, iteration) gets a shuffle of its own random generator, so any
+    number of clients can run and the same arguments always give the same order.
+    """
+    if seed == 0 and iteration == 0 and clientId < len(constants.CH2_QUERIES_PERM):
+        return list(constants.CH2_QUERIES_PERM[clientId])
+    perm = sorted(constants.CH2_QUERIES_PERM[0])
+    random.Random("%d:%d:%d" % (seed, clientId, iteration)).shuffle(perm)
+    return perm
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+
+import ast
+import glob
+import os
+import random
+import re
+
+## define NAME = expression; (the expression may span several lines)
+DEFINE = re.compile(r"^\s*define\s+([A-Za-z_][A-Za-z_0-9]*)\s*=\s*(.*?);\s*$", re.DOTALL | re.MULTILINE)
+## [NAME] or [NAME.i] for the i-th value of a list
+REFERENCE = re.compile(r"\[([A-Za-z_][A-Za-z_0-9]*)(?:\.(\d+))?\]")
+CALL = re.compile(r"^([a-z]+)\s*\((.*)\)$", re.DOTALL)
+
+def splitArgs(text):
+    """Split the arguments of a template function at the commas outside of quotes and brackets"""
+    args = [ ]
+    depth = 0
+    quoted = False
+    start = 0
+    for i, c in enumerate(text):
+        if c == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif c in "({":
+            depth += 1
+        elif c in ")}":
+            depth -= 1
+        elif c == "," and depth == 0:
+            args.append(text[start:i].strip())
+            start = i + 1
+    args.append(text[start:].strip())
+    return args
+
+def arithmetic(expr):
+    """Value of an integer expression with + - * / and parentheses; / truncates like dsqgen"""
+    def value(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, int):
+            return node.value
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -value(node.operand)
+        if isinstance(node, ast.BinOp):
+            left = value(node.left)
+            right = value(node.right)
+            if isinstance(node.op, ast.Add): return left + right
+            if isinstance(node.op, ast.Sub): return left - right
+            if isinstance(node.op, ast.Mult): return left * right
+            if isinstance(node.op, ast.Div): return int(left / right)
+        raise ValueError("Unsupported template expression: %s" % expr)
+    return value(ast.parse(expr.strip(), mode="eval").body)
+
+class QueryTemplate:
+    """A querygen/query_templates/*.tpl file: `define` directives followed by the query.
+
+    Supports the subset of the dsqgen template language the CH2 templates use: string
+    and integer constants, integer arithmetic, random(min, max, uniform),
+    text({"value", weight}, ...), list(expr, n) and ulist(expr, n) (without duplicates).
+    Substitutions are written [NAME], or [NAME.i] for the i-th value of a list.
+    """
+
+    def __init__(self, name, text):
+        self.name = name
+        self.defines = [ (m.group(1), m.group(2).strip()) for m in DEFINE.finditer(text) ]
+        body = DEFINE.sub("", text)
+        lines = [ line.strip() for line in body.splitlines() ]
+        self.query = " ".join(line for line in lines if line != "" and not line.startswith("--")).rstrip(";").strip()
+    ## DEF
+
+    def generate(self, rng):
+        """Instantiate the template with values drawn from rng"""
+        values = { }
+        for name, expr in self.defines:
+            values[name] = self.evaluate(expr, values, rng)
+        return self.substitute(self.query, values)
+    ## DEF
+
+    def substitute(self, text, values):
+        def replace(m):
+            if m.group(1) not in values:
+                raise ValueError("%s: undefined substitution %s" % (self.name, m.group(0)))
+            value = values[m.group(1)]
+            if m.group(2) != None:
+                value = value[int(m.group(2)) - 1]
+            return str(value)
+        return REFERENCE.sub(replace, text)
+    ## DEF
+
+    def evaluate(self, expr, values, rng):
+        if expr.startswith('"'):
+            return expr[1:-1]
+        call = CALL.match(expr)
+        if call == None:
+            return arithmetic(self.substitute(expr, values))
+        function, args = call.group(1), splitArgs(call.group(2))
+        if function == "random":
+            if len(args) > 2 and args[2] != "uniform":
+                raise ValueError("%s: unsupported distribution %s" % (self.name, args[2]))
+            return rng.randint(self.evaluate(args[0], values, rng), self.evaluate(args[1], values, rng))
+        if function == "text":
+            choices = [ splitArgs(arg.strip()[1:-1]) for arg in args ]
+            return rng.choices([ c[0][1:-1] for c in choices ], weights=[ int(c[1]) for c in choices ])[0]
+        if function in ("list", "ulist"):
+            count = self.evaluate(args[1], values, rng)
+            result = [ ]
+            while len(result) < count:
+                value = self.evaluate(args[0], values, rng)
+                if function == "list" or value not in result:
+                    result.append(value)
+            return result
+        raise ValueError("%s: unsupported template function %s" % (self.name, function))
+    ## DEF
+## CLASS
+
+def loadTemplates(directory):
+    """Templates of directory by query id: q01.tpl is Q01"""
+    templates = { }
+    for path in sorted(glob.glob(os.path.join(directory, "q*.tpl"))):
+        name = os.path.basename(path)[:-len(".tpl")].upper()
+        with open(path) as f:
+            templates[name] = QueryTemplate(name, f.read())
+    return templates
+
+def makeQueryStreams(templates, seed, clientId, iterations):
+    """One {query id: query} dict per iteration of a client. Every (seed, client, iteration,
+    query) has its own random generator, so a stream does not depend on the other ones."""
+    streams = [ ]
+    for iteration in range(iterations):
+        queries = { }
+        for name, template in templates.items():
+            queries[name] = template.generate(random.Random("%d:%d:%d:%s" % (seed, clientId, iteration, name)))
+        streams.append(queries)
+    return streams
@@ -25,9 +25,65 @@
 # -----------------------------------------------------------------------
 
 import logging
+import math
+import re
 import time
 import constants
 
+DURATION_UNITS = {"ns": 1, "us": 1e3, "\u00b5s": 1e3, "\u03bcs": 1e3, "ms": 1e6, "s": 1e9, "m": 60e9, "h": 3600e9}
+DURATION = re.compile(r"([0-9]+(?:\.[0-9]+)?)(ns|us|\u00b5s|\u03bcs|ms|s|m|h)")
+
+def latencyBucket(latency):
+    """Histogram bucket of a latency in seconds: LATENCY_BUCKETS_PER_DECADE logarithmic buckets per decade starting at 1µs"""
+    if latency <= 0.000001:
+        return 0
+    return int(math.log10(latency * 1000000) * constants.LATENCY_BUCKETS_PER_DECADE)
+
+def bucketLatency(bucket):
+    """Upper bound in seconds of a latency histogram bucket"""
+    return 10 ** ((bucket + 1) / constants.LATENCY_BUCKETS_PER_DECADE) / 1000000
+
+def parseDuration(text):
+    """Nanoseconds of a duration of the query metrics, such as "850ms" or "1m2.5s".
+    "infs", reported by runCH2Queries for a failed query, is infinite."""
+    if text.startswith("inf"):
+        return float("inf")
+    parts = DURATION.findall(text)
+    if len(parts) == 0 or "".join(n + u for n, u in parts) != text:
+        raise ValueError("Not a duration: %s" % text)
+    return sum(float(n) * DURATION_UNITS[u] for n, u in parts)
+
+def parseMetrics(metrics):
+    """Numeric copy of the metrics of a query response: durations in ns, counts as they are"""
+    ret = { }
+    for k, v in metrics.items():
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            ret[k] = v
+        elif isinstance(v, str):
+            try:
+                ret[k] = parseDuration(v)
+            except ValueError:
+                pass
+    return ret
+
+def queryTime(entry):
+    """Execution time in s of a query_times entry"""
+    extra = entry[5] if len(entry) > 5 else { }
+    metrics = extra.get("metrics", { })
+    if "executionTime" in metrics:
+        return metrics["executionTime"] / 1e9
+    return parseDuration(entry[3]) / 1e9
+
+def summarize(values):
+    """(mean, standard deviation, min, max) of a non-empty list"""
+    mean = sum(values) / len(values)
+    stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+    return (mean, stddev, min(values), max(values))
+
+def percentile(values, pct):
+    """Nearest-rank pct-th percentile of a sorted list"""
+    return values[max(0, int(math.ceil(len(values) * pct / 100.0)) - 1)]
+
 class Results:
     
     def __init__(self, warmupDuration, warmupQueryIterations):
@@ -39,8 +95,16 @@ class Results:
         self.txn_counters = { }
         self.txn_status = { }
         self.txn_times = { }
+        self.txn_latencies = { }
         self.running = { }
         self.query_times = []
+        self.harness_overhead = [ ]
+        self.maxWarmupDuration = None
+        self.txn_mode = None
+        self.driver_stats = { }
+        self.freshness = [ ]
+        self.merged = False
+        self.expected_checksums = None
         
     def startBenchmark(self):
         """Mark the benchmark as having been started"""
@@ -90,6 +154,10 @@ class Results:
             total_cnt = self.txn_counters.get(txn_name, 0)
             self.txn_counters[txn_name] = total_cnt + 1
 
+            hist = self.txn_latencies.setdefault(txn_name, { })
+            bucket = latencyBucket(duration)
+            hist[bucket] = hist.get(bucket, 0) + 1
+
             if txn_name not in self.txn_status :
                 self.txn_status[txn_name] = {}
 
@@ -105,6 +173,10 @@ class Results:
             self.txn_counters[txn_name] = orig_cnt + r.txn_counters[txn_name]
             self.txn_times[txn_name] = orig_time + r.txn_times[txn_name]
             logging.debug("%s [cnt=%d, time=%d]" % (txn_name, self.txn_counters[txn_name], self.txn_times[txn_name]))
+        for txn_name in r.txn_latencies.keys():
+            hist = self.txn_latencies.setdefault(txn_name, { })
+            for bucket, cnt in r.txn_latencies[txn_name].items():
+                hist[bucket] = hist.get(bucket, 0) + cnt
         for txn_name in r.txn_status.keys():
              if txn_name not in self.txn_status :
                   self.txn_status[txn_name] = {}
@@ -112,8 +184,13 @@ class Results:
                  cnt = self.txn_status[txn_name].get(k, 0)
                  self.txn_status[txn_name][k] = cnt + r.txn_status[txn_name][k]
 
+        self.harness_overhead.extend(r.harness_overhead)
+        self.mergeDriverStats(r.driver_stats)
+        self.freshness.extend(r.freshness)
+
         if len(r.query_times) > 0:
             self.query_times.append(r.query_times)
+        self.merged = True
         ## HACK
         self.start = r.start
         if len(r.query_times) == 0:
@@ -121,21 +198,273 @@ class Results:
             
     def __str__(self):
         return self.show()
-        
-    def show(self, duration, queryIterations, numClients, numAClients, load_time = None):
-        if self.start == None:
-            return "Benchmark not started"
+
+    def latencyPercentile(self, txn_name, pct):
+        """Return the pct-th percentile latency of txn_name in seconds, or None if it never ran"""
+        hist = self.txn_latencies.get(txn_name, { })
+        total_cnt = sum(hist.values())
+        if total_cnt == 0:
+            return None
+        threshold = total_cnt * pct / 100.0
+        cnt = 0
+        for bucket in sorted(hist.keys()):
+            cnt += hist[bucket]
+            if cnt >= threshold:
+                return bucketLatency(bucket)
+        return bucketLatency(max(hist.keys()))
+
+    def measuredDuration(self, duration):
+        """Length in seconds of the measurement interval, i.e. without the warmup"""
         if self.warmupDuration == None:
             warmupTime = 0
         else:
             warmupTime = self.warmupDuration
         if duration == None:
             if self.stop == None:
-                res_duration = time.time() - self.start - warmupTime
+                return time.time() - self.start - warmupTime
+            return self.stop - self.start - warmupTime
+        return duration - warmupTime
+
+    def tpmC(self, duration):
+        """New-Order transactions per minute over the measurement interval (TPC-C 5.4.2)"""
+        return self.txn_counters.get(constants.TransactionTypes.NEW_ORDER, 0) * 60 / self.measuredDuration(duration)
+
+    def clientQueryTimes(self):
+        """One list of query loops per analytics client: the Results of startExecution() hold one
+        per client, the Results of a single client only its own loops"""
+        return self.query_times if self.merged else [ self.query_times ]
+
+    def queryResponseTimes(self):
+        """Average execution time in s of every analytical query over the complete, measured
+        query sets of all clients. A client's sets after its first partial one are left out."""
+        totals = { }
+        for qry_times in self.clientQueryTimes():
+            partialLoop = False
+            loopNum = 0
+            for qry_dict in qry_times:
+                loopNum += 1
+                if self.warmupQueryIterations != None and loopNum <= self.warmupQueryIterations:
+                    continue
+                ## Queries cancelled at their timeout ran to their limit; the ones cancelled at the
+                ## end of the benchmark did not, so their loop is partial
+                atDeadline = [ qry for qry in qry_dict if len(qry_dict[qry]) > 5 and qry_dict[qry][5].get("cancelled") == "deadline" ]
+                if len(qry_dict) - len(atDeadline) < constants.NUM_CH2_QUERIES:
+                    partialLoop = True
+                    logging.debug("Partial Loop")
+                if partialLoop:
+                    continue
+                for qry in qry_dict:
+                    if len(qry_dict[qry]) > 5 and "cancelled" in qry_dict[qry][5]:
+                        continue
+                    total = totals.setdefault(qry, [0, 0])
+                    total[0] += queryTime(qry_dict[qry])
+                    total[1] += 1
+        return dict((qry, total[0] / total[1]) for qry, total in totals.items())
+
+    def qph(self, numAClients):
+        """Analytical queries per hour of numAClients query streams (0 if no query set completed)"""
+        times = self.queryResponseTimes()
+        if sum(times.values()) == 0:
+            return 0.0
+        return len(times) * 3600 / sum(times.values()) * numAClients
+
+    def showHarnessOverhead(self):
+        """Per transaction client breakdown of the loop wall time collected with --measure-overhead"""
+        if len(self.harness_overhead) == 0:
+            return ""
+        col_width = 14
+        total_width = (col_width*7)
+        f = "\n  " + (("%-" + str(col_width) + "s")*7)
+        ret = "\n\n\nHarness Overhead per Transaction Client\n%s" % ("-"*total_width)
+        ret += f % ("Client", "Executed", u"Params (µs)", u"Driver (µs)", u"Bookkeep (µs)", "Overhead", "CPU")
+        for m in sorted(self.harness_overhead, key=lambda x: x["client"]):
+            if m["txns"] == 0:
+                continue
+            loop_time = m["param"] + m["driver"] + m["bookkeeping"]
+            overhead = 100 * (m["param"] + m["bookkeeping"]) / loop_time if loop_time > 0 else 0
+            cpu = 100 * m["cpu"] / m["wall"] if m["wall"] > 0 else 0
+            ret += f % (m["client"], m["txns"],
+                        round(m["param"] * 1000000 / m["txns"], 1),
+                        round(m["driver"] * 1000000 / m["txns"], 1),
+                        round(m["bookkeeping"] * 1000000 / m["txns"], 1),
+                        "%.02f%%" % overhead,
+                        "%.0f%%%s" % (cpu, " (saturated)" if cpu >= constants.CLIENT_CPU_SATURATION * 100 else ""))
+        ret += "\n" + ("-"*total_width)
+        return ret
+        
+    def mergeDriverStats(self, stats):
+        """Add the counters returned by AbstractDriver.getStats()"""
+        if stats == None:
+            return
+        for section, rows in stats.items():
+            total_rows = self.driver_stats.setdefault(section, { })
+            for row, counters in rows.items():
+                total = total_rows.setdefault(row, { })
+                for k, v in counters.items():
+                    total[k] = total.get(k, 0) + v
+
+    def mergeFreshness(self, samples):
+        """Add the (write time, lag) samples returned by AbstractDriver.getFreshness()"""
+        if samples == None:
+            return
+        self.freshness.extend(samples)
+
+    def showFreshness(self):
+        """Visibility lag of the freshness markers per FRESHNESS_REPORT_INTERVAL seconds of the run"""
+        if len(self.freshness) == 0:
+            return ""
+        length = constants.FRESHNESS_REPORT_INTERVAL
+        intervals = { }
+        for written, lag in self.freshness:
+            intervals.setdefault(max(0, int((written - self.start) / length)), [ ]).append(lag)
+        rows = [ ("%d-%d" % (i * length, (i + 1) * length), intervals[i]) for i in sorted(intervals.keys()) ]
+        rows.append(("ALL", [ lag for written, lag in self.freshness ]))
+
+        col_width = 12
+        total_width = 14 + col_width * 7
+        f = "\n  %-14s" + (("%-" + str(col_width) + "s") * 7)
+        line = "-"*total_width
+        ret = "\n\n\nAnalytics Data Freshness (ms from a transactional write until analytics sees it)\n%s" % line
+        ret += f % ("Interval (s)", "Markers", "Not visible", "min", "p50", "p90", "p99", "max")
+        for name, lags in rows:
+            seen = sorted(lag for lag in lags if lag != None)
+            if len(seen) == 0:
+                values = [ "-" ] * 5
             else:
-                res_duration = self.stop - self.start - warmupTime
+                values = [ "%.1f" % (v * 1000) for v in (seen[0], percentile(seen, 50), percentile(seen, 90), percentile(seen, 99), seen[-1]) ]
+            ret += f % tuple([ name, len(lags), len(lags) - len(seen) ] + values)
+        ret += "\n" + line
+        return ret
+
+    def showQueryBreakdown(self, runs):
+        """Statistics of every analytical query over all clients and measured loops. runs maps a
+        query to its (execution time in s, extra measurements) pairs; failed runs are left out."""
+        runs = dict((qry, [ (q_time, extra) for q_time, extra in runs[qry] if q_time != float("inf") ]) for qry in runs.keys())
+        queries = [ qry for qry in sorted(runs.keys()) if len(runs[qry]) > 0 ]
+        if len(queries) == 0:
+            return ""
+        col_width = 11
+        total_width = 8 + col_width * 9
+        f = "\n  %-6s" + (("%-" + str(col_width) + "s") * 9)
+        line = "-"*total_width
+
+        ret = "\n\nAnalytics Query Statistics (s)\n%s" % line
+        ret += f % ("Query", "Runs", "Exec mean", "Exec sd", "Exec min", "Exec max", "RTT mean", "RTT sd", "RTT min", "RTT max")
+        for qry in queries:
+            exec_times = [ q_time for q_time, extra in runs[qry] ]
+            rtts = [ extra["rtt"] for q_time, extra in runs[qry] if "rtt" in extra ]
+            values = [ "%.3f" % v for v in summarize(exec_times) ]
+            values += [ "%.3f" % v for v in summarize(rtts) ] if len(rtts) > 0 else [ "-" ] * 4
+            ret += f % tuple([ qry, len(runs[qry]) ] + values)
+        ret += "\n" + line
+
+        ## Where the time goes: server side phases, then what the client adds on top of them
+        ret += "\n\nAnalytics Time Breakdown (mean per run; times in s)\n%s" % line
+        ret += f % ("Query", "Queue", "Compile", "Execution", "Elapsed", "Client", "Rows", "Bytes", "Processed", "Errors")
+        for qry in queries:
+            measured = [ extra for q_time, extra in runs[qry] if "metrics" in extra ]
+            def mean(name, scale=1.0, fmt="%.3f"):
+                values = [ extra["metrics"][name] for extra in measured if name in extra["metrics"] ]
+                return fmt % (sum(values) / len(values) / scale) if len(values) > 0 else "-"
+            client = [ extra["rtt"] - extra["metrics"]["elapsedTime"] / 1e9 for extra in measured if "elapsedTime" in extra["metrics"] ]
+            errors = sum(extra["metrics"].get("errorCount", 0) for extra in measured)
+            ret += f % (qry, mean("queueWaitTime", 1e9), mean("compileTime", 1e9), mean("executionTime", 1e9), mean("elapsedTime", 1e9),
+                        "%.3f" % (sum(client) / len(client)) if len(client) > 0 else "-",
+                        mean("resultCount", fmt="%.0f"), mean("resultSize", fmt="%.0f"), mean("processedObjects", fmt="%.0f"), errors if len(measured) > 0 else "-")
+        ret += "\n" + line + "\n"
+        return ret
+
+    def showCancelledQueries(self, cancelled):
+        """Analytical queries cancelled at their timeout or at the end of the benchmark, as
+        (query, extra measurements) pairs, counted per query and reason"""
+        if len(cancelled) == 0:
+            return ""
+        col_width = 14
+        total_width = 8 + col_width * 4
+        f = "\n  %-6s" + (("%-" + str(col_width) + "s") * 4)
+        line = "-"*total_width
+        ret = "\n\nCancelled Analytics Queries\n%s" % line
+        ret += f % ("Query", "Timed out", "At deadline", "Timeout (s)", "Max run (s)")
+        for qry in sorted(set(qry for qry, extra in cancelled)):
+            runs = [ extra for q, extra in cancelled if q == qry ]
+            limits = set(extra["limit"] for extra in runs if extra["limit"] > 0)
+            ret += f % (qry, len([ extra for extra in runs if extra["cancelled"] == "timeout" ]),
+                        len([ extra for extra in runs if extra["cancelled"] == "deadline" ]),
+                        ", ".join("%g" % limit for limit in sorted(limits)) if len(limits) > 0 else "-",
+                        "%.1f" % max(extra["rtt"] for extra in runs))
+        ret += "\n" + line + "\n"
+        return ret
+
+    def showChecksumVerification(self, verified):
+        """Streamed queries whose (rows, checksum) were compared with expected_checksums, as
+        (query, observed) pairs"""
+        if self.expected_checksums == None:
+            return ""
+        col_width = 14
+        total_width = 8 + col_width * 3 + 40
+        f = "\n  %-6s" + (("%-" + str(col_width) + "s") * 3) + "%s"
+        line = "-"*total_width
+        ret = "\n\nResult Checksum Verification\n%s" % line
+        ret += f % ("Query", "Runs", "Mismatches", "Expected rows", "Expected checksum / mismatching results")
+        mismatches = 0
+        for qry in sorted(set(qry for qry, observed in verified)):
+            expected = self.expected_checksums[qry]
+            observed = [ o for q, o in verified if q == qry ]
+            wrong = [ o for o in observed if o != expected ]
+            mismatches += len(wrong)
+            ret += f % (qry, len(observed), len(wrong), expected[0], "%016x" % expected[1])
+            for rows, checksum in sorted(set(wrong)):
+                ret += f % ("", "", "", rows, "%016x" % checksum)
+        ret += "\n" + line
+        if len(verified) == 0:
+            ret += "\nNo query had an expected checksum"
         else:
-            res_duration = duration - warmupTime
+            ret += "\nCHECKSUM MISMATCHES = %d of %d runs" % (mismatches, len(verified))
+        ret += "\n" + line + "\n"
+        return ret
+
+    def showDriverStats(self):
+        """One table per section of driver counters; "time" and "<name>_time" counters are shown in ms per request"""
+        ret = ""
+        col_width = 16
+        for section in sorted(self.driver_stats.keys()):
+            rows = self.driver_stats[section]
+            columns = sorted(set(k for counters in rows.values() for k in counters.keys()))
+            row_width = max([ col_width ] + [ len(str(row)) + 2 for row in rows.keys() ])
+            total_width = row_width + col_width * len(columns)
+            f = "\n  " + ("%-" + str(row_width) + "s") + (("%-" + str(col_width) + "s") * len(columns))
+            ret += "\n\n\n%s\n%s" % (section, "-"*total_width)
+            headers = [ "" ]
+            for c in columns:
+                if c == "time":
+                    headers.append("avg (ms)")
+                elif c.endswith("_time"):
+                    headers.append(c[:-5] + " (ms)")
+                else:
+                    headers.append(c)
+            ret += f % tuple(headers)
+            for row in sorted(rows.keys()):
+                counters = rows[row]
+                values = [ ]
+                for c in columns:
+                    v = counters.get(c, 0)
+                    if c == "time" or c.endswith("_time"):
+                        requests = counters.get("requests", 0)
+                        values.append("%.3f" % (v * 1000 / requests) if requests > 0 else "-")
+                    else:
+                        values.append(str(v))
+                ret += f % tuple([row] + values)
+            ret += "\n" + ("-"*total_width)
+        return ret
+
+    def show(self, duration, queryIterations, numClients, numAClients, load_time = None):
+        if self.start == None:
+            return "Benchmark not started"
+        if self.warmupDuration == None:
+            warmupTime = 0
+        else:
+            warmupTime = self.warmupDuration
+        res_duration = self.measuredDuration(duration)
 
         col_width = 15
         total_width = (col_width*5)
@@ -146,6 +475,19 @@ class Results:
         if load_time != None:
             ret += "Data Loading Time: %d seconds\n\n" % (load_time)
 
+        if self.maxWarmupDuration != None:
+            if self.warmupDuration == None:
+                ret += "Adaptive warmup: steady state was not reached, no transactions were measured\n"
+            elif warmupTime < self.maxWarmupDuration:
+                ret += "Adaptive warmup: steady state detected after %d seconds\n" % (warmupTime)
+            else:
+                ret += "Adaptive warmup: steady state not detected, warmup capped at %d seconds\n" % (warmupTime)
+
+        if self.txn_mode != None:
+            ret += "Transaction mode: %s\n" % (self.txn_mode)
+            if self.txn_mode == "kv":
+                ret += "  (index lookups ran outside the SDK transactions)\n"
+
         if duration != None:
             if warmupTime == 0:
                 if duration == 1:
@@ -195,6 +537,9 @@ class Results:
         ret += "\n" + ("-"*total_width)
         total_rate = " %.02f txn/s" % ((total_txn_cnt / res_duration))
         ret += f % ("TOTAL", str(total_txn_cnt), str(round(total_txn_time * 1000000,3)), total_rate)
+        ret += self.showHarnessOverhead()
+        ret += self.showDriverStats()
+        ret += self.showFreshness()
 
 
         col_width = 13
@@ -226,44 +571,46 @@ class Results:
 
         total_analytics_time = 0
         total_analytics_cnt = 0
-        overall_avg_resp_time = {"Q01": [0, 0], "Q02": [0, 0], "Q03": [0, 0], "Q04": [0, 0], "Q05": [0, 0], "Q06": [0, 0],
-                                 "Q07": [0, 0], "Q08": [0, 0], "Q09": [0, 0], "Q10": [0, 0], "Q11": [0, 0], "Q12": [0, 0],
-                                 "Q13": [0, 0], "Q14": [0, 0], "Q15": [0, 0], "Q16": [0, 0], "Q17": [0, 0], "Q18": [0, 0],
-                                 "Q19": [0, 0], "Q20": [0, 0], "Q21": [0, 0], "Q22": [0, 0]}
-
-        #HACK
-        if numClients == 1:
-            # Make self.query_times an array of arrays to keep the show() code consistent
-            tmp = []
-            tmp.append(self.query_times)
-            self.query_times = tmp
+        query_times = self.clientQueryTimes()
 
-#        print(self.query_times) #self.query_times is an array of arrays, one element for each client
-
-        for qry_times in self.query_times: #qry_times is an array element, each element corresponds to one client
+        # The sixth element of an entry holds the numeric metrics and round trip time of the query; streamed
+        # analytics responses (--stream-analytics) also carry the receive time, row count and checksum
+        fs = "   %-13s%-13s%-18s"
+        runs = { }
+        cancelled = [ ]
+        verified = [ ]
+        for qry_times in query_times: #qry_times is an array element, each element corresponds to one client
+            streamed = any(len(times) > 5 and "rows" in times[5] for qry_dict in qry_times for times in qry_dict.values())
             ret += f % ("Client", "Query", "Loop", "Start Time", "End Time", u"Elapsed Time (s)")
-            partialLoop = False
+            if streamed:
+                ret += fs % ("Receive (s)", "Rows", "Checksum")
             loopNum = 0
             for qry_dict in qry_times: # each dict corresponds to one loop of query execution
                 loopNum += 1
-                if loopNum <= self.warmupQueryIterations:
+                if self.warmupQueryIterations != None and loopNum <= self.warmupQueryIterations:
                     continue
                 geo_mean = 1
                 total_time = 0
-                numQueriesPerIteration = len(qry_dict)
-                if numQueriesPerIteration < constants.NUM_CH2_QUERIES:
-                    partialLoop = True
-                    logging.debug("Partial Loop")
+                timedOut = [ qry for qry in qry_dict if len(qry_dict[qry]) > 5 and "cancelled" in qry_dict[qry][5] ]
+                numQueriesPerIteration = len(qry_dict) - len(timedOut)
 
                 for qry in qry_dict: # individual query
-                    if qry_dict[qry][3][-2:] == "ms":
-                        q_time = float(qry_dict[qry][3][:-2])/1000
-                    elif qry_dict[qry][3][-1:] == "s":
-                        q_time = float(qry_dict[qry][3][:-1])
-                    if not partialLoop:
-                        overall_avg_resp_time[qry][0] += round(q_time, 2)
-                        overall_avg_resp_time[qry][1] += 1
+                    extra = qry_dict[qry][5] if len(qry_dict[qry]) > 5 else { }
+                    if "cancelled" in extra:
+                        cancelled.append((qry, extra))
+                        status = "TIMEOUT" if extra["cancelled"] == "timeout" else "CANCELLED"
+                        ret += f % (qry_dict[qry][0], qry, qry_dict[qry][1], qry_dict[qry][2], qry_dict[qry][4], status)
+                        continue
+                    q_time = queryTime(qry_dict[qry])
+                    runs.setdefault(qry, [ ]).append((q_time, extra))
                     ret += f % (qry_dict[qry][0], qry, qry_dict[qry][1], qry_dict[qry][2], qry_dict[qry][4], round(q_time, 2))
+                    if "rows" in extra:
+                        checksum = extra["checksum"]
+                        ret += fs % (round(extra["receive"], 2), extra["rows"], "-" if checksum == None else "%016x" % checksum)
+                        if self.expected_checksums != None and checksum != None and qry in self.expected_checksums:
+                            verified.append((qry, (extra["rows"], checksum)))
+                            if (extra["rows"], checksum) != self.expected_checksums[qry]:
+                                ret += "MISMATCH"
                     geo_mean *= q_time
                     total_time += q_time
 
@@ -272,27 +619,28 @@ class Results:
                     ret += "\n" + ("QUERIES RUN = %d" %(numQueriesPerIteration))
                 else:
                     ret += "\n" + ("QUERIES RUN = %d TOTAL TIME = %.02f GEOMETRIC MEAN = %.02f  ARITHMETIC MEAN = %.02f" %(numQueriesPerIteration, round(total_time, 2), round(geo_mean**(1./numQueriesPerIteration), 2), round(total_time/numQueriesPerIteration, 2)))
+                if len(timedOut) > 0:
+                    ret += "\n" + ("QUERIES CANCELLED = %d (%s)" %(len(timedOut), ", ".join(timedOut)))
                 
                 ret += "\n"
                 ret += "\n"
 
-        if len(self.query_times) == 0:
+        if len(query_times) == 0:
             return(ret)
+        ret += self.showQueryBreakdown(runs)
+        ret += self.showCancelledQueries(cancelled)
+        ret += self.showChecksumVerification(verified)
         
+        overall_avg_resp_time = self.queryResponseTimes()
         overall_geo_mean = 1
-        overall_num_queries = 0
-        sum_avg_resp_time = 0
+        overall_num_queries = len(overall_avg_resp_time)
+        sum_avg_resp_time = sum(overall_avg_resp_time.values())
         for query in overall_avg_resp_time:
-            if overall_avg_resp_time[query][1] > 0:
-                overall_num_queries += 1
-                overall_avg_resp_time[query][0] /= overall_avg_resp_time[query][1]
-                overall_geo_mean *= overall_avg_resp_time[query][0]
-                sum_avg_resp_time += overall_avg_resp_time[query][0]
+            overall_geo_mean *= overall_avg_resp_time[query]
 
         if sum_avg_resp_time == 0:
             return(ret)
         
-        #print (overall_avg_resp_time)
         col_width = 25
         total_width = (col_width*2)+2
         f = "\n  " + (("%-" + str(col_width) + "s")*2)
@@ -301,14 +649,87 @@ class Results:
         ret += "\n" + ("-"*total_width)
         ret += f % ("Query", u"Average Response Time (s)")
         ret += "\n" + ("-"*total_width)
-        for query in overall_avg_resp_time:
-            if overall_avg_resp_time[query][1] > 0:
-                ret += f % (query, round(overall_avg_resp_time[query][0], 2))
+        for query in sorted(overall_avg_resp_time.keys()):
+            ret += f % (query, round(overall_avg_resp_time[query], 2))
         ret += "\n" + ("-"*total_width)
         ret += "\n" + ("OVERALL GEOMETRIC MEAN = %.02f" %(round(overall_geo_mean**(1./overall_num_queries), 2)))
         ret += "\n" + ("AVERAGE TIME PER QUERY SET = %.02f" %(round(sum_avg_resp_time, 2)))
-        ret += "\n" + ("QUERIES PER HOUR (Qph) = %.02f" %(round(overall_num_queries * 3600/sum_avg_resp_time*numAClients, 2)))
+        ret += "\n" + ("QUERIES PER HOUR (Qph) = %.02f" %(round(self.qph(numAClients), 2)))
         
         ret += "\n" + ("-"*total_width)
         return (ret)
 ## CLASS
+
+def showCapacityCurve(steps, knee, slo):
+    """Format the steps of a capacity search. Each step is a dict with the number of
+    transaction clients, the measured tpmC, the New-Order p90 latency and the reason
+    the search stopped after it (if any). knee is the step with the highest sustainable tpmC."""
+    col_width = 16
+    total_width = (col_width*5)
+    f = "\n  " + (("%-" + str(col_width) + "s")*5)
+    line = "-"*total_width
+    ret = "\n\n\nCapacity Search Results (New-Order p90 SLO %.0f ms)\n%s" % (slo * 1000, line)
+    ret += f % ("TClients", "tpmC", "p90 (ms)", "Total txn/s", "")
+    for step in steps:
+        p90 = "-" if step["p90"] == None else "%.1f" % (step["p90"] * 1000)
+        note = step["stop"]
+        if step is knee:
+            note = "knee" if note == "" else "knee, " + note
+        ret += f % (step["tclients"], "%.02f" % step["tpmC"], p90, "%.02f" % step["txnRate"], note)
+    ret += "\n" + line
+    if knee == None:
+        ret += "\nNo client count met the latency SLO"
+    else:
+        ret += "\nMAXIMUM SUSTAINABLE tpmC = %.02f with %d transaction clients" % (knee["tpmC"], knee["tclients"])
+    ret += "\n" + line
+    return ret
+
+def showInterference(transactions, analytics, mixed, duration, numAClients):
+    """Compare the Results of the transaction only, analytics only and mixed phases of an
+    interference run: throughput of every phase, how much of it the other workload costs,
+    and the latency shift of every transaction and analytical query in the mixed phase."""
+    def ratio(new, old):
+        return "%.3f" % (new / old) if old > 0 else "-"
+    def shift(new, old):
+        return "%+.1f%%" % (100 * (new - old) / old) if old > 0 else "-"
+
+    col_width = 14
+    total_width = col_width * 6
+    f = "\n  " + (("%-" + str(col_width) + "s") * 3)
+    line = "-"*total_width
+    tpmC = (transactions.tpmC(duration), mixed.tpmC(duration))
+    qph = (analytics.qph(numAClients), mixed.qph(numAClients))
+    ret = "\n\n\nTransaction/Analytics Interference (%d seconds per phase)\n%s" % (duration, line)
+    ret += f % ("Phase", "tpmC", "Qph")
+    ret += f % ("Transactions", "%.02f" % tpmC[0], "-")
+    ret += f % ("Analytics", "-", "%.02f" % qph[0])
+    ret += f % ("Mixed", "%.02f" % tpmC[1], "%.02f" % qph[1])
+    ret += "\n" + line
+    ret += "\nINTERFERENCE RATIO tpmC (mixed/isolated) = %s" % ratio(tpmC[1], tpmC[0])
+    ret += "\nINTERFERENCE RATIO Qph (mixed/isolated) = %s" % ratio(qph[1], qph[0])
+    ret += "\n" + line
+
+    f = "\n  " + (("%-" + str(col_width) + "s") * 6)
+    ret += "\n\nTransaction Latency Shift (ms, isolated -> mixed)\n%s" % line
+    ret += f % ("", "Mean", "Mixed mean", "p90", "Mixed p90", "Mean shift")
+    for txn in sorted(transactions.txn_counters.keys()):
+        if txn == constants.QueryTypes.CH2 or transactions.txn_counters[txn] == 0:
+            continue
+        means = [ r.txn_times.get(txn, 0) / r.txn_counters[txn] if r.txn_counters.get(txn, 0) > 0 else 0 for r in (transactions, mixed) ]
+        p90s = [ r.latencyPercentile(txn, 90) for r in (transactions, mixed) ]
+        ret += f % (txn, "%.2f" % (means[0] * 1000), "%.2f" % (means[1] * 1000) if means[1] > 0 else "-",
+                    "-" if p90s[0] == None else "%.2f" % (p90s[0] * 1000), "-" if p90s[1] == None else "%.2f" % (p90s[1] * 1000),
+                    shift(means[1], means[0]) if means[1] > 0 else "-")
+    ret += "\n" + line
+
+    f = "\n  " + (("%-" + str(col_width) + "s") * 4)
+    times = (analytics.queryResponseTimes(), mixed.queryResponseTimes())
+    ret += "\n\nAnalytics Query Latency Shift (s, isolated -> mixed, completed query sets)\n%s" % line
+    ret += f % ("Query", "Isolated", "Mixed", "Shift")
+    for qry in sorted(set(times[0].keys()) | set(times[1].keys())):
+        old = times[0].get(qry)
+        new = times[1].get(qry)
+        ret += f % (qry, "-" if old == None else "%.2f" % old, "-" if new == None else "%.2f" % new,
+                    shift(new, old) if old != None and new != None else "-")
+    ret += "\n" + line
+    return ret
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import math
+from collections import deque
+
+import constants
+
+class SteadyStateDetector:
+    """Moving-window stability test over per-interval throughput and mean latency.
+
+    Completed transactions are bucketed into fixed intervals. Once the last
+    `window` intervals all have a coefficient of variation below `tolerance` and
+    the mean of the newer half of the window is within `tolerance` of the older
+    half (i.e. there is no remaining trend), the workload is in steady state.
+    """
+
+    def __init__(self, start, interval=constants.STEADY_STATE_INTERVAL, window=constants.STEADY_STATE_WINDOW, tolerance=constants.STEADY_STATE_TOLERANCE):
+        assert interval > 0
+        assert window >= 2
+        self.interval = interval
+        self.tolerance = tolerance
+        self.intervalEnd = start + interval
+        self.count = 0
+        self.latency = 0.0
+        self.throughputs = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+    ## DEF
+
+    def record(self, now, latency):
+        """Record one completed transaction. Returns True once steady state has been reached."""
+        steady = False
+        while now >= self.intervalEnd:
+            steady = self.closeInterval()
+            self.intervalEnd += self.interval
+        self.count += 1
+        self.latency += latency
+        return steady
+    ## DEF
+
+    def closeInterval(self):
+        self.throughputs.append(self.count / self.interval)
+        self.latencies.append(self.latency / self.count if self.count > 0 else 0.0)
+        self.count = 0
+        self.latency = 0.0
+        if len(self.throughputs) < self.throughputs.maxlen:
+            return False
+        return self.isStable(self.throughputs) and self.isStable(self.latencies)
+    ## DEF
+
+    def isStable(self, values):
+        values = list(values)
+        mean = sum(values) / len(values)
+        if mean <= 0:
+            return False
+        stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+        if stddev / mean > self.tolerance:
+            return False
+        half = int(len(values) / 2)
+        older = sum(values[:half]) / half
+        newer = sum(values[-half:]) / half
+        return abs(newer - older) / mean <= self.tolerance
+    ## DEF
+## CLASS